@@ -1,23 +1,35 @@
 // --- API Calls  ---
 
-export async function fetchResults() {
+// Pełna lista + kursor delty (X-Sync-Cursor) z czasem serwera dla kolejnych fetchResultsSince
+export async function fetchLatestResults() {
     const response = await fetch('/api/results');
     if (response.status === 401) {
         window.location.reload();
-        return [];
+        return { rows: [], syncCursor: null };
     }
+    return { rows: await response.json(), syncCursor: response.headers.get('X-Sync-Cursor') };
+}
+
+// Delta: tylko wyniki nowsze niż kursor (timestamp,id[,synced_at]) + id usunięte od ostatniej synchronizacji
+export async function fetchResultsSince(cursor) {
+    const response = await fetch(`/api/results?since=${encodeURIComponent(cursor)}`);
+    if (response.status === 401) {
+        window.location.reload();
+        return null;
+    }
+    if (!response.ok) return null;
     return await response.json();
 }
 
 export async function fetchServers() {
-    const response = await fetch('/api/servers');
+    const response = await fetch('/api/servers', { cache: 'no-cache' });
     if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
     return await response.json();
 }
 
 export async function fetchSettings() {
-    // ZMIANA: Dodano 'no-store' aby uniknąć cachowania ustawień przez przeglądarkę
-    const response = await fetch('/api/settings', { cache: 'no-store' });
+    // 'no-cache' wymusza rewalidację przez ETag (If-None-Match -> 304) zamiast pobierania całości
+    const response = await fetch('/api/settings', { cache: 'no-cache' });
     return await response.json();
 }
 
@@ -38,7 +50,13 @@ export async function triggerTest(serverId, language) {
         body: JSON.stringify({ server_id: serverId, app_language: language })
     });
     if (!response.ok) throw new Error('Trigger error');
-    return response;
+    return await response.json();
+}
+
+export async function fetchJob(jobId) {
+    const response = await fetch(`/api/jobs/${encodeURIComponent(jobId)}`);
+    if (!response.ok) return null;
+    return await response.json();
 }
 
 export async function deleteEntries(ids) {
@@ -115,11 +115,6 @@ async function initializeApp() {
         }
         
         startWatchdogPolling();
-        window.addEventListener('speedtest-data-updated', () => {
-            if (isDashboard) {
-                loadDashboardData();
-            }
-        });
         
         syncGlobalSettings();
     }
@@ -1,20 +1,43 @@
 import { state } from './state.js';
 import { translations } from './i18n.js';
-import { fetchResults, fetchServers, fetchSettings, triggerTest, getLatestResult, deleteEntries, updateSettings } from './api.js';
+import { fetchLatestResults, fetchResultsSince, fetchServers, fetchSettings, triggerTest, fetchJob, deleteEntries, updateSettings } from './api.js';
 import { parseISOLocally, getUnitLabel, showToast, getNextRunTimeText, formatCountdown } from './utils.js';
 import { renderCharts } from './charts.js';
+import { subscribe, isStreamOpen } from './events.js';
 import { updateStatsCards, updateTable, showDetailsModal } from './ui.js';
 
 let countdownInterval = null;
-let pollingInterval = null;
 let scheduleCheckInProgress = false; 
+// Kursor z serwera (wiersz + czas ostatniej synchronizacji) - z pełnego pobrania, potem z delty
+let resultsCursor = null;
+
+async function reloadResults() {
+    const { rows, syncCursor } = await fetchLatestResults();
+    resultsCursor = syncCursor;
+    return rows;
+}
+
+// Dociąga tylko zmiany względem state.allResults (posortowane malejąco po czasie)
+async function syncResults() {
+    if (!resultsCursor) return reloadResults();
+
+    const delta = await fetchResultsSince(resultsCursor);
+    if (!delta || delta.reset || delta.more) return reloadResults();
+
+    resultsCursor = delta.cursor;
+    const deleted = new Set(delta.deleted);
+    // Wiersz dopisany w trakcie pełnego pobrania może przyjść drugi raz w delcie
+    const fresh = new Set(delta.rows.map(r => r.id));
+    const merged = delta.rows.reverse().concat(state.allResults.filter(r => !fresh.has(r.id))).filter(r => !deleted.has(r.id));
+    return merged.slice(0, 1000);
+}
 
 export async function loadDashboardData() {
     try {
         const serversData = await fetchServers();
         const settingsData = await fetchSettings();
         
-        state.allResults = await fetchResults();
+        state.allResults = await reloadResults();
 
         if (settingsData.next_run_time) {
             state.nextExplicitRunTime = settingsData.next_run_time;
@@ -27,14 +50,16 @@ export async function loadDashboardData() {
         
         const serverSelect = document.getElementById('serverSelect');
         if (serverSelect) {
-            serverSelect.innerHTML = `<option value="null" data-i18n-key="autoSelect">${translations[state.currentLang].autoSelect}</option>`;
+            serverSelect.innerHTML = `<option value="null" data-i18n-key="autoSelect">${translations[state.currentLang].autoSelect}</option>`
+                + `<option value="0" data-i18n-key="autoBestSelect">${translations[state.currentLang].autoBestSelect}</option>`;
+            // Lista jest posortowana wg czasu połączenia (rtt) - najszybsze serwery na górze
             serversData.servers.forEach(s => {
                 const opt = document.createElement('option');
                 opt.value = s.id;
-                opt.textContent = `(${s.id}) ${s.name} (${s.location})`;
+                opt.textContent = `(${s.id}) ${s.name} (${s.location})` + (s.rtt != null ? ` - ${s.rtt} ms` : '');
                 serverSelect.appendChild(opt);
             });
-            serverSelect.value = settingsData.selected_server_id || 'null';
+            serverSelect.value = settingsData.selected_server_id ?? 'null';
             state.currentSelectedServerId = serverSelect.value;
         }
 
@@ -134,6 +159,86 @@ export function renderData() {
     updateTable(filtered);
 }
 
+// Ręczny test: stan zadania i postęp przychodzą zdarzeniami "job" / "progress" z /api/events
+const MANUAL_TEST_TIMEOUT_MS = 75000;
+let manualJob = null; // { id, timer }
+
+function endManualTest() {
+    if (manualJob && manualJob.timer) clearTimeout(manualJob.timer);
+    manualJob = null;
+    const btn = document.getElementById('triggerTestBtn');
+    // ZMIANA: Odblokowanie przycisku po zakończeniu (sukces, błąd, timeout)
+    if (btn) {
+        btn.disabled = false;
+        btn.classList.remove('is-loading');
+    }
+}
+
+function armManualTimeout() {
+    if (!manualJob || manualJob.timer) return;
+    const jobId = manualJob.id;
+    manualJob.timer = setTimeout(async () => {
+        // Ostatnie sprawdzenie stanu - na wypadek zgubionego zdarzenia przy zerwanym strumieniu
+        const job = await fetchJob(jobId);
+        if (!manualJob || manualJob.id !== jobId) return;
+        if (job && job.status !== 'queued' && job.status !== 'running') return applyJobEvent(job);
+        endManualTest();
+        showToast('toastTestTimeout', 'error');
+    }, MANUAL_TEST_TIMEOUT_MS);
+}
+
+function applyJobEvent(job) {
+    if (!manualJob || !job || job.id !== manualJob.id) return;
+    if (job.status === 'running') {
+        // Limit czasu liczymy od startu pomiaru, nie od wejścia do kolejki
+        armManualTimeout();
+    } else if (job.status === 'failed' || job.status === 'cancelled') {
+        endManualTest();
+        showToast(job.status === 'cancelled' ? 'toastTestCancelled' : 'toastTestError', 'error');
+    } else if (job.status === 'done') {
+        // Sam wynik dociąga obsługa zdarzenia "result"
+        endManualTest();
+        showToast('toastTestComplete', 'success');
+    }
+}
+
+function applyProgressEvent(p) {
+    // Postęp pomiaru na żywo (faza, przepływność, %)
+    if (!manualJob || p.job_id !== manualJob.id || p.phase === 'start') return;
+    const value = p.phase === 'ping' ? `${p.latency} ms` : `${p.bandwidth_mbps} Mbps`;
+    showToast(`toastPhase_${p.phase}`, 'info', `${value} (${Math.round(p.progress * 100)}%)`);
+}
+
+// Zdarzenia "result" mogą przyjść seriami - delty po kolei, żeby nie scalić tych samych wierszy dwa razy
+let resultSync = Promise.resolve();
+
+function applyResultEvent() {
+    resultSync = resultSync.then(refreshResults);
+    return resultSync;
+}
+
+async function refreshResults() {
+    try {
+        state.allResults = await syncResults();
+        if (state.allResults.length > 0) {
+            state.lastTestTimestamp = state.allResults[0].timestamp;
+            const nextRunEl = document.getElementById('nextRunTime');
+            if(nextRunEl) nextRunEl.textContent = getNextRunTimeText();
+            startNextRunCountdown();
+        }
+        renderData();
+    } catch (e) {
+        console.error("Error syncing results:", e);
+    }
+}
+
+function applyNextRunEvent(data) {
+    if (!data.next_run_time || data.next_run_time === state.nextExplicitRunTime) return;
+    state.nextExplicitRunTime = data.next_run_time;
+    const nextRunEl = document.getElementById('nextRunTime');
+    if(nextRunEl) nextRunEl.textContent = getNextRunTimeText();
+}
+
 export async function handleManualTest() {
     const btn = document.getElementById('triggerTestBtn');
     const serverSelect = document.getElementById('serverSelect');
@@ -144,53 +249,18 @@ export async function handleManualTest() {
     btn.classList.add('is-loading'); 
     showToast('toastTestInProgress', 'info');
     
-    const prevTimestamp = state.allResults[0]?.timestamp;
-    
     try {
-        await triggerTest(serverId, state.currentLang);
-        let attempts = 0;
-        
-        if (pollingInterval) clearInterval(pollingInterval);
-        
-        pollingInterval = setInterval(async () => {
-            attempts++;
-            const latest = await getLatestResult();
-            const isNew = latest && (!prevTimestamp || new Date(latest.timestamp) > new Date(prevTimestamp));
-            
-            if (isNew) {
-                clearInterval(pollingInterval); 
-                showToast('toastTestComplete', 'success');
-                
-                state.allResults = await fetchResults(); 
-                const newSettings = await fetchSettings(); 
-                if (newSettings.next_run_time) {
-                    state.nextExplicitRunTime = newSettings.next_run_time;
-                }
-                
-                if (state.allResults.length > 0) {
-                    state.lastTestTimestamp = state.allResults[0].timestamp;
-                    const nextRunEl = document.getElementById('nextRunTime');
-                    if(nextRunEl) nextRunEl.textContent = getNextRunTimeText();
-                    startNextRunCountdown();
-                }
-                
-                renderData();
-                // ZMIANA: Odblokowanie przycisku po sukcesie
-                btn.disabled = false; 
-                btn.classList.remove('is-loading');
-            } else if (attempts > 25) {
-                clearInterval(pollingInterval); 
-                showToast('toastTestTimeout', 'error');
-                // ZMIANA: Odblokowanie przycisku po timeoutcie
-                btn.disabled = false; 
-                btn.classList.remove('is-loading');
-            }
-        }, 3000);
+        // Test trafia do kolejki - śledzimy stan zadania (queued -> running -> done/failed)
+        const { job_id: jobId } = await triggerTest(serverId, state.currentLang);
+        if (manualJob && manualJob.timer) clearTimeout(manualJob.timer);
+        manualJob = { id: jobId, timer: null };
+        // Bez strumienia zdarzeń zostaje jedno sprawdzenie po upływie limitu
+        if (!isStreamOpen()) armManualTimeout();
+        // Zdarzenia mogły przyjść, zanim znaliśmy id zadania
+        applyJobEvent(await fetchJob(jobId));
     } catch (e) { 
+        endManualTest();
         showToast('toastTestError', 'error'); 
-        // ZMIANA: Odblokowanie przycisku po błędzie
-        btn.disabled = false; 
-        btn.classList.remove('is-loading'); 
     }
 }
 
@@ -230,7 +300,7 @@ export async function handleDelete() {
         try { 
             await deleteEntries(ids); 
             showToast('toastDeleteSuccess', 'success'); 
-            state.allResults = await fetchResults(); 
+            state.allResults = await reloadResults(); 
             renderData(); 
             document.getElementById('deleteSelectedBtn').style.display = 'none'; 
             document.getElementById('selectAllCheckbox').checked = false; 
@@ -340,7 +410,8 @@ function startNextRunCountdown() {
             if (diff <= 0) {
                 countdownEl.textContent = `${prefix} 00:00:00`;
                 
-                if (diff < -5000 && !scheduleCheckInProgress) {
+                // Zapasowo, gdy strumień zdarzeń nie działa - inaczej termin przychodzi zdarzeniem "scheduler"
+                if (diff < -5000 && !scheduleCheckInProgress && !isStreamOpen()) {
                     scheduleCheckInProgress = true;
                     try {
                         const s = await fetchSettings();
@@ -370,6 +441,14 @@ function startNextRunCountdown() {
 }
 
 export function initDashboardListeners() {
+    // Nowe/usunięte wyniki, stan zadań i harmonogram przychodzą strumieniem zdarzeń
+    subscribe('result', applyResultEvent);
+    subscribe('results_deleted', applyResultEvent);
+    subscribe('job', applyJobEvent);
+    subscribe('progress', applyProgressEvent);
+    subscribe('settings', applyNextRunEvent);
+    subscribe('scheduler', applyNextRunEvent);
+
     const triggerBtn = document.getElementById('triggerTestBtn');
     if(triggerBtn) triggerBtn.addEventListener('click', handleManualTest);
 
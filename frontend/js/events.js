@@ -0,0 +1,57 @@
+// --- Wspólny strumień zdarzeń serwera (SSE) ---
+// Jedno połączenie /api/events na kartę zamiast osobnego w każdym module;
+// moduły rejestrują obsługę typów zdarzeń ("result", "job", "progress", "watchdog"...).
+
+let source = null;
+let listening = new Set();
+const handlers = new Map(); // typ zdarzenia -> Set funkcji
+const closeHandlers = new Set();
+
+function listen(type) {
+    if (listening.has(type)) return;
+    listening.add(type);
+    source.addEventListener(type, (e) => {
+        const data = JSON.parse(e.data);
+        (handlers.get(type) || []).forEach(h => h(data));
+    });
+}
+
+function open() {
+    source = new EventSource('/api/events');
+    listening = new Set();
+    handlers.forEach((_, type) => listen(type));
+    source.onerror = () => {
+        // EventSource sam wznawia połączenie; CLOSED = serwer odmówił (np. 401) i nie wróci
+        if (source && source.readyState === EventSource.CLOSED) {
+            source = null;
+            closeHandlers.forEach(h => h());
+        }
+    };
+}
+
+function closeIfUnused() {
+    for (const set of handlers.values()) if (set.size) return;
+    if (source) source.close();
+    source = null;
+}
+
+// Zwraca funkcję wypisania albo null, gdy przeglądarka nie obsługuje SSE (wtedy moduł odpytuje sam).
+// onClosed: wywoływane, gdy strumień padł na stałe.
+export function subscribe(type, handler, onClosed) {
+    if (!window.EventSource) return null;
+    if (!handlers.has(type)) handlers.set(type, new Set());
+    handlers.get(type).add(handler);
+    if (onClosed) closeHandlers.add(onClosed);
+    if (!source) open();
+    else listen(type);
+
+    return () => {
+        handlers.get(type).delete(handler);
+        if (onClosed) closeHandlers.delete(onClosed);
+        closeIfUnused();
+    };
+}
+
+export function isStreamOpen() {
+    return source !== null;
+}
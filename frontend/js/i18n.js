@@ -10,6 +10,7 @@ export const translations = {
         'runTest': 'Uruchom Test',
         'selectServer': 'Serwer:',
         'autoSelect': 'Wybór automatyczny',
+        'autoBestSelect': 'Najszybszy serwer (ranking)',
         'runEvery': 'Interwał:',
         'intervalDisabled': 'Wyłączony',
         'hour1': '1 godzina',
@@ -77,6 +78,10 @@ export const translations = {
         'toastTestError': 'Wystąpił błąd podczas uruchamiania testu.',
         'toastTestTimeout': 'Błąd: Test przekroczył limit czasu.',
         'toastTestComplete': 'Test zakończony!',
+        'toastTestCancelled': 'Test anulowany.',
+        'toastPhase_ping': 'Ping: ',
+        'toastPhase_download': 'Pobieranie: ',
+        'toastPhase_upload': 'Wysyłanie: ',
         'toastSettingsSaved': 'Zapisano ustawienia!',
         'toastSettingsError': 'Błąd zapisu!',
         'toastSettingsInvalid': 'Błąd: Godziny muszą być > 0',
@@ -136,6 +141,9 @@ export const translations = {
         'wdPing': 'Ping:',
         'wdLoss': 'Utrata:',
         'wdInterval': 'Interwał (sekundy):',
+        'wdDownAfter': 'Powiadom o OFFLINE po (kolejnych porażkach):',
+        'wdUpAfter': 'Powiadom o ONLINE po (kolejnych sukcesach):',
+        'wdDigest': 'Okno zbiorczych powiadomień (minuty, 0 = wył.):',
         'wdStatusOnline': 'ONLINE',
         'wdStatusOffline': 'OFFLINE',
         'rowsPerPage': 'Na stronę', 
@@ -250,6 +258,7 @@ export const translations = {
         'runTest': 'Run Test',
         'selectServer': 'Server:',
         'autoSelect': 'Automatic Selection',
+        'autoBestSelect': 'Fastest server (ranked)',
         'runEvery': 'Interval:',
         'intervalDisabled': 'Disabled',
         'hour1': '1 hour',
@@ -317,6 +326,10 @@ export const translations = {
         'toastTestError': 'An error occurred while starting the test.',
         'toastTestTimeout': 'Error: Test timed out.',
         'toastTestComplete': 'Test complete!', 
+        'toastTestCancelled': 'Test cancelled.',
+        'toastPhase_ping': 'Ping: ',
+        'toastPhase_download': 'Download: ',
+        'toastPhase_upload': 'Upload: ',
         'toastSettingsSaved': 'Settings saved!',
         'toastSettingsError': 'Error saving!',
         'toastSettingsInvalid': 'Error: Hours must be > 0',
@@ -376,6 +389,9 @@ export const translations = {
         'wdPing': 'Ping:',
         'wdLoss': 'Loss:',
         'wdInterval': 'Interval (seconds):',
+        'wdDownAfter': 'Notify OFFLINE after (consecutive failures):',
+        'wdUpAfter': 'Notify ONLINE after (consecutive successes):',
+        'wdDigest': 'Notification digest window (minutes, 0 = off):',
         'wdStatusOnline': 'ONLINE',
         'wdStatusOffline': 'OFFLINE',
         'rowsPerPage': 'Per page', 
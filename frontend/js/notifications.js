@@ -1,9 +1,10 @@
 import { fetchNotificationSettings, getLatestResult } from './api.js';
+import { subscribe } from './events.js';
 
 // Zmienne stanu dla powiadomień
 let lastSeenResultId = null;
 let browserNotifEnabled = false;
-let resultPollingInterval = null;
+let unsubscribeResults = null;
 
 // Sprawdź ustawienia i zainicjuj stan
 export async function initNotificationSystem() {
@@ -20,10 +21,10 @@ export async function initNotificationSystem() {
             const latest = await getLatestResult();
             if(latest) lastSeenResultId = latest.id;
             
-            startResultPolling();
+            startResultListener();
         } else {
             browserNotifEnabled = false;
-            stopResultPolling();
+            stopResultListener();
         }
     } catch(e) {
         console.error("Błąd inicjalizacji powiadomień:", e);
@@ -37,35 +38,25 @@ export function showBrowserNotification(title, body, tag) {
     }
 }
 
-function startResultPolling() {
-    if (resultPollingInterval) clearInterval(resultPollingInterval);
-    
-    // Polling co 10 sekund w celu wykrycia nowego wyniku
-    resultPollingInterval = setInterval(async () => {
-        if (!browserNotifEnabled) return;
-        
-        try {
-            const latest = await getLatestResult();
-            if (latest && lastSeenResultId && latest.id !== lastSeenResultId) {
-                lastSeenResultId = latest.id;
-                // ZMIANA: Dodano Ping i Jitter do treści powiadomienia przeglądarkowego
-                showBrowserNotification(
-                    "SpeedtestLog: Nowy wynik", 
-                    `Download: ${latest.download} Mbps, Upload: ${latest.upload} Mbps, Ping: ${latest.ping} ms, Jitter: ${latest.jitter} ms`,
-                    "speedtest-result"
-                );
-                
-                // Jeśli jesteśmy na dashboardzie, wyemituj zdarzenie odświeżenia
-                window.dispatchEvent(new CustomEvent('speedtest-data-updated'));
-            } else if (latest && !lastSeenResultId) {
-                lastSeenResultId = latest.id;
-            }
-        } catch(e) {}
-    }, 10000);
+function startResultListener() {
+    stopResultListener();
+
+    // Nowy wynik przychodzi zdarzeniem "result" z /api/events (dashboard odświeża się sam)
+    unsubscribeResults = subscribe('result', (latest) => {
+        if (!browserNotifEnabled || !latest || latest.id === lastSeenResultId) return;
+        lastSeenResultId = latest.id;
+        // ZMIANA: Dodano Ping i Jitter do treści powiadomienia przeglądarkowego
+        showBrowserNotification(
+            "SpeedtestLog: Nowy wynik", 
+            `Download: ${latest.download} Mbps, Upload: ${latest.upload} Mbps, Ping: ${latest.ping} ms, Jitter: ${latest.jitter} ms`,
+            "speedtest-result"
+        );
+    });
 }
 
-function stopResultPolling() {
-    if (resultPollingInterval) clearInterval(resultPollingInterval);
+function stopResultListener() {
+    if (unsubscribeResults) unsubscribeResults();
+    unsubscribeResults = null;
 }
 
 export function isBrowserNotifEnabled() {
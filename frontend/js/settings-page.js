@@ -35,6 +35,15 @@ export async function loadSettingsToForm() {
         const intervalInput = document.getElementById('pingIntervalInput');
         if(intervalInput) intervalInput.value = s.ping_interval || 30;
 
+        const downAfterInput = document.getElementById('wdDownAfterInput');
+        if(downAfterInput) downAfterInput.value = s.watchdog_down_after || 3;
+
+        const upAfterInput = document.getElementById('wdUpAfterInput');
+        if(upAfterInput) upAfterInput.value = s.watchdog_up_after || 2;
+
+        const digestInput = document.getElementById('wdDigestInput');
+        if(digestInput) digestInput.value = s.watchdog_digest_minutes || 0;
+
         const dlInput = document.getElementById('declaredDownloadInput');
         if(dlInput) dlInput.value = s.declared_download || '';
 
@@ -143,6 +152,9 @@ export async function saveSettingsFromPage() {
     try {
         const target = document.getElementById('pingTargetInput').value;
         const interval = parseInt(document.getElementById('pingIntervalInput').value);
+        const downAfter = parseInt(document.getElementById('wdDownAfterInput').value) || 3;
+        const upAfter = parseInt(document.getElementById('wdUpAfterInput').value) || 2;
+        const digest = parseInt(document.getElementById('wdDigestInput').value) || 0;
         const dl = parseInt(document.getElementById('declaredDownloadInput').value) || 0;
         const ul = parseInt(document.getElementById('declaredUploadInput').value) || 0;
         const startupInput = document.getElementById('startupTestInput');
@@ -161,6 +173,9 @@ export async function saveSettingsFromPage() {
         const payload = {
             ping_target: target,
             ping_interval: interval,
+            watchdog_down_after: downAfter,
+            watchdog_up_after: upAfter,
+            watchdog_digest_minutes: digest,
             declared_download: dl,
             declared_upload: ul,
             startup_test_enabled: startupEnabled,
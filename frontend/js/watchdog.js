@@ -1,20 +1,40 @@
 import { state } from './state.js';
 import { translations } from './i18n.js';
 import { showBrowserNotification, isBrowserNotifEnabled } from './notifications.js';
+import { subscribe } from './events.js';
 
 let watchdogInterval = null;
+let unsubscribeWatchdog = null;
 let wdChart = null;
 let lastWatchdogStatus = null; // true/false
 let cachedData = null; // Cache ostatnich danych
 
+const HISTORY_LENGTH = 60;
+
 export function startWatchdogPolling() {
-    if (watchdogInterval) clearInterval(watchdogInterval);
-    updateWatchdogUI(); 
-    watchdogInterval = setInterval(updateWatchdogUI, 5000); 
+    stopWatchdogPolling();
+    updateWatchdogUI();
+
+    // Preferujemy push (SSE); polling tylko gdy przeglądarka lub proxy nie obsługuje strumienia
+    unsubscribeWatchdog = subscribe('watchdog', applyWatchdogEvent, () => {
+        if (!watchdogInterval) watchdogInterval = setInterval(updateWatchdogUI, 5000);
+    });
+    if (!unsubscribeWatchdog) watchdogInterval = setInterval(updateWatchdogUI, 5000);
 }
 
 export function stopWatchdogPolling() {
     if (watchdogInterval) clearInterval(watchdogInterval);
+    watchdogInterval = null;
+    if (unsubscribeWatchdog) unsubscribeWatchdog();
+    unsubscribeWatchdog = null;
+}
+
+function applyWatchdogEvent(event) {
+    // Wskaźnik i wykres pokazują tylko cel główny
+    if (!cachedData || !event.primary) return;
+    cachedData.current = event.current;
+    cachedData.history = cachedData.history.concat([event.point]).slice(-HISTORY_LENGTH);
+    renderWatchdogData(cachedData);
 }
 
 // Wywoływane z app.js przy zmianie motywu
@@ -52,6 +72,15 @@ async function updateWatchdogUI() {
         
         // Zapisujemy dane do cache, aby były dostępne przy kliknięciu
         cachedData = data;
+        renderWatchdogData(data);
+    } catch (e) { console.error(e); }
+}
+
+function renderWatchdogData(data) {
+    try {
+        const icon = document.getElementById('watchdogIcon');
+        if(!icon) return; 
+
         const current = data.current;
         
         // 1. Aktualizacja Ikony (Zawsze)
@@ -0,0 +1,140 @@
+import threading
+from datetime import datetime, timedelta
+from .config import NOTIF_TRANS
+
+# --- Tłumienie "migotania" i zbiorcze powiadomienia watchdoga ---
+# Stan celu do powiadomień zmienia się dopiero po down_after kolejnych nieudanych sondach
+# (offline) albo up_after udanych (online). Z oknem digest_minutes > 0 pierwsza zmiana
+# jest wysyłana od razu, a kolejne w tym oknie trafiają do jednego podsumowania
+# (liczba awarii i łączny czas niedostępności) wysyłanego po jego zamknięciu.
+# Okno liczy awarie i czas niedostępności od swojego otwarcia, łącznie ze zmianą, która je otworzyła.
+# Zmiana digest_minutes zamyka otwarte okno od razu, żeby wstrzymane zmiany nie przepadły.
+# Status w UI, ping_logs i tabela outages dalej widzą surowy wynik każdej sondy.
+
+DEFAULT_DOWN_AFTER = 3
+DEFAULT_UP_AFTER = 2
+
+class _TargetAlert:
+    __slots__ = ("state", "fails", "oks", "down_since", "window_start", "window_end", "window_minutes", "changes", "outages", "downtime")
+
+    def __init__(self):
+        self.state = None # potwierdzony stan: None (nieznany), True online, False offline
+        self.fails = 0
+        self.oks = 0
+        self.down_since = None
+        self.window_start = None
+        self.window_end = None
+        self.window_minutes = 0
+        self.changes = 0
+        self.outages = 0
+        self.downtime = 0.0
+
+def _fmt_duration(seconds):
+    seconds = int(seconds)
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{h}h {m:02d}m" if h else f"{m}m {s:02d}s"
+
+class WatchdogAlerts:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._targets = {}
+
+    def observe(self, target, is_online: bool, now: datetime, lang, down_after, up_after, digest_minutes):
+        """Przetwarza wynik sondy; zwraca listę (tytuł, treść, typ) do wysłania."""
+        trans = NOTIF_TRANS.get(lang, NOTIF_TRANS["pl"])
+        out = []
+        with self._lock:
+            a = self._targets.get(target)
+            if a is None: a = self._targets[target] = _TargetAlert()
+            if a.window_end and a.window_minutes != (digest_minutes or 0):
+                out += self._close_window(target, a, now, trans)
+
+            if is_online:
+                a.oks += 1; a.fails = 0
+            else:
+                a.fails += 1; a.oks = 0
+
+            if a.state is None:
+                # Pierwszy wynik po starcie ustala stan bez powiadomienia (jak wcześniej)
+                a.state = is_online
+                if not is_online: a.down_since = now
+                return out
+            if is_online == a.state: return out
+            if is_online and a.oks < max(up_after or 1, 1): return out
+            if not is_online and a.fails < max(down_after or 1, 1): return out
+
+            held = bool(digest_minutes and a.window_end and now < a.window_end)
+            # Wysyłka natychmiastowa otwiera nowe okno zbiorcze - przed liczeniem tej zmiany
+            if not held and digest_minutes: self._reset_window(a, now, digest_minutes)
+
+            a.state = is_online
+            if is_online:
+                if a.down_since: a.downtime += self._window_downtime(a, now)
+                a.down_since = None
+            else:
+                a.down_since = now
+                a.outages += 1
+
+            if held:
+                a.changes += 1
+            elif is_online:
+                out.append((trans["watchdog_up_title"], trans["watchdog_up_body"].format(target=target), "watchdog_up"))
+            else:
+                out.append((trans["watchdog_down_title"], trans["watchdog_down_body"].format(target=target), "watchdog_down"))
+            return out
+
+    def _reset_window(self, a, now, digest_minutes):
+        a.window_start = now
+        a.window_end = now + timedelta(minutes=digest_minutes)
+        a.window_minutes = digest_minutes
+        a.changes = 0
+        a.outages = 0
+        a.downtime = 0.0
+
+    def _window_downtime(self, a, now):
+        # Tylko część awarii mieszcząca się w oknie (awaria sprzed okna się w nim nie liczy)
+        start = max(a.down_since, a.window_start) if a.window_start else a.down_since
+        end = min(now, a.window_end) if a.window_end else now
+        return max((end - start).total_seconds(), 0.0)
+
+    def _close_window(self, target, a, now, trans):
+        """Zamyka okno; zwraca podsumowanie, jeśli były w nim wstrzymane zmiany."""
+        out = []
+        if a.changes:
+            downtime = a.downtime + (self._window_downtime(a, now) if a.down_since else 0.0)
+            state = "ONLINE" if a.state else "OFFLINE"
+            out.append((
+                trans["watchdog_digest_title"],
+                trans["watchdog_digest_body"].format(
+                    target=target, outages=a.outages, downtime=_fmt_duration(downtime),
+                    minutes=a.window_minutes, state=state
+                ),
+                "watchdog_up" if a.state else "watchdog_down"
+            ))
+        # Kolejna zmiana w następnym oknie znowu idzie od razu
+        a.window_start = None
+        a.window_end = None
+        a.window_minutes = 0
+        a.changes = 0
+        a.outages = 0
+        a.downtime = 0.0
+        return out
+
+    def flush_due(self, now: datetime, lang, digest_minutes):
+        """Zamyka okna, które minęły albo mają nieaktualną długość (zmiana digest_minutes);
+        dla okien ze wstrzymanymi zmianami zwraca podsumowania."""
+        trans = NOTIF_TRANS.get(lang, NOTIF_TRANS["pl"])
+        out = []
+        with self._lock:
+            for target, a in self._targets.items():
+                if not a.window_end: continue
+                if now < a.window_end and a.window_minutes == (digest_minutes or 0): continue
+                out += self._close_window(target, a, now, trans)
+        return out
+
+    def drop(self, target):
+        with self._lock:
+            self._targets.pop(target, None)
+
+watchdog_alerts = WatchdogAlerts()
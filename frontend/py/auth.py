@@ -7,6 +7,7 @@ from jwt.algorithms import RSAAlgorithm
 import json
 from fastapi import APIRouter, Response, HTTPException, Request, Depends
 from fastapi.responses import RedirectResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 # ZMIANA: Importy relatywne
@@ -15,6 +16,7 @@ from .schemas import LoginModel, OIDCSettingsModel
 from .database import get_db
 from .models import OIDCSettings
 from .dependencies import verify_session
+from . import settings_cache
 
 router = APIRouter()
 COOKIE_NAME = f"{SESSION_COOKIE_NAME}_v2"
@@ -54,8 +56,8 @@ async def logout(response: Response):
     return {"message": "Logged out"}
 
 @router.get("/api/auth-status")
-async def auth_status(db: Session = Depends(get_db)):
-    oidc = db.query(OIDCSettings).filter(OIDCSettings.id == 1).first()
+def auth_status():
+    oidc = settings_cache.oidc_settings.get()
     return {
         "enabled": AUTH_ENABLED,
         "oidc_enabled": oidc.enabled if oidc else False,
@@ -63,7 +65,7 @@ async def auth_status(db: Session = Depends(get_db)):
     }
 
 @router.get("/api/settings/oidc")
-async def get_oidc_settings(db: Session = Depends(get_db), authorized: bool = Depends(verify_session)):
+def get_oidc_settings(db: Session = Depends(get_db), authorized: bool = Depends(verify_session)):
     s = db.query(OIDCSettings).filter(OIDCSettings.id == 1).first()
     if not s: s = OIDCSettings(id=1); db.add(s); db.commit()
     return {
@@ -75,7 +77,7 @@ async def get_oidc_settings(db: Session = Depends(get_db), authorized: bool = De
     }
 
 @router.post("/api/settings/oidc")
-async def save_oidc_settings(s: OIDCSettingsModel, db: Session = Depends(get_db), authorized: bool = Depends(verify_session)):
+def save_oidc_settings(s: OIDCSettingsModel, db: Session = Depends(get_db), authorized: bool = Depends(verify_session)):
     rec = db.query(OIDCSettings).filter(OIDCSettings.id == 1).first()
     if not rec: rec = OIDCSettings(id=1); db.add(rec)
     
@@ -86,13 +88,15 @@ async def save_oidc_settings(s: OIDCSettingsModel, db: Session = Depends(get_db)
     if s.discovery_url: rec.discovery_url = s.discovery_url
     
     db.commit()
+    settings_cache.oidc_settings.invalidate()
     return {"message": "OIDC settings saved"}
 
 @router.get("/api/auth/oidc/login")
-async def oidc_login(request: Request, db: Session = Depends(get_db)):
+async def oidc_login(request: Request):
     if not AUTH_ENABLED: return RedirectResponse("/")
     
-    settings = db.query(OIDCSettings).filter(OIDCSettings.id == 1).first()
+    # Zimny cache = zapytanie synchroniczne, więc poza pętlą zdarzeń
+    settings = await run_in_threadpool(settings_cache.oidc_settings.get)
     if not settings or not settings.enabled or not settings.discovery_url:
         raise HTTPException(status_code=400, detail="OIDC not configured")
 
@@ -125,7 +129,7 @@ async def oidc_login(request: Request, db: Session = Depends(get_db)):
         return RedirectResponse(url="/login.html?error=oidc_config_error")
 
 @router.get("/api/auth/oidc/callback")
-async def oidc_callback(request: Request, code: str, state: str, db: Session = Depends(get_db)):
+async def oidc_callback(request: Request, code: str, state: str):
     if not AUTH_ENABLED: return RedirectResponse("/")
     
     cookie_state = request.cookies.get("oidc_state")
@@ -133,7 +137,8 @@ async def oidc_callback(request: Request, code: str, state: str, db: Session = D
         logging.error("OIDC State mismatch")
         return RedirectResponse(url="/login.html?error=oidc_invalid_state")
 
-    settings = db.query(OIDCSettings).filter(OIDCSettings.id == 1).first()
+    # Zimny cache = zapytanie synchroniczne, więc poza pętlą zdarzeń
+    settings = await run_in_threadpool(settings_cache.oidc_settings.get)
     
     try:
         config = await get_oidc_config(settings.discovery_url)
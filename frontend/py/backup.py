@@ -1,10 +1,8 @@
 import os
 import json
 import subprocess
-import threading
 import logging
 from datetime import datetime, timedelta
-import schedule
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseUpload
@@ -14,8 +12,10 @@ from google.auth.transport.requests import Request as GoogleRequest
 from .config import get_log, DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
 from . import database 
 from .models import DriveBackupSettings
+from . import settings_cache
+from .scheduler import scheduler, IntervalTrigger
 
-backup_job = None
+BACKUP_JOB = "drive-backup"
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 
 def get_drive_service(settings):
@@ -31,6 +31,7 @@ def get_drive_service(settings):
             s.token_json = creds.to_json()
             db.commit()
             db.close()
+            settings_cache.drive_settings.invalidate()
         return build('drive', 'v3', credentials=creds)
     except Exception as e:
         logging.error(f"Google Auth Error: {e}")
@@ -105,24 +106,16 @@ def perform_backup_task():
         db.commit()
     finally:
         db.close()
+        settings_cache.drive_settings.invalidate()
 
 def setup_backup_schedule(settings=None):
-    global backup_job
-    if backup_job:
-        try:
-            schedule.cancel_job(backup_job)
-        except: pass
-        backup_job = None
-
     if not settings:
-        db = database.SessionLocal()
-        settings = db.query(DriveBackupSettings).filter(DriveBackupSettings.id == 1).first()
-        db.close()
+        settings = settings_cache.drive_settings.get()
 
     if settings and settings.is_enabled and settings.schedule_days and settings.schedule_time:
         days = int(settings.schedule_days)
         if days < 1: days = 1
-        backup_job = schedule.every(days).days.at(settings.schedule_time).do(
-            lambda: threading.Thread(target=perform_backup_task, daemon=True).start()
-        )
-        logging.info(get_log("backup_scheduled", days, settings.schedule_time))
\ No newline at end of file
+        scheduler.add_job(BACKUP_JOB, perform_backup_task, IntervalTrigger(days * 86400, at=settings.schedule_time))
+        logging.info(get_log("backup_scheduled", days, settings.schedule_time))
+    else:
+        scheduler.remove_job(BACKUP_JOB)
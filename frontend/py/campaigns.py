@@ -0,0 +1,171 @@
+import logging
+import statistics
+import uuid
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from . import database
+from .database import get_db
+from .models import Campaign, SpeedtestResult
+from .schemas import CampaignModel
+from .dependencies import verify_session
+from .downsample import resolve_range
+from .jobs import enqueue_campaign_run, cancel_campaign_jobs
+from .scheduler import scheduler, IntervalTrigger, CronTrigger, parse_cron
+
+# --- Kampanie pomiarowe (kilka serwerów jeden po drugim) ---
+# Kampania to nazwany zestaw serwerów. Przebieg wrzuca do kolejki po jednym teście na serwer
+# z tym samym campaign_run_id, więc wyniki jednego przebiegu da się zestawić (czy wolno jest
+# u dostawcy, czy tylko na jednym serwerze Ookla). Porównanie czyta surowe wyniki przez
+# indeks (server_id, timestamp) - tylko wiersze wybranych serwerów z zakresu.
+
+router = APIRouter(dependencies=[Depends(verify_session)])
+
+COMPARE_FIELDS = ("download", "upload", "ping", "jitter")
+
+def parse_server_ids(text):
+    return [int(x) for x in (text or "").split(",") if x.strip()]
+
+def campaign_to_dict(c):
+    next_run = scheduler.next_run(_job_name(c.id))
+    return {
+        "id": c.id, "name": c.name, "server_ids": parse_server_ids(c.server_ids),
+        "schedule_hours": c.schedule_hours, "schedule_cron": c.schedule_cron, "enabled": c.enabled,
+        "next_run_time": next_run.isoformat() if next_run else None
+    }
+
+def _job_name(campaign_id):
+    return f"campaign-{campaign_id}"
+
+def run_campaign(campaign_id):
+    """Nowy przebieg kampanii; zwraca jego id albo None, gdy kampania nie istnieje / jest wyłączona."""
+    db = database.SessionLocal()
+    try:
+        c = db.query(Campaign).filter(Campaign.id == campaign_id).first()
+        if not c or not c.enabled: return None
+        server_ids = parse_server_ids(c.server_ids)
+    finally:
+        db.close()
+    run_id = str(uuid.uuid4())
+    enqueue_campaign_run(campaign_id, server_ids, run_id)
+    logging.info(f"Campaign {campaign_id}: run {run_id} queued ({len(server_ids)} servers)")
+    return run_id
+
+def schedule_campaign(c):
+    name = _job_name(c.id)
+    if c.enabled and c.schedule_cron:
+        trigger = CronTrigger(c.schedule_cron)
+    elif c.enabled and c.schedule_hours and c.schedule_hours > 0:
+        trigger = IntervalTrigger(c.schedule_hours * 3600)
+    else:
+        scheduler.remove_job(name)
+        return
+    campaign_id = c.id
+    scheduler.add_job(name, lambda: run_campaign(campaign_id), trigger)
+
+def init_campaigns():
+    db = database.SessionLocal()
+    try:
+        for c in db.query(Campaign).all(): schedule_campaign(c)
+    except Exception as e:
+        logging.error(f"Campaign schedule error: {e}")
+    finally:
+        db.close()
+
+def _spread(values):
+    """Mediana i rozrzut (kwartyle, min/max) jednej wielkości."""
+    values = sorted(v for v in values if v is not None)
+    if not values: return None
+    q1, _, q3 = statistics.quantiles(values, n=4, method="inclusive") if len(values) > 1 else (values[0],) * 3
+    return {
+        "median": round(statistics.median(values), 3),
+        "p25": round(q1, 3), "p75": round(q3, 3),
+        "min": round(values[0], 3), "max": round(values[-1], 3)
+    }
+
+def compare_servers(db, server_ids, start, end, campaign_id=None):
+    # Zawsze z listą serwerów - zapytanie idzie indeksem (server_id, timestamp), bez skanu zakresu
+    if not server_ids: return []
+    cols = [getattr(SpeedtestResult, f) for f in COMPARE_FIELDS]
+    q = db.query(SpeedtestResult.server_id, SpeedtestResult.server_name, SpeedtestResult.server_location, *cols)
+    q = q.filter(SpeedtestResult.server_id.in_(server_ids))
+    if campaign_id is not None: q = q.filter(SpeedtestResult.campaign_id == campaign_id)
+    rows = q.filter(SpeedtestResult.timestamp >= start, SpeedtestResult.timestamp < end).all()
+
+    groups = {}
+    for r in rows:
+        g = groups.get(r.server_id)
+        if g is None: g = groups[r.server_id] = {"server_id": r.server_id, "server_name": r.server_name, "server_location": r.server_location, "rows": []}
+        g["rows"].append(r)
+
+    out = []
+    for g in groups.values():
+        rows = g.pop("rows")
+        g["count"] = len(rows)
+        for i, f in enumerate(COMPARE_FIELDS):
+            g[f] = _spread([r[3 + i] for r in rows])
+        out.append(g)
+    out.sort(key=lambda g: -(g["download"]["median"] if g["download"] else 0))
+    return out
+
+@router.get("/api/campaigns")
+def list_campaigns(db: Session = Depends(get_db)):
+    return [campaign_to_dict(c) for c in db.query(Campaign).order_by(Campaign.id).all()]
+
+@router.post("/api/campaigns")
+def save_campaign(m: CampaignModel, db: Session = Depends(get_db)):
+    name = m.name.strip()
+    if not name: raise HTTPException(status_code=400, detail="Missing name")
+    if not m.server_ids: raise HTTPException(status_code=400, detail="Missing server ids")
+    cron = " ".join((m.schedule_cron or "").split()) or None
+    if cron:
+        try: parse_cron(cron)
+        except ValueError as e: raise HTTPException(status_code=400, detail=f"Invalid cron expression: {e}")
+
+    rec = db.query(Campaign).filter(Campaign.name == name).first()
+    if not rec: rec = Campaign(name=name, created_at=datetime.now()); db.add(rec)
+    rec.server_ids = ",".join(str(s) for s in dict.fromkeys(m.server_ids))
+    rec.schedule_hours = max(m.schedule_hours or 0, 0)
+    rec.schedule_cron = cron
+    rec.enabled = m.enabled if m.enabled is not None else True
+    db.commit()
+    schedule_campaign(rec)
+    return campaign_to_dict(rec)
+
+@router.delete("/api/campaigns/{campaign_id}")
+def delete_campaign(campaign_id: int, db: Session = Depends(get_db)):
+    c = db.query(Campaign).filter(Campaign.id == campaign_id).delete(synchronize_session=False)
+    db.commit()
+    if not c: raise HTTPException(status_code=404)
+    scheduler.remove_job(_job_name(campaign_id))
+    # Oczekujące pomiary usuniętej kampanii nie mają już czego porównywać
+    cancelled = cancel_campaign_jobs(db, campaign_id)
+    return {"deleted_count": c, "cancelled_jobs": cancelled}
+
+@router.post("/api/campaigns/{campaign_id}/run")
+def trigger_campaign(campaign_id: int):
+    run_id = run_campaign(campaign_id)
+    if not run_id: raise HTTPException(status_code=404, detail="Campaign not found or disabled")
+    return {"message": "Queued", "campaign_run_id": run_id}
+
+@router.get("/api/campaigns/compare")
+def compare(
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    campaign_id: int | None = None,
+    server_ids: str | None = None,
+    db: Session = Depends(get_db)
+):
+    """Mediana i rozrzut wyników per serwer: serwery kampanii (tylko jej wyniki) albo podana lista id."""
+    start, end = resolve_range(from_, to)
+    try:
+        ids = parse_server_ids(server_ids)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid server ids")
+    if campaign_id is None and not ids:
+        raise HTTPException(status_code=400, detail="Missing campaign_id or server_ids")
+    if campaign_id is not None and not ids:
+        c = db.query(Campaign).filter(Campaign.id == campaign_id).first()
+        if not c: raise HTTPException(status_code=404)
+        ids = parse_server_ids(c.server_ids)
+    return {"from": start, "to": end, "servers": compare_servers(db, ids, start, end, campaign_id)}
@@ -18,6 +18,23 @@ DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_DATABASE")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+
+# Watchdog: buforowany zapis ping_logs i retencja (surowe wpisy, agregaty minutowe)
+PING_LOG_BATCH_SIZE = int(os.getenv("PING_LOG_BATCH_SIZE", "50"))
+PING_LOG_FLUSH_INTERVAL = float(os.getenv("PING_LOG_FLUSH_INTERVAL", "5"))
+PING_LOG_RETENTION_HOURS = int(os.getenv("PING_LOG_RETENTION_HOURS", "24"))
+PING_MINUTE_RETENTION_DAYS = int(os.getenv("PING_MINUTE_RETENTION_DAYS", "30"))
+# Limity czasu pomiaru: maksymalny czas każdej fazy i brak jakiegokolwiek wyjścia z CLI [s]
+SPEEDTEST_PHASE_TIMEOUTS = {
+    "start": int(os.getenv("SPEEDTEST_START_TIMEOUT", "60")),
+    "ping": int(os.getenv("SPEEDTEST_PING_TIMEOUT", "30")),
+    "download": int(os.getenv("SPEEDTEST_DOWNLOAD_TIMEOUT", "90")),
+    "upload": int(os.getenv("SPEEDTEST_UPLOAD_TIMEOUT", "90")),
+}
+SPEEDTEST_STALL_TIMEOUT = int(os.getenv("SPEEDTEST_STALL_TIMEOUT", "30"))
+SPEEDTEST_JITTER = int(os.getenv("SPEEDTEST_JITTER_SECONDS", "0")) # losowe przesunięcie testów z harmonogramu [s]
+SERVERS_REFRESH_HOURS = int(os.getenv("SERVERS_REFRESH_HOURS", "12"))
 
 AUTH_ENABLED = os.getenv("AUTH_ENABLED", "true").lower() in ["true", "1", "yes"]
 APP_USERNAME = os.getenv("APP_USERNAME", "admin")
@@ -64,11 +81,11 @@ def setup_logging():
         logger.addHandler(file_handler)
 
     # Wyciszenie gadatliwych bibliotek
-    logging.getLogger("schedule").setLevel(logging.WARNING)
     logging.getLogger("multipart").setLevel(logging.WARNING)
     logging.getLogger("googleapiclient").setLevel(logging.WARNING)
     logging.getLogger("requests").setLevel(logging.WARNING)
     logging.getLogger("urllib3").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
 
 # --- Słownik Tłumaczeń Powiadomień ---
 NOTIF_TRANS = {
@@ -79,6 +96,8 @@ NOTIF_TRANS = {
         "watchdog_up_body": "Ping Watchdog: Cel {target} jest teraz ONLINE.",
         "watchdog_down_title": "🔴 Watchdog OFFLINE",
         "watchdog_down_body": "Ping Watchdog: Cel {target} jest teraz OFFLINE.",
+        "watchdog_digest_title": "🐶 Watchdog: podsumowanie",
+        "watchdog_digest_body": "Ping Watchdog: {target} - {outages} awarii w ciągu {minutes} min, łączny czas niedostępności {downtime}. Obecnie: {state}.",
         "test_title": "Test Powiadomienia",
         "test_body": "To jest testowe powiadomienie ze SpeedtestLog. 🚀"
     },
@@ -89,6 +108,8 @@ NOTIF_TRANS = {
         "watchdog_up_body": "Ping Watchdog: Target {target} is now ONLINE.",
         "watchdog_down_title": "🔴 Watchdog OFFLINE",
         "watchdog_down_body": "Ping Watchdog: Target {target} is now OFFLINE.",
+        "watchdog_digest_title": "🐶 Watchdog summary",
+        "watchdog_digest_body": "Ping Watchdog: {target} - {outages} outage(s) in {minutes} min, total downtime {downtime}. Now: {state}.",
         "test_title": "Notification Test",
         "test_body": "This is a test notification from SpeedtestLog. 🚀"
     }
@@ -98,10 +119,7 @@ NOTIF_TRANS = {
 LOG_TRANS = {
     "en": {
         "db_init": "⏳ Initializing database...",
-        "db_mig_startup": "🔧 Migration: Adding startup_test_enabled column...",
-        "db_mig_colors": "🔧 Migration: Adding chart color columns...",
-        "db_mig_notify": "🔧 Migration: Adding notification settings...",
-        "db_mig_lang": "🔧 Migration: Adding app_language column...",
+        "db_mig_apply": "🔧 Migration {}: {}...",
         "db_connected": "✅ Connected to database.",
         "db_unavailable": "⚠️ Database unavailable... ({}/{})",
         "backup_start": "📂 Starting scheduled Google Drive backup...",
@@ -114,9 +132,12 @@ LOG_TRANS = {
         "backup_scheduled": "🗓️ Backup scheduled every {} days at {}",
         "watchdog_start": "🐶 Starting Ping Watchdog...",
         "servers_err": "Servers error: {}",
+        "servers_refreshed": "🌐 Server list refreshed ({} servers)",
         "test_err_fallback": "⚠️ Test error on server ID {}. Attempting auto fallback...",
         "test_err_auto": "❌ Speedtest Error (Auto Fallback): {}",
         "test_err": "❌ Speedtest Error: {}",
+        "test_phase_timeout": "⏱️ Speedtest stalled in phase '{}' - process killed",
+        "test_cancelled": "🛑 Speedtest cancelled",
         "result_format_err": "❌ Invalid result format: {}",
         "test_result": "✅ Speedtest Result: ↓ {} Mbps",
         "test_crit_err": "❌ Critical Speedtest Error: {}",
@@ -134,10 +155,7 @@ LOG_TRANS = {
     },
     "pl": {
         "db_init": "⏳ Inicjalizacja bazy danych...",
-        "db_mig_startup": "🔧 Migracja: Dodawanie kolumny startup_test_enabled...",
-        "db_mig_colors": "🔧 Migracja: Dodawanie kolumn kolorów wykresów...",
-        "db_mig_notify": "🔧 Migracja: Dodawanie ustawień powiadomień...",
-        "db_mig_lang": "🔧 Migracja: Dodawanie kolumny app_language...",
+        "db_mig_apply": "🔧 Migracja {}: {}...",
         "db_connected": "✅ Połączono z bazą danych.",
         "db_unavailable": "⚠️ Baza niedostępna... ({}/{})",
         "backup_start": "📂 Rozpoczynanie zaplanowanego backupu do Google Drive...",
@@ -150,9 +168,12 @@ LOG_TRANS = {
         "backup_scheduled": "🗓️ Zaplanowano backup co {} dni o {}",
         "watchdog_start": "🐶 Uruchamianie Ping Watchdog...",
         "servers_err": "Błąd serwerów: {}",
+        "servers_refreshed": "🌐 Odświeżono listę serwerów ({} serwerów)",
         "test_err_fallback": "⚠️ Błąd testu na serwerze ID {}. Próba automatycznego wyboru serwera...",
         "test_err_auto": "❌ Błąd Speedtestu (Auto Fallback): {}",
         "test_err": "❌ Błąd Speedtestu: {}",
+        "test_phase_timeout": "⏱️ Speedtest zawiesił się w fazie '{}' - proces zatrzymany",
+        "test_cancelled": "🛑 Speedtest anulowany",
         "result_format_err": "❌ Nieprawidłowy format wyniku: {}",
         "test_result": "✅ Wynik Speedtestu: ↓ {} Mbps",
         "test_crit_err": "❌ Krytyczny błąd Speedtestu: {}",
@@ -1,12 +1,12 @@
 import time
 import logging
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.exc import OperationalError
 
 # ZMIANA: Import relatywny
-from .config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME, get_log
+from .config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME, DB_POOL_SIZE, get_log
 
 SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
@@ -28,113 +28,24 @@ def initialize_db(app_state, max_retries=10, delay=5):
     logging.info(get_log("db_init"))
     
     global engine, SessionLocal
-    engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
+    # Endpointy API to zwykłe funkcje "def" wykonywane w puli wątków, więc pula połączeń
+    # musi wystarczyć dla równoległych żądań i wątków w tle
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True, pool_size=DB_POOL_SIZE, max_overflow=DB_POOL_SIZE * 2, pool_recycle=3600)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     
     app_state["engine"] = engine
     app_state["SessionLocal"] = SessionLocal
 
-    # ZMIANA: Import relatywny modeli wewnątrz funkcji
+    # ZMIANA: Import relatywny modeli wewnątrz funkcji (rejestracja tabel w Base.metadata)
     from . import models 
+    from .migrations import run_migrations
 
     for i in range(max_retries):
         try:
-            with engine.connect() as connection:
-                Base.metadata.create_all(bind=engine)
-                
-                # --- Migracje (skrócone dla czytelności, logika bez zmian) ---
-                try:
-                    connection.execute(text("SELECT startup_test_enabled FROM app_settings LIMIT 1"))
-                except Exception:
-                    logging.info(get_log("db_mig_startup"))
-                    connection.execute(text("ALTER TABLE app_settings ADD COLUMN startup_test_enabled BOOLEAN DEFAULT 1"))
-                    connection.commit()
-                
-                try:
-                    connection.execute(text("SELECT chart_color_download FROM app_settings LIMIT 1"))
-                except Exception:
-                    logging.info(get_log("db_mig_colors"))
-                    connection.execute(text("ALTER TABLE app_settings ADD COLUMN chart_color_download VARCHAR(20) DEFAULT NULL"))
-                    connection.execute(text("ALTER TABLE app_settings ADD COLUMN chart_color_upload VARCHAR(20) DEFAULT NULL"))
-                    connection.execute(text("ALTER TABLE app_settings ADD COLUMN chart_color_ping VARCHAR(20) DEFAULT NULL"))
-                    connection.execute(text("ALTER TABLE app_settings ADD COLUMN chart_color_jitter VARCHAR(20) DEFAULT NULL"))
-                    connection.commit()
-
-                try:
-                    connection.execute(text("SELECT app_language FROM app_settings LIMIT 1"))
-                except Exception:
-                    logging.info(get_log("db_mig_lang"))
-                    connection.execute(text("ALTER TABLE app_settings ADD COLUMN app_language VARCHAR(5) DEFAULT 'en'"))
-                    connection.commit()
-
-                try:
-                    connection.execute(text("SELECT chart_color_lat_dl_low FROM app_settings LIMIT 1"))
-                except Exception:
-                    logging.info("🔧 Migration: Adding latency chart color columns...")
-                    connection.execute(text("ALTER TABLE app_settings ADD COLUMN chart_color_lat_dl_low VARCHAR(20) DEFAULT NULL"))
-                    connection.execute(text("ALTER TABLE app_settings ADD COLUMN chart_color_lat_dl_high VARCHAR(20) DEFAULT NULL"))
-                    connection.execute(text("ALTER TABLE app_settings ADD COLUMN chart_color_lat_ul_low VARCHAR(20) DEFAULT NULL"))
-                    connection.execute(text("ALTER TABLE app_settings ADD COLUMN chart_color_lat_ul_high VARCHAR(20) DEFAULT NULL"))
-                    connection.commit()
-
-                try:
-                    connection.execute(text("SELECT chart_color_ping_watchdog FROM app_settings LIMIT 1"))
-                except Exception:
-                    logging.info("🔧 Migration: Adding chart_color_ping_watchdog column...")
-                    connection.execute(text("ALTER TABLE app_settings ADD COLUMN chart_color_ping_watchdog VARCHAR(20) DEFAULT NULL"))
-                    connection.commit()
-
-                try:
-                    connection.execute(text("SELECT display_name FROM oidc_settings LIMIT 1"))
-                except Exception:
-                    logging.info("🔧 Migration: Adding display_name to oidc_settings...")
-                    try:
-                        connection.execute(text("ALTER TABLE oidc_settings ADD COLUMN display_name VARCHAR(50) DEFAULT 'SSO Login'"))
-                        connection.commit()
-                    except Exception as e:
-                        logging.warning(f"OIDC migration warning: {e}")
-
-                try:
-                    connection.execute(text("SELECT discovery_url FROM oidc_settings LIMIT 1"))
-                except Exception:
-                    logging.info("🔧 Migration: Adding discovery_url to oidc_settings...")
-                    try:
-                        connection.execute(text("ALTER TABLE oidc_settings ADD COLUMN discovery_url VARCHAR(500) DEFAULT NULL"))
-                        connection.commit()
-                    except Exception as e:
-                        logging.warning(f"OIDC migration warning: {e}")
-
-                try:
-                    connection.execute(text("SELECT pushover_user_key FROM notification_settings LIMIT 1"))
-                except Exception:
-                    logging.info("🔧 Migration: Adding Pushover columns...")
-                    try:
-                        connection.execute(text("ALTER TABLE notification_settings ADD COLUMN pushover_user_key VARCHAR(50) DEFAULT NULL"))
-                        connection.execute(text("ALTER TABLE notification_settings ADD COLUMN pushover_api_token VARCHAR(50) DEFAULT NULL"))
-                        connection.commit()
-                    except Exception as e:
-                        logging.warning(f"Pushover migration warning: {e}")
-
-                try:
-                    with SessionLocal() as session:
-                        ns = session.query(models.NotificationSettings).filter(models.NotificationSettings.id == 1).first()
-                        if not ns:
-                            session.add(models.NotificationSettings(id=1, enabled=False, provider="browser"))
-                            session.commit()
-                        
-                        try:
-                            oidc = session.query(models.OIDCSettings).filter(models.OIDCSettings.id == 1).first()
-                            if not oidc:
-                                session.add(models.OIDCSettings(id=1, enabled=False, display_name="Zaloguj przez SSO"))
-                                session.commit()
-                        except Exception as e:
-                             logging.warning(f"OIDC init warning: {e}")
-
-                except Exception as e:
-                    logging.warning(f"Settings init warning: {e}")
-
-                logging.info(get_log("db_connected"))
-                return
+            # Jedno zapytanie o wersję schematu; migracje tylko gdy baza jest nieaktualna
+            version = run_migrations(engine)
+            logging.info(get_log("db_connected") + f" (schema v{version})")
+            return
         except OperationalError:
             logging.warning(get_log("db_unavailable", i+1, max_retries))
             if i < max_retries - 1:
@@ -0,0 +1,38 @@
+import threading
+import secrets
+import zlib
+from fastapi import Request, Response
+
+# --- Wersja danych w pamięci procesu (ETag / 304) ---
+# Licznik jest podbijany przy każdym zapisie wyników, ustawień lub pingów.
+# Odpytywane endpointy liczą z niego ETag i odpowiadają 304 bez zapytania do bazy.
+
+_lock = threading.Lock()
+_epoch = secrets.token_hex(4) # zmienia się przy restarcie, więc stare ETagi tracą ważność
+_versions = {"results": 0, "settings": 0, "ping": 0, "targets": 0, "servers": 0}
+
+def bump(*names):
+    with _lock:
+        for name in names:
+            _versions[name] += 1
+
+def current(name):
+    with _lock:
+        return _versions[name]
+
+def etag_for(names, variant: str = ""):
+    with _lock:
+        parts = [str(_versions[n]) for n in names]
+    if variant:
+        parts.append(format(zlib.crc32(variant.encode("utf-8")), "x"))
+    return f'W/"{_epoch}-{"-".join(parts)}"'
+
+def check_not_modified(request: Request, response: Response, *names, variant: str = ""):
+    """Ustawia ETag na odpowiedzi; zwraca gotową odpowiedź 304, jeśli klient ma aktualne dane."""
+    etag = etag_for(names, variant)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    inm = request.headers.get("if-none-match")
+    if inm and etag in [t.strip() for t in inm.split(",")]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,150 @@
+import math
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import func, literal_column
+
+# --- Downsampling serii czasowych dla wykresów ---
+# Tryb "buckets" agreguje po stronie bazy (GROUP BY kubełka czasu), więc do Pythona
+# trafia zawsze ~points wierszy niezależnie od długości zakresu.
+# Tryb "lttb" (Largest-Triangle-Three-Buckets) zachowuje kształt wykresu. Surowe punkty czyta
+# tylko, gdy w zakresie jest ich najwyżej LTTB_OVERSAMPLE na punkt wyniku; przy dłuższych
+# zakresach kandydatami są min/max kubełków policzone przez bazę (szczyty zostają zachowane).
+
+DEFAULT_RANGE = timedelta(hours=24)
+LTTB_OVERSAMPLE = 8
+
+def resolve_range(start: datetime | None, end: datetime | None):
+    end = end or datetime.now()
+    start = start or end - DEFAULT_RANGE
+    if start >= end:
+        raise HTTPException(status_code=400, detail="Invalid range")
+    return start, end
+
+def bucket_seconds_for(start: datetime, end: datetime, points: int):
+    return max(1, math.ceil((end - start).total_seconds() / points))
+
+def _num(v):
+    return round(float(v), 3) if v is not None else None
+
+def bucketed_series(q, model, columns, start, end, points):
+    """Zwraca min/avg/max każdej kolumny w kubełkach czasu wyliczonych przez bazę."""
+    size = bucket_seconds_for(start, end, points)
+    bucket = func.floor(func.unix_timestamp(model.timestamp) / size).label("bucket")
+    aggs = []
+    for c in columns:
+        col = getattr(model, c)
+        aggs += [func.min(col), func.avg(col), func.max(col)]
+
+    rows = (
+        q.with_entities(bucket, *aggs)
+        .filter(model.timestamp >= start, model.timestamp < end)
+        .group_by(literal_column("bucket")) # alias: parametr rozmiaru kubełka występuje tylko raz
+        .order_by(literal_column("bucket"))
+        .all()
+    )
+
+    series = {c: {"min": [], "avg": [], "max": []} for c in columns}
+    times = []
+    for row in rows:
+        times.append(datetime.fromtimestamp(int(row[0]) * size))
+        for i, c in enumerate(columns):
+            series[c]["min"].append(_num(row[1 + i * 3]))
+            series[c]["avg"].append(_num(row[2 + i * 3]))
+            series[c]["max"].append(_num(row[3 + i * 3]))
+
+    return {"mode": "buckets", "bucket_seconds": size, "time": times, "series": series}
+
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets dla listy (x, y) posortowanej po x."""
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return points
+
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Średnia następnego kubełka jako trzeci wierzchołek trójkąta
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_len = avg_end - avg_start
+        avg_x = sum(p[0] for p in points[avg_start:avg_end]) / avg_len
+        avg_y = sum(p[1] for p in points[avg_start:avg_end]) / avg_len
+
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        ax, ay = points[a]
+
+        max_area = -1.0
+        next_a = range_start
+        for j in range(range_start, range_end):
+            bx, by = points[j]
+            area = abs((ax - avg_x) * (by - ay) - (ax - bx) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                next_a = j
+
+        sampled.append(points[next_a])
+        a = next_a
+
+    sampled.append(points[-1])
+    return sampled
+
+def _raw_candidates(q, model, columns):
+    rows = q.with_entities(model.timestamp, *[getattr(model, c) for c in columns]).order_by(model.timestamp).all()
+    return {
+        c: [(r[0].timestamp(), float(r[1 + i])) for r in rows if r[1 + i] is not None]
+        for i, c in enumerate(columns)
+    }
+
+def _bucket_candidates(q, model, columns, start, end, buckets):
+    """Min i max każdej kolumny w kubełku (w średnim czasie kubełka) jako kandydaci dla LTTB."""
+    size = bucket_seconds_for(start, end, buckets)
+    epoch = func.unix_timestamp(model.timestamp)
+    bucket = func.floor(epoch / size).label("bucket")
+    aggs = []
+    for c in columns:
+        col = getattr(model, c)
+        aggs += [func.min(col), func.max(col)]
+
+    rows = (
+        q.with_entities(bucket, func.avg(epoch), *aggs)
+        .group_by(literal_column("bucket"))
+        .order_by(literal_column("bucket"))
+        .all()
+    )
+
+    out = {c: [] for c in columns}
+    for row in rows:
+        x = float(row[1])
+        for i, c in enumerate(columns):
+            lo, hi = row[2 + i * 2], row[3 + i * 2]
+            if lo is None: continue
+            out[c].append((x, float(lo)))
+            if hi != lo: out[c].append((x, float(hi)))
+    return out
+
+def lttb_series(q, model, columns, start, end, points):
+    """Downsampluje każdą serię osobno; liczba kandydatów jest ograniczona do ~points * LTTB_OVERSAMPLE."""
+    q = q.filter(model.timestamp >= start, model.timestamp < end)
+    budget = points * LTTB_OVERSAMPLE
+    # COUNT po indeksie timestamp jest tani w porównaniu z pobraniem wierszy
+    if q.with_entities(func.count()).scalar() <= budget:
+        candidates = _raw_candidates(q, model, columns)
+    else:
+        # Do dwóch kandydatów (min, max) na kubełek
+        candidates = _bucket_candidates(q, model, columns, start, end, budget // 2)
+
+    series = {
+        c: [{"time": datetime.fromtimestamp(x), "value": _num(y)} for x, y in lttb(candidates[c], points)]
+        for c in columns
+    }
+    return {"mode": "lttb", "series": series}
+
+def downsample(q, model, columns, start, end, points, mode):
+    if mode == "buckets":
+        return bucketed_series(q, model, columns, start, end, points)
+    if mode == "lttb":
+        return lttb_series(q, model, columns, start, end, points)
+    raise HTTPException(status_code=400, detail="Unknown mode")
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import threading
+from datetime import datetime
+
+# --- Kanał zdarzeń (Server-Sent Events) ---
+# Wątki w tle (watchdog, speedtest, scheduler) publikują typowane zdarzenia,
+# a każdy otwarty /api/events ma własną kolejkę w pętli asyncio uvicorna.
+
+QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+
+_lock = threading.Lock()
+_subscribers = set()
+
+def _json_default(o):
+    if isinstance(o, datetime):
+        return o.isoformat()
+    return str(o)
+
+def _put(queue, message):
+    if queue.full():
+        # Wolny klient: gubimy najstarsze zdarzenie zamiast blokować publikującego
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(message)
+
+def publish(event_type: str, data=None):
+    """Bezpieczne do wywołania z dowolnego wątku."""
+    message = f"event: {event_type}\ndata: {json.dumps(data or {}, default=_json_default)}\n\n"
+    with _lock:
+        subscribers = list(_subscribers)
+    for loop, queue in subscribers:
+        try:
+            loop.call_soon_threadsafe(_put, queue, message)
+        except RuntimeError:
+            # Pętla została zamknięta - subskrybent zniknie przy wyjściu ze stream()
+            pass
+
+async def stream(request):
+    """Generator SSE dla StreamingResponse; kończy się po rozłączeniu klienta."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    entry = (loop, queue)
+    with _lock:
+        _subscribers.add(entry)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                yield message
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+    finally:
+        with _lock:
+            _subscribers.discard(entry)
@@ -0,0 +1,151 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+from . import database
+
+# --- Strumieniowy eksport danych ---
+# Wiersze są czytane kursorem po stronie serwera (yield_per => stream_results),
+# a odpowiedź budowana porcjami, więc pamięć nie rośnie z wielkością tabeli.
+
+EXPORT_BATCH_SIZE = 1000
+CSV_CHUNK_BYTES = 64 * 1024
+
+def iter_rows(model, columns, start: datetime | None = None, end: datetime | None = None, filters=(), batch_size=EXPORT_BATCH_SIZE):
+    """Generator krotek z własną sesją - sesja z get_db jest zamykana przed końcem streamingu."""
+    db = database.SessionLocal()
+    try:
+        q = db.query(*[getattr(model, c) for c in columns])
+        if start: q = q.filter(model.timestamp >= start)
+        if end: q = q.filter(model.timestamp < end)
+        if filters: q = q.filter(*filters)
+        for row in q.order_by(model.timestamp.desc()).yield_per(batch_size):
+            yield row
+    finally:
+        db.close()
+
+def csv_chunks(columns, rows, gzip=False):
+    """Zamienia strumień wierszy na porcje CSV (opcjonalnie skompresowane gzipem)."""
+    compressor = zlib.compressobj(wbits=31) if gzip else None
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+
+    def flush():
+        data = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+        return compressor.compress(data) if compressor else data
+
+    # Nagłówek od razu jako osobna porcja - klient dostaje pierwszy bajt przed pierwszym wierszem.
+    # Z gzipem Z_SYNC_FLUSH wypycha go z kompresora bez zamykania strumienia.
+    header = flush()
+    if compressor: header += compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield header
+
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= CSV_CHUNK_BYTES:
+            chunk = flush()
+            if chunk: yield chunk
+
+    chunk = flush()
+    if compressor: chunk += compressor.flush()
+    if chunk: yield chunk
+
+# --- Eksport kolumnowy (Parquet / Arrow IPC) ---
+# pyarrow jest importowany leniwie, żeby brak biblioteki nie blokował startu aplikacji.
+
+COLUMNAR_FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+DICTIONARY_COLUMNS = {"server_name", "server_location", "isp", "target"}
+COLUMNAR_BATCH_SIZE = 65536
+
+class _ChunkSink:
+    """Minimalny plik tylko do zapisu - zbiera bajty, które generator oddaje klientowi."""
+    def __init__(self):
+        self.chunks = []
+        self.pos = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def arrow_schema(model, columns):
+    import pyarrow as pa
+    from sqlalchemy import Boolean, DateTime, Float, Integer
+
+    fields = []
+    for name in columns:
+        col_type = model.__table__.columns[name].type
+        if name in DICTIONARY_COLUMNS:
+            t = pa.dictionary(pa.int32(), pa.string())
+        elif isinstance(col_type, DateTime):
+            t = pa.timestamp("us")
+        elif isinstance(col_type, Boolean):
+            t = pa.bool_()
+        elif isinstance(col_type, Float):
+            t = pa.float64()
+        elif isinstance(col_type, Integer):
+            t = pa.int64()
+        else:
+            t = pa.string()
+        fields.append(pa.field(name, t))
+    return pa.schema(fields)
+
+def columnar_chunks(model, columns, rows, fmt, batch_size=COLUMNAR_BATCH_SIZE):
+    """Zapisuje wiersze w partiach (row group / record batch) i oddaje gotowe bajty po każdej partii."""
+    import pyarrow as pa
+
+    schema = arrow_schema(model, columns)
+    sink = _ChunkSink()
+    out = pa.PythonFile(sink, mode="w")
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(out, schema, compression="zstd", use_dictionary=[c for c in columns if c in DICTIONARY_COLUMNS])
+    else:
+        writer = pa.ipc.new_stream(out, schema)
+
+    def write(batch_rows):
+        values = list(zip(*batch_rows))
+        arrays = []
+        for i, field in enumerate(schema):
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values[i], pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values[i], field.type))
+        batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+        if fmt == "parquet":
+            writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            writer.write_batch(batch)
+
+    batch_rows = []
+    for row in rows:
+        batch_rows.append(row)
+        if len(batch_rows) >= batch_size:
+            write(batch_rows)
+            batch_rows = []
+            yield sink.drain()
+    if batch_rows: write(batch_rows)
+    writer.close()
+    yield sink.drain()
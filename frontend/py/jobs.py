@@ -0,0 +1,224 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from . import database
+from . import events
+from .models import SpeedtestJob
+from .speedtest import run_speed_test_and_save, SpeedtestError, SpeedtestCancelled
+
+# --- Kolejka pomiarów (tabela speedtest_jobs) ---
+# Każde żądanie testu (ręczne, z harmonogramu, startowe) to wiersz w speedtest_jobs.
+# Jeden wątek-worker wykonuje je po kolei, więc testy nigdy nie biegną równolegle, a żadne
+# żądanie nie przepada. Identyczne oczekujące zadanie (ten sam serwer i język) nie jest dublowane.
+# Zadania "running" przerwane restartem wracają przy starcie do kolejki.
+# Postęp trwającego pomiaru (faza, %, przepływność) idzie zdarzeniami "progress" przez /api/events
+# i jest dołączany do /api/jobs/{id}; zadanie można anulować w kolejce albo w trakcie pomiaru.
+
+JOB_STATES = ("queued", "running", "done", "failed", "cancelled")
+JOB_RETENTION = timedelta(days=30)
+IDLE_WAIT = 30
+
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_worker = None
+_cancel = {} # id trwającego zadania -> threading.Event
+_progress = {} # id trwającego zadania -> ostatnie zdarzenie postępu
+
+def job_to_dict(job):
+    return {
+        "id": job.id, "status": job.status, "source": job.source,
+        "server_id": job.server_id, "language": job.language,
+        "campaign_id": job.campaign_id, "campaign_run_id": job.campaign_run_id,
+        "created_at": job.created_at, "started_at": job.started_at, "finished_at": job.finished_at,
+        "result_id": job.result_id, "error": job.error,
+        "progress": _progress.get(job.id) if job.status == "running" else None
+    }
+
+def _publish(job):
+    events.publish("job", job_to_dict(job))
+
+def enqueue_test(server_id=None, language=None, source="manual", campaign_id=None, campaign_run_id=None):
+    """Dodaje zadanie testu albo zwraca identyczne oczekujące. Zwraca (zadanie jako dict, czy zdublowane).
+    Zadania kampanii nie są łączone z innymi - każde należy do swojego przebiegu."""
+    with _lock:
+        db = database.SessionLocal()
+        try:
+            if campaign_run_id is None:
+                q = db.query(SpeedtestJob).filter(SpeedtestJob.status == "queued", SpeedtestJob.campaign_run_id.is_(None))
+                q = q.filter(SpeedtestJob.server_id.is_(None) if server_id is None else SpeedtestJob.server_id == server_id)
+                q = q.filter(SpeedtestJob.language.is_(None) if language is None else SpeedtestJob.language == language)
+                job = q.order_by(SpeedtestJob.created_at).first()
+                if job: return job_to_dict(job), True
+
+            job = SpeedtestJob(
+                server_id=server_id, language=language, source=source, status="queued", created_at=datetime.now(),
+                campaign_id=campaign_id, campaign_run_id=campaign_run_id
+            )
+            db.add(job)
+            db.commit()
+            data = job_to_dict(job)
+        finally:
+            db.close()
+    events.publish("job", data)
+    _wakeup.set()
+    return data, False
+
+def enqueue_campaign_run(campaign_id, server_ids, campaign_run_id):
+    """Zadania dla wszystkich serwerów kampanii w jednej transakcji - worker wykona je jedno po drugim."""
+    with _lock:
+        db = database.SessionLocal()
+        try:
+            now = datetime.now()
+            jobs = [
+                SpeedtestJob(
+                    server_id=sid, source="campaign", status="queued", created_at=now + timedelta(microseconds=i),
+                    campaign_id=campaign_id, campaign_run_id=campaign_run_id
+                )
+                for i, sid in enumerate(server_ids)
+            ]
+            db.add_all(jobs)
+            db.commit()
+            data = [job_to_dict(j) for j in jobs]
+        finally:
+            db.close()
+    for d in data: events.publish("job", d)
+    _wakeup.set()
+    return data
+
+def get_job(db, job_id):
+    return db.query(SpeedtestJob).filter(SpeedtestJob.id == job_id).first()
+
+def cancel_job(db, job_id):
+    """Anuluje zadanie: oczekujące od razu, trwające - przez przerwanie procesu CLI.
+    Zwraca zadanie albo None, gdy nie istnieje."""
+    job = get_job(db, job_id)
+    if not job: return None
+    if job.status == "queued":
+        cancelled = db.query(SpeedtestJob).filter(SpeedtestJob.id == job_id, SpeedtestJob.status == "queued").update(
+            {"status": "cancelled", "finished_at": datetime.now()}, synchronize_session="fetch"
+        )
+        db.commit()
+        db.refresh(job)
+        if cancelled:
+            _publish(job)
+            return job
+        # Worker podjął zadanie między odczytem a aktualizacją - przerywamy je jak trwające
+    if job.status == "running":
+        event = _cancel.get(job_id)
+        if event: event.set()
+    return job
+
+def cancel_campaign_jobs(db, campaign_id):
+    """Anuluje oczekujące zadania kampanii (np. po jej usunięciu); zwraca ich liczbę."""
+    jobs = db.query(SpeedtestJob).filter(SpeedtestJob.campaign_id == campaign_id, SpeedtestJob.status == "queued").all()
+    now = datetime.now()
+    cancelled = []
+    for job in jobs:
+        # Warunek na status jak w cancel_job - zadanie podjęte w międzyczasie zostaje
+        if db.query(SpeedtestJob).filter(SpeedtestJob.id == job.id, SpeedtestJob.status == "queued").update(
+            {"status": "cancelled", "finished_at": now}, synchronize_session="fetch"
+        ):
+            cancelled.append(job)
+    db.commit()
+    for job in cancelled:
+        db.refresh(job)
+        _publish(job)
+    return len(cancelled)
+
+def _claim_next(db):
+    job = (
+        db.query(SpeedtestJob)
+        .filter(SpeedtestJob.status == "queued")
+        .order_by(SpeedtestJob.created_at)
+        .first()
+    )
+    if not job: return None
+    # Event anulowania istnieje, zanim zadanie stanie się "running" - cancel_job, który zobaczy
+    # ten stan (albo przegra z podjęciem warunkową aktualizację), zawsze ma co ustawić
+    _cancel[job.id] = threading.Event()
+    # Warunek na status chroni przed podwójnym podjęciem, gdyby działały dwa procesy
+    claimed = db.query(SpeedtestJob).filter(SpeedtestJob.id == job.id, SpeedtestJob.status == "queued").update(
+        {"status": "running", "started_at": datetime.now()}, synchronize_session="fetch"
+    )
+    db.commit()
+    if not claimed:
+        _cancel.pop(job.id, None)
+        return None
+    return job
+
+def _finish(db, job, status, result_id=None, error=None):
+    job.status = status
+    job.finished_at = datetime.now()
+    job.result_id = result_id
+    job.error = error[:500] if error else None
+    db.commit()
+    _publish(job)
+
+def _run_one():
+    db = database.SessionLocal()
+    try:
+        job = _claim_next(db)
+        if not job: return False
+        db.refresh(job)
+        _publish(job)
+        job_id = job.id
+        cancel = _cancel[job_id]
+
+        def on_progress(progress):
+            _progress[job_id] = progress
+            events.publish("progress", {"job_id": job_id, **progress})
+
+        try:
+            res = run_speed_test_and_save(
+                job.server_id, job.language, on_progress, cancel,
+                campaign_id=job.campaign_id, campaign_run_id=job.campaign_run_id
+            )
+            _finish(db, job, "done", result_id=res.id)
+        except SpeedtestCancelled as e:
+            _finish(db, job, "cancelled", error=str(e))
+        except SpeedtestError as e:
+            _finish(db, job, "failed", error=str(e))
+        except Exception as e:
+            logging.error(f"Speedtest job {job.id} error: {e}")
+            _finish(db, job, "failed", error=str(e))
+        finally:
+            _cancel.pop(job_id, None)
+            _progress.pop(job_id, None)
+        return True
+    finally:
+        db.close()
+
+def _recover(db):
+    """Zadania przerwane restartem wracają do kolejki; stare zakończone są usuwane."""
+    requeued = db.query(SpeedtestJob).filter(SpeedtestJob.status == "running").update(
+        {"status": "queued", "started_at": None}, synchronize_session=False
+    )
+    db.query(SpeedtestJob).filter(
+        SpeedtestJob.status.in_(("done", "failed", "cancelled")),
+        SpeedtestJob.created_at < datetime.now() - JOB_RETENTION
+    ).delete(synchronize_session=False)
+    db.commit()
+    if requeued: logging.info(f"Speedtest queue: {requeued} interrupted job(s) requeued")
+
+def _work():
+    db = database.SessionLocal()
+    try:
+        _recover(db)
+    except Exception as e:
+        logging.error(f"Speedtest queue recovery error: {e}")
+    finally:
+        db.close()
+
+    while True:
+        _wakeup.clear()
+        try:
+            if _run_one(): continue
+        except Exception as e:
+            logging.error(f"Speedtest queue error: {e}")
+        _wakeup.wait(IDLE_WAIT)
+
+def start_worker():
+    global _worker
+    if _worker is None:
+        _worker = threading.Thread(target=_work, daemon=True)
+        _worker.start()
@@ -1,7 +1,5 @@
 import os
 import threading
-import time
-import schedule
 import uvicorn
 import logging
 from contextlib import asynccontextmanager
@@ -12,15 +10,23 @@ from fastapi.staticfiles import StaticFiles
 # ZMIANA: Importy relatywne (z kropką na początku)
 from .config import setup_logging, AUTH_ENABLED, SESSION_COOKIE_NAME, SESSION_SECRET
 from .database import initialize_db
-from .speedtest import get_closest_servers, init_scheduler, scheduler_lock
+from .speedtest import init_scheduler
+from .servers import server_catalogue
+from .scheduler import scheduler
 from .backup import setup_backup_schedule
 from .watchdog import run_ping_watchdog
+from .ping_writer import ping_log_writer
+from .retention import setup_retention_schedule
+from .notifications import dispatcher
+from .jobs import start_worker
+from .campaigns import init_campaigns
 
 # ZMIANA: Importy routerów z obecnego pakietu
 from . import auth
 from . import results
 from . import settings
 from . import system
+from . import campaigns
 
 setup_logging()
 
@@ -36,15 +42,6 @@ app_state = {
     "latest_ping_status": {"online": None, "latency": 0, "loss": 0, "target": "init"}
 }
 
-def run_schedule_loop():
-    while True: 
-        try:
-            with scheduler_lock:
-                schedule.run_pending()
-        except Exception as e:
-            logging.error(f"CRITICAL: Scheduler loop error: {e}")
-        time.sleep(1)
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     try:
@@ -55,15 +52,22 @@ async def lifespan(app: FastAPI):
 
     initialize_db(app_state, 10, 5) 
     
-    threading.Thread(target=get_closest_servers, daemon=True).start()
-    threading.Thread(target=run_schedule_loop, daemon=True).start()
     threading.Thread(target=run_ping_watchdog, daemon=True).start()
+    dispatcher.start()
+    start_worker()
     
     init_scheduler()
     setup_backup_schedule()
+    setup_retention_schedule()
+    server_catalogue.start()
+    init_campaigns()
+    scheduler.start()
     
     yield
 
+    # Zapis wpisów watchdoga, które czekają jeszcze w buforze
+    ping_log_writer.flush()
+
 app = FastAPI(lifespan=lifespan)
 
 # Pliki statyczne są w głównym katalogu kontenera (/app)
@@ -74,6 +78,7 @@ app.include_router(auth.router)
 app.include_router(results.router)
 app.include_router(settings.router)
 app.include_router(system.router)
+app.include_router(campaigns.router)
 
 # --- Pomocnicza funkcja sprawdzania Auth ---
 def is_authenticated(request: Request):
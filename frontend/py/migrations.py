@@ -0,0 +1,129 @@
+import logging
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+from .config import get_log
+from .database import Base
+
+# --- Wersjonowane migracje schematu ---
+# Każda migracja to (wersja, opis, kroki). Krok to SQL albo funkcja przyjmująca połączenie.
+# Przy aktualnym schemacie start kosztuje jedno zapytanie: SELECT MAX(version).
+# Nowe kolumny / tabele / indeksy = nowy wpis na końcu listy, nigdy edycja istniejącego.
+# DDL w MariaDB robi niejawny COMMIT, więc kroki używają IF NOT EXISTS - przerwaną migrację
+# można bezpiecznie powtórzyć.
+
+def create_tables(*names):
+    def step(conn):
+        for name in names:
+            Base.metadata.tables[name].create(bind=conn, checkfirst=True)
+    return step
+
+MIGRATIONS = [
+    (1, "Base schema and legacy columns", [
+        create_tables("speedtest_results", "ping_logs", "app_settings", "notification_settings", "drive_backup_settings", "oidc_settings"),
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS startup_test_enabled BOOLEAN DEFAULT 1",
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS chart_color_download VARCHAR(20) DEFAULT NULL",
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS chart_color_upload VARCHAR(20) DEFAULT NULL",
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS chart_color_ping VARCHAR(20) DEFAULT NULL",
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS chart_color_jitter VARCHAR(20) DEFAULT NULL",
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS app_language VARCHAR(5) DEFAULT 'en'",
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS chart_color_lat_dl_low VARCHAR(20) DEFAULT NULL",
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS chart_color_lat_dl_high VARCHAR(20) DEFAULT NULL",
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS chart_color_lat_ul_low VARCHAR(20) DEFAULT NULL",
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS chart_color_lat_ul_high VARCHAR(20) DEFAULT NULL",
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS chart_color_ping_watchdog VARCHAR(20) DEFAULT NULL",
+        "ALTER TABLE oidc_settings ADD COLUMN IF NOT EXISTS display_name VARCHAR(50) DEFAULT 'SSO Login'",
+        "ALTER TABLE oidc_settings ADD COLUMN IF NOT EXISTS discovery_url VARCHAR(500) DEFAULT NULL",
+        "ALTER TABLE notification_settings ADD COLUMN IF NOT EXISTS pushover_user_key VARCHAR(50) DEFAULT NULL",
+        "ALTER TABLE notification_settings ADD COLUMN IF NOT EXISTS pushover_api_token VARCHAR(50) DEFAULT NULL",
+        "INSERT IGNORE INTO notification_settings (id, enabled, provider) VALUES (1, 0, 'browser')",
+        "INSERT IGNORE INTO oidc_settings (id, enabled, display_name) VALUES (1, 0, 'Zaloguj przez SSO')",
+    ]),
+    (2, "Rollup and tombstone tables", [
+        create_tables("speedtest_rollups", "ping_rollups", "result_tombstones"),
+    ]),
+    (3, "Timestamp indexes", [
+        "CREATE INDEX IF NOT EXISTS ix_speedtest_results_timestamp ON speedtest_results (timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_ping_logs_timestamp ON ping_logs (timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_ping_logs_target_timestamp ON ping_logs (target, timestamp)",
+    ]),
+    (4, "Watchdog targets", [
+        create_tables("watchdog_targets"),
+    ]),
+    (5, "Watchdog probe types", [
+        "ALTER TABLE watchdog_targets ADD COLUMN IF NOT EXISTS probe_type VARCHAR(10) NOT NULL DEFAULT 'icmp'",
+        "ALTER TABLE watchdog_targets ADD COLUMN IF NOT EXISTS port INT NOT NULL DEFAULT 0",
+        "ALTER TABLE watchdog_targets ADD COLUMN IF NOT EXISTS resolver VARCHAR(255) DEFAULT NULL",
+        "ALTER TABLE watchdog_targets DROP INDEX IF EXISTS host",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_watchdog_target ON watchdog_targets (probe_type, host, port)",
+        "ALTER TABLE ping_logs ADD COLUMN IF NOT EXISTS probe_type VARCHAR(10) DEFAULT 'icmp'",
+    ]),
+    (6, "Watchdog outages", [
+        create_tables("outages"),
+    ]),
+    (7, "Latency sketches", [
+        create_tables("latency_sketches"),
+    ]),
+    (8, "Notification fan-out providers", [
+        "ALTER TABLE notification_settings ADD COLUMN IF NOT EXISTS providers VARCHAR(100) DEFAULT NULL",
+    ]),
+    (9, "Watchdog flap dampening and digest", [
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS watchdog_down_after INT DEFAULT 3",
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS watchdog_up_after INT DEFAULT 2",
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS watchdog_digest_minutes INT DEFAULT 0",
+    ]),
+    (10, "Speedtest job queue", [
+        create_tables("speedtest_jobs"),
+    ]),
+    (11, "Persistent scheduler and cron schedule", [
+        create_tables("scheduled_jobs"),
+        "ALTER TABLE app_settings ADD COLUMN IF NOT EXISTS schedule_cron VARCHAR(100) NULL",
+    ]),
+    (12, "Multi-server campaigns", [
+        create_tables("campaigns"),
+        "ALTER TABLE speedtest_results ADD COLUMN IF NOT EXISTS campaign_id INT NULL",
+        "ALTER TABLE speedtest_results ADD COLUMN IF NOT EXISTS campaign_run_id VARCHAR(36) NULL",
+        "CREATE INDEX IF NOT EXISTS ix_speedtest_results_server_timestamp ON speedtest_results (server_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_speedtest_results_campaign_run ON speedtest_results (campaign_run_id)",
+        "ALTER TABLE speedtest_jobs ADD COLUMN IF NOT EXISTS campaign_id INT NULL",
+        "ALTER TABLE speedtest_jobs ADD COLUMN IF NOT EXISTS campaign_run_id VARCHAR(36) NULL",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(connection):
+    try:
+        return connection.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+    except ProgrammingError:
+        connection.rollback()
+        connection.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL PRIMARY KEY, applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)"))
+        connection.commit()
+        return 0
+
+def forget_schema_version(engine):
+    """Przed przywróceniem kopii: zrzut sprzed wersjonowania nie zawiera schema_version, więc
+    bieżąca wersja przetrwałaby restore, a odtworzone tabele nie miałyby nowych kolumn.
+    Bez tej tabeli run_migrations powtarza wszystkie (idempotentne) kroki."""
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS schema_version"))
+
+def run_migrations(engine):
+    with engine.connect() as connection:
+        version = get_schema_version(connection)
+    if version >= LATEST_VERSION:
+        return version
+
+    for number, description, steps in MIGRATIONS:
+        if number <= version: continue
+        logging.info(get_log("db_mig_apply", number, description))
+        with engine.begin() as connection:
+            for step in steps:
+                if callable(step):
+                    step(connection)
+                else:
+                    connection.execute(text(step))
+            connection.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": number})
+        version = number
+
+    return version
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, Boolean
+from sqlalchemy import Column, Integer, String, Float, Boolean, UniqueConstraint, Index, LargeBinary
 from sqlalchemy.dialects.mysql import DATETIME, MEDIUMTEXT
 from .database import Base
 
@@ -8,8 +8,12 @@ from .database import Base
 
 class SpeedtestResult(Base):
     __tablename__ = "speedtest_results"
+    __table_args__ = (
+        Index("ix_speedtest_results_server_timestamp", "server_id", "timestamp"),
+        Index("ix_speedtest_results_campaign_run", "campaign_run_id"),
+    )
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    timestamp = Column(DATETIME(fsp=6), default=datetime.now)
+    timestamp = Column(DATETIME(fsp=6), default=datetime.now, index=True)
     ping = Column(Float)
     jitter = Column(Float)
     download = Column(Float)
@@ -25,23 +29,136 @@ class SpeedtestResult(Base):
     download_latency_high = Column(Float, nullable=True)
     upload_latency_low = Column(Float, nullable=True)
     upload_latency_high = Column(Float, nullable=True)
+    campaign_id = Column(Integer, nullable=True)
+    campaign_run_id = Column(String(36), nullable=True) # wspólny dla pomiarów jednego przebiegu kampanii
+
+class SpeedtestJob(Base):
+    __tablename__ = "speedtest_jobs"
+    __table_args__ = (Index("ix_speedtest_jobs_status_created", "status", "created_at"),)
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    status = Column(String(10), nullable=False, default="queued") # queued, running, done, failed, cancelled
+    source = Column(String(20), nullable=False, default="manual") # manual, scheduled, startup, campaign
+    server_id = Column(Integer, nullable=True)
+    language = Column(String(5), nullable=True)
+    campaign_id = Column(Integer, nullable=True)
+    campaign_run_id = Column(String(36), nullable=True)
+    created_at = Column(DATETIME(fsp=6), default=datetime.now)
+    started_at = Column(DATETIME(fsp=6), nullable=True)
+    finished_at = Column(DATETIME(fsp=6), nullable=True)
+    result_id = Column(String(36), nullable=True)
+    error = Column(String(500), nullable=True)
+
+class Campaign(Base):
+    __tablename__ = "campaigns"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(100), unique=True, nullable=False)
+    server_ids = Column(String(255), nullable=False) # lista id serwerów rozdzielona przecinkami
+    schedule_hours = Column(Integer, default=0) # 0 = tylko uruchomienie ręczne
+    schedule_cron = Column(String(100), nullable=True) # ma pierwszeństwo przed schedule_hours
+    enabled = Column(Boolean, default=True)
+    created_at = Column(DATETIME(fsp=6), default=datetime.now)
+
+class ScheduledJob(Base):
+    __tablename__ = "scheduled_jobs"
+    name = Column(String(50), primary_key=True)
+    spec = Column(String(255), nullable=False) # opis wyzwalacza - zmiana = nowy termin
+    next_run = Column(DATETIME(fsp=6), nullable=True)
+    last_run = Column(DATETIME(fsp=6), nullable=True)
+    last_lag = Column(Float, nullable=True) # opóźnienie startu względem terminu [s]
+    last_duration = Column(Float, nullable=True) # [s]
+    runs = Column(Integer, default=0)
+    failures = Column(Integer, default=0)
+
+class ResultTombstone(Base):
+    __tablename__ = "result_tombstones"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    result_id = Column(String(36), nullable=False)
+    deleted_at = Column(DATETIME(fsp=6), default=datetime.now, index=True)
 
 class PingLog(Base):
     __tablename__ = "ping_logs"
+    __table_args__ = (Index("ix_ping_logs_target_timestamp", "target", "timestamp"),)
     id = Column(Integer, primary_key=True, autoincrement=True)
-    timestamp = Column(DATETIME(fsp=6), default=datetime.now)
+    timestamp = Column(DATETIME(fsp=6), default=datetime.now, index=True)
     target = Column(String(255))
+    probe_type = Column(String(10), default="icmp")
     latency = Column(Float, nullable=True) 
     packet_loss = Column(Float) 
     is_online = Column(Boolean)
 
+class Outage(Base):
+    __tablename__ = "outages"
+    __table_args__ = (Index("ix_outages_target_started", "target", "started_at"),)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    target = Column(String(255), nullable=False)
+    started_at = Column(DATETIME(fsp=6), nullable=False)
+    ended_at = Column(DATETIME(fsp=6), nullable=True) # NULL = awaria trwa
+    duration = Column(Float, nullable=True) # sekundy, po zamknięciu
+    peak_loss = Column(Float, nullable=True)
+
+class SpeedtestRollup(Base):
+    __tablename__ = "speedtest_rollups"
+    __table_args__ = (UniqueConstraint("period", "bucket_start", "server_id", "metric", name="uq_speedtest_rollup"),)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    period = Column(String(8), nullable=False) # hour, day
+    bucket_start = Column(DATETIME, nullable=False)
+    server_id = Column(Integer, nullable=False, default=0) # 0 = nieznany serwer
+    metric = Column(String(32), nullable=False)
+    samples = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0)
+    min_value = Column(Float, nullable=True)
+    max_value = Column(Float, nullable=True)
+    sum_sq = Column(Float, nullable=False, default=0)
+
+class PingRollup(Base):
+    __tablename__ = "ping_rollups"
+    __table_args__ = (UniqueConstraint("period", "bucket_start", "target", "metric", name="uq_ping_rollup"),)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    period = Column(String(8), nullable=False) # minute, hour, day
+    bucket_start = Column(DATETIME, nullable=False)
+    target = Column(String(255), nullable=False, default="")
+    metric = Column(String(32), nullable=False)
+    samples = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0)
+    min_value = Column(Float, nullable=True)
+    max_value = Column(Float, nullable=True)
+    sum_sq = Column(Float, nullable=False, default=0)
+
+class LatencySketch(Base):
+    __tablename__ = "latency_sketches"
+    __table_args__ = (UniqueConstraint("period", "bucket_start", "target", name="uq_latency_sketch"),)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    period = Column(String(8), nullable=False) # minute, hour, day
+    bucket_start = Column(DATETIME, nullable=False)
+    target = Column(String(255), nullable=False)
+    samples = Column(Integer, nullable=False, default=0)
+    jitter_sum = Column(Float, nullable=False, default=0)
+    jitter_samples = Column(Integer, nullable=False, default=0)
+    sketch = Column(LargeBinary, nullable=False) # DDSketch, format w sketches.py
+
+class WatchdogTarget(Base):
+    __tablename__ = "watchdog_targets"
+    __table_args__ = (UniqueConstraint("probe_type", "host", "port", name="uq_watchdog_target"),)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(100), nullable=True)
+    probe_type = Column(String(10), nullable=False, default="icmp") # icmp, tcp, http, dns
+    host = Column(String(255), nullable=False) # host / URL (http) / nazwa do rozwiązania (dns)
+    port = Column(Integer, nullable=False, default=0) # tcp: port docelowy, dns: port resolvera (0 = 53)
+    resolver = Column(String(255), nullable=True) # dns: adres resolvera (puste = resolver systemowy)
+    interval = Column(Integer, default=30)
+    enabled = Column(Boolean, default=True)
+
 class AppSettings(Base):
     __tablename__ = "app_settings"
     id = Column(Integer, primary_key=True, index=True)
     selected_server_id = Column(Integer, nullable=True)
     schedule_hours = Column(Integer, default=1)
+    schedule_cron = Column(String(100), nullable=True) # wyrażenie cron - ma pierwszeństwo przed schedule_hours
     ping_target = Column(String(255), default="8.8.8.8")
     ping_interval = Column(Integer, default=30)
+    watchdog_down_after = Column(Integer, default=3) # kolejne porażki przed powiadomieniem OFFLINE
+    watchdog_up_after = Column(Integer, default=2) # kolejne sukcesy przed powiadomieniem ONLINE
+    watchdog_digest_minutes = Column(Integer, default=0) # 0 = bez okna zbiorczego
     declared_download = Column(Integer, default=0)
     declared_upload = Column(Integer, default=0)
     startup_test_enabled = Column(Boolean, default=True)
@@ -66,6 +183,7 @@ class NotificationSettings(Base):
     ntfy_server = Column(String(255), default="https://ntfy.sh")
     pushover_user_key = Column(String(50), nullable=True)
     pushover_api_token = Column(String(50), nullable=True)
+    providers = Column(String(100), nullable=True) # np. "webhook,ntfy"; puste = tylko provider
 
 class DriveBackupSettings(Base):
     __tablename__ = "drive_backup_settings"
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import random
+import threading
+from datetime import datetime
+
+import httpx
+
+from .config import get_log
+from . import settings_cache
+
+# --- Wysyłka powiadomień (webhook / ntfy / Pushover) ---
+# notify() tylko wrzuca wiadomość do kolejki i wraca - pomiar ani sonda nie czekają na HTTP.
+# Osobny wątek z pętlą asyncio wysyła wiadomości przez jeden współdzielony httpx.AsyncClient
+# (pula połączeń), do wszystkich skonfigurowanych dostawców równolegle, z ponawianiem
+# (wykładnicze opóźnienie z losowym rozrzutem) przy błędach sieci, 429 i 5xx.
+
+PROVIDERS = ("webhook", "ntfy", "pushover")
+PROVIDER_TIMEOUTS = {"webhook": 10.0, "ntfy": 5.0, "pushover": 5.0}
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+MAX_CONCURRENT = 8
+
+PUSHOVER_URL = "https://api.pushover.net/1/messages.json"
+
+def active_providers(ns):
+    """Dostawcy z listy providers (rozsyłanie do wielu), a gdy jej brak - pojedynczy provider."""
+    if not ns or not ns.enabled: return []
+    names = [p.strip() for p in (getattr(ns, "providers", None) or "").split(",") if p.strip()]
+    return [p for p in (names or [ns.provider]) if p in PROVIDERS]
+
+def build_request(provider, cfg, title, message, type_str):
+    """(url, argumenty httpx) dla dostawcy; ValueError, gdy brakuje konfiguracji."""
+    if provider == "webhook":
+        if not cfg.webhook_url: raise ValueError("Missing Webhook URL")
+        payload = {"title": title, "message": message, "type": type_str, "timestamp": datetime.now().isoformat()}
+        return cfg.webhook_url, {"json": payload}
+    if provider == "ntfy":
+        if not cfg.ntfy_topic: raise ValueError("Missing Ntfy Topic")
+        server = cfg.ntfy_server.rstrip('/') if cfg.ntfy_server else "https://ntfy.sh"
+        tags = "tada" if type_str == "test" else "warning" if "down" in type_str else "white_check_mark"
+        return f"{server}/{cfg.ntfy_topic}", {"content": message.encode('utf-8'), "headers": {"Title": title.encode('utf-8'), "Tags": tags}}
+    if provider == "pushover":
+        if not cfg.pushover_user_key or not cfg.pushover_api_token: raise ValueError("Missing Pushover Credentials")
+        return PUSHOVER_URL, {"data": {
+            "token": cfg.pushover_api_token,
+            "user": cfg.pushover_user_key,
+            "message": message,
+            "title": title,
+            "priority": 1 if "down" in type_str else 0
+        }}
+    raise ValueError(f"Unknown provider: {provider}")
+
+def _retryable(exc):
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        return code == 429 or code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+class NotificationDispatcher:
+    def __init__(self):
+        self._loop = None
+        self._client = None
+        self._queue = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._loop is None:
+                threading.Thread(target=self._run, daemon=True).start()
+                self._ready.wait()
+
+    def _run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        limits = httpx.Limits(max_connections=MAX_CONCURRENT * len(PROVIDERS), max_keepalive_connections=len(PROVIDERS) * 2)
+        sem = asyncio.Semaphore(MAX_CONCURRENT)
+        async with httpx.AsyncClient(limits=limits) as client:
+            self._client = client
+            self._ready.set()
+            while True:
+                job = await self._queue.get()
+                await sem.acquire()
+                task = asyncio.create_task(self._fan_out(*job))
+                task.add_done_callback(lambda _: sem.release())
+
+    async def _send(self, provider, cfg, title, message, type_str, attempts):
+        url, kwargs = build_request(provider, cfg, title, message, type_str)
+        for attempt in range(1, attempts + 1):
+            try:
+                resp = await self._client.post(url, timeout=PROVIDER_TIMEOUTS[provider], **kwargs)
+                resp.raise_for_status()
+                return
+            except httpx.HTTPError as e:
+                if attempt == attempts or not _retryable(e): raise
+                delay = min(BACKOFF_BASE * 2 ** (attempt - 1), BACKOFF_MAX)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+    async def _fan_out(self, providers, cfg, title, message, type_str):
+        results = await asyncio.gather(
+            *[self._send(p, cfg, title, message, type_str, MAX_ATTEMPTS) for p in providers],
+            return_exceptions=True
+        )
+        for provider, res in zip(providers, results):
+            if isinstance(res, Exception):
+                logging.error(f"Notification send error ({provider}): {res}")
+            else:
+                logging.info(get_log("notify_sent", provider.capitalize()))
+
+    def notify(self, title: str, message: str, type_str: str = "info"):
+        """Kolejkuje powiadomienie do aktywnych dostawców (nie blokuje)."""
+        ns = settings_cache.notification_settings.get()
+        providers = active_providers(ns)
+        if not providers: return
+        self.start()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (providers, ns, title, message, type_str))
+
+    def send_test(self, provider, cfg, title, message, timeout=15):
+        """Jedna próba wysłania przez podanego dostawcę; wyjątek przy błędzie (dla /api/notifications/test)."""
+        build_request(provider, cfg, title, message, "test") # walidacja przed kolejką
+        self.start()
+        fut = asyncio.run_coroutine_threadsafe(self._send(provider, cfg, title, message, "test", 1), self._loop)
+        fut.result(timeout)
+
+dispatcher = NotificationDispatcher()
+notify = dispatcher.notify
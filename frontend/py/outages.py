@@ -0,0 +1,120 @@
+import threading
+from datetime import datetime
+from sqlalchemy import or_
+from . import database
+from .models import Outage
+
+# --- Przedziały awarii watchdoga ---
+# Wiersz w outages otwiera się przy przejściu celu w stan offline i zamyka przy powrocie.
+# Zapis do bazy następuje tylko przy zmianie stanu; szczytowa utrata pakietów otwartej
+# awarii jest trzymana w pamięci i zapisywana przy zamknięciu.
+# Raport dostępności (uptime) liczy się z samych przedziałów - koszt zależy od liczby awarii,
+# a nie liczby sond.
+
+_lock = threading.Lock()
+_open = {} # etykieta celu -> {"id", "started_at", "peak_loss"}
+_synced = set() # cele, których otwarta awaria została już odczytana z bazy
+
+def _sync(db, target):
+    rec = db.query(Outage).filter(Outage.target == target, Outage.ended_at.is_(None)).order_by(Outage.started_at.desc()).first()
+    if rec:
+        _open[target] = {"id": rec.id, "started_at": rec.started_at, "peak_loss": rec.peak_loss or 0.0}
+    _synced.add(target)
+
+def _close(db, target, ended_at):
+    state = _open.pop(target)
+    db.query(Outage).filter(Outage.id == state["id"]).update({
+        "ended_at": ended_at,
+        "duration": max((ended_at - state["started_at"]).total_seconds(), 0.0),
+        "peak_loss": state["peak_loss"]
+    })
+
+def track_outage(target, timestamp: datetime, is_online: bool, packet_loss):
+    """Aktualizuje przedział awarii celu na podstawie wyniku sondy. Zwraca True przy otwarciu/zamknięciu."""
+    with _lock:
+        state = _open.get(target)
+        if target in _synced and (state is None) == is_online:
+            if state is not None and packet_loss is not None:
+                state["peak_loss"] = max(state["peak_loss"], packet_loss)
+            return False
+
+        db = database.SessionLocal()
+        try:
+            if target not in _synced:
+                _sync(db, target)
+                state = _open.get(target)
+
+            changed = False
+            if not is_online and state is None:
+                rec = Outage(target=target, started_at=timestamp, peak_loss=packet_loss)
+                db.add(rec)
+                db.flush()
+                _open[target] = {"id": rec.id, "started_at": timestamp, "peak_loss": packet_loss or 0.0}
+                changed = True
+            elif not is_online and packet_loss is not None:
+                state["peak_loss"] = max(state["peak_loss"], packet_loss)
+            elif is_online and state is not None:
+                _close(db, target, timestamp)
+                changed = True
+            db.commit()
+            return changed
+        finally:
+            db.close()
+
+def close_outage(target, ended_at: datetime | None = None):
+    """Zamyka otwartą awarię celu usuniętego z monitoringu."""
+    with _lock:
+        if target not in _open: return
+        db = database.SessionLocal()
+        try:
+            _close(db, target, ended_at or datetime.now())
+            db.commit()
+        finally:
+            db.close()
+
+def reset():
+    """Po przywróceniu bazy stan w pamięci jest nieaktualny - zostanie odczytany ponownie."""
+    with _lock:
+        _open.clear()
+        _synced.clear()
+
+def uptime_report(db, target, start: datetime, end: datetime):
+    """Dostępność %, MTBF i MTTR celu w zakresie [start, end) wyliczone z przedziałów awarii."""
+    now = datetime.now()
+    end = min(end, now)
+    span = max((end - start).total_seconds(), 0.0)
+
+    rows = (
+        db.query(Outage)
+        .filter(Outage.target == target, Outage.started_at < end, or_(Outage.ended_at.is_(None), Outage.ended_at > start))
+        .order_by(Outage.started_at)
+        .all()
+    )
+
+    intervals = []
+    downtime = 0.0
+    repairs = []
+    for o in rows:
+        o_end = o.ended_at or now
+        clipped = max((min(o_end, end) - max(o.started_at, start)).total_seconds(), 0.0)
+        downtime += clipped
+        if o.ended_at is not None and o.duration is not None:
+            repairs.append(o.duration)
+        intervals.append({
+            "started_at": o.started_at, "ended_at": o.ended_at, "ongoing": o.ended_at is None,
+            "duration": round(o.duration if o.duration is not None else (now - o.started_at).total_seconds(), 1),
+            "peak_loss": o.peak_loss
+        })
+
+    failures = sum(1 for o in rows if o.started_at >= start)
+    uptime = span - downtime
+    return {
+        "target": target,
+        "from": start, "to": end,
+        "availability": round(100.0 * uptime / span, 4) if span else None,
+        "downtime_seconds": round(downtime, 1),
+        "outages": len(rows),
+        "mtbf_seconds": round(uptime / failures, 1) if failures else None,
+        "mttr_seconds": round(sum(repairs) / len(repairs), 1) if repairs else None,
+        "intervals": intervals
+    }
@@ -0,0 +1,97 @@
+import itertools
+import threading
+from collections import deque
+from types import MappingProxyType
+from .models import PingLog
+
+# --- Historia watchdoga w pamięci ---
+# Ostatnie HISTORY_SIZE punktów każdego celu w buforze kołowym (deque z maxlen), uzupełniane
+# przez watchdog przy każdej sondzie i rozgrzewane z ping_logs przy starcie. /api/watchdog/status
+# czyta tylko stąd - bez zapytania do bazy i formatowania dat przy każdym odpytaniu.
+# Statusy są niezmiennymi słownikami podmienianymi w całości pod blokadą, więc odczyt zawsze
+# widzi spójny stan (a nie słownik w trakcie aktualizacji z innego wątku).
+
+HISTORY_SIZE = 60
+
+INITIAL_STATUS = MappingProxyType({"online": None, "latency": 0, "loss": 0, "target": "init", "updated": None})
+
+class PingHistory:
+    def __init__(self, size=HISTORY_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._points = {} # cel -> deque[(timestamp, seq, punkt)]
+        self._status = {} # cel -> status (MappingProxyType)
+        self._primary = None
+
+    def _append(self, target, timestamp, latency):
+        points = self._points.get(target)
+        if points is None: points = self._points[target] = deque(maxlen=self.size)
+        points.append((timestamp, next(self._seq), {"time": timestamp.strftime("%H:%M:%S"), "latency": latency}))
+
+    def record(self, status: dict, timestamp, latency, primary: bool):
+        """Dodaje punkt i podmienia status celu."""
+        target = status["target"]
+        frozen = MappingProxyType(dict(status))
+        with self._lock:
+            self._append(target, timestamp, latency)
+            self._status[target] = frozen
+            if primary: self._primary = target
+
+    def warm(self, target, rows, primary: bool = False):
+        """Wypełnia bufor celu wierszami (timestamp, latency) z bazy, od najstarszego."""
+        with self._lock:
+            if primary: self._primary = target
+            if target in self._points: return
+            for timestamp, latency in rows[-self.size:]:
+                self._append(target, timestamp, latency)
+
+    def reload(self, rows_for):
+        """Podmienia bufory wszystkich celów wierszami z rows_for(cel) (np. po przywróceniu bazy)."""
+        with self._lock:
+            targets = list(self._points)
+        fresh = {t: rows_for(t)[-self.size:] for t in targets}
+        with self._lock:
+            for target, rows in fresh.items():
+                if target not in self._points: continue
+                self._points[target] = deque(maxlen=self.size)
+                for timestamp, latency in rows:
+                    self._append(target, timestamp, latency)
+
+    def drop(self, target):
+        with self._lock:
+            self._points.pop(target, None)
+            self._status.pop(target, None)
+            if self._primary == target: self._primary = None
+
+    def has(self, target):
+        with self._lock:
+            return target in self._points
+
+    def primary_target(self):
+        with self._lock:
+            return self._primary
+
+    def snapshot(self, target=None, since=None):
+        """(status celu głównego, statusy wszystkich celów, punkty celu nowsze niż since, ostatni kursor)."""
+        with self._lock:
+            primary = dict(self._status.get(self._primary, INITIAL_STATUS))
+            statuses = [dict(s) for s in self._status.values()]
+            points = list(self._points.get(target or self._primary, ()))
+        if since:
+            ts, seq = since
+            points = [p for p in points if p[0] > ts or (p[0] == ts and p[1] > seq)]
+        last = (points[-1][0], points[-1][1]) if points else None
+        return primary, statuses, [p[2] for p in points], last
+
+ping_history = PingHistory()
+
+def load_recent(db, target, limit=HISTORY_SIZE):
+    rows = (
+        db.query(PingLog.timestamp, PingLog.latency)
+        .filter(PingLog.target == target)
+        .order_by(PingLog.timestamp.desc(), PingLog.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [tuple(r) for r in reversed(rows)]
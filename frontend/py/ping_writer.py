@@ -0,0 +1,85 @@
+import logging
+import threading
+import time
+from sqlalchemy import insert
+from . import database
+from . import dataversion
+from .config import PING_LOG_BATCH_SIZE, PING_LOG_FLUSH_INTERVAL
+from .models import PingLog
+from .rollups import update_rollups
+from .sketches import latency_sketches
+
+# --- Buforowany zapis ping_logs ---
+# Sondy nie piszą do bazy same: wiersze trafiają do bufora, a osobny wątek zapisuje je
+# jednym wielowierszowym INSERT-em (razem z agregatami) po zebraniu batch_size wierszy
+# albo po flush_interval sekundach. Kolejność wierszy jest zachowana, więc kursor
+# (timestamp,id) w /api/watchdog/status nie gubi wpisów.
+
+MAX_PENDING = 10000 # limit bufora przy niedostępnej bazie - najstarsze wiersze są odrzucane
+
+class PingLogWriter:
+    def __init__(self, batch_size=PING_LOG_BATCH_SIZE, flush_interval=PING_LOG_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def submit(self, row: dict):
+        with self._cond:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def _take(self):
+        with self._cond:
+            batch, self._buffer = self._buffer, []
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._buffer) >= self.batch_size, timeout=self.flush_interval)
+            if self.flush() is None:
+                time.sleep(self.flush_interval) # baza niedostępna - bez pętli ponowień
+
+    def flush(self):
+        with self._write_lock:
+            batch = self._take()
+            if not batch: return 0
+            try:
+                self._write(batch)
+            except Exception as e:
+                logging.error(f"Ping log flush failed ({len(batch)} rows): {e}")
+                with self._cond:
+                    self._buffer[:0] = batch
+                    dropped = len(self._buffer) - MAX_PENDING
+                    if dropped > 0:
+                        del self._buffer[:dropped]
+                        logging.warning(f"Ping log buffer full, dropped {dropped} oldest rows")
+                return None
+        dataversion.bump("ping")
+        return len(batch)
+
+    def _write(self, batch):
+        # Szkice RTT są dokładane w record_probe przed submit, więc idą razem z tą partią
+        sketches = latency_sketches.take()
+        db = database.SessionLocal()
+        try:
+            db.execute(insert(PingLog), batch)
+            update_rollups(db, "ping", [PingLog(**row) for row in batch])
+            latency_sketches.store(db, sketches)
+            db.commit()
+        except Exception:
+            latency_sketches.restore(sketches)
+            raise
+        finally:
+            db.close()
+
+ping_log_writer = PingLogWriter()
@@ -0,0 +1,223 @@
+import asyncio
+import itertools
+import logging
+import os
+import re
+import socket
+import struct
+import time
+
+import httpx
+
+# --- Sondy watchdoga (asyncio) ---
+# IcmpProber używa jednego nieuprzywilejowanego gniazda ICMP (SOCK_DGRAM + IPPROTO_ICMP,
+# wymaga net.ipv4.ping_group_range) współdzielonego przez wszystkie cele.
+# Gdy system na to nie pozwala, SubprocessProber uruchamia "ping" asynchronicznie.
+# Pozostałe typy sond: czas połączenia TCP, TTFB HTTP(S) i czas odpowiedzi DNS.
+# Każda sonda zwraca listę RTT w ms (None = próba nieudana).
+
+PING_COUNT = 3
+PING_SPACING = 0.2
+PING_TIMEOUT = 2.0
+PROBE_TIMEOUT = 5.0
+
+PROBE_TYPES = ("icmp", "tcp", "http", "dns")
+
+def summarize(rtts):
+    """Zamienia RTT pojedynczych pakietów na (latency, packet_loss, is_online) jak dawny parser pinga."""
+    received = [r for r in rtts if r is not None]
+    loss = round(100.0 * (len(rtts) - len(received)) / len(rtts), 1) if rtts else 100.0
+    latency = sum(received) / len(received) if received else None
+    return latency, loss, bool(received)
+
+def _checksum(data: bytes):
+    if len(data) % 2: data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+def build_echo_request(seq: int, payload: bytes = b"speedtestlog-watchdog"):
+    # Identyfikator ustawia jądro (port gniazda ping), więc wysyłamy 0
+    header = struct.pack("!BBHHH", 8, 0, 0, 0, seq)
+    checksum = _checksum(header + payload)
+    return struct.pack("!BBHHH", 8, 0, checksum, 0, seq) + payload
+
+async def resolve_ipv4(host: str):
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(host, None, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+    return infos[0][4][0]
+
+class _IcmpProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.waiters = {}
+
+    def datagram_received(self, data, addr):
+        if len(data) < 8: return
+        icmp_type, _, _, _, seq = struct.unpack("!BBHHH", data[:8])
+        if icmp_type != 0: return # tylko Echo Reply
+        waiter = self.waiters.get(seq)
+        if waiter and waiter[1] == addr[0] and not waiter[0].done():
+            waiter[0].set_result(time.perf_counter())
+
+    def error_received(self, exc):
+        pass
+
+class IcmpProber:
+    name = "icmp"
+
+    def __init__(self, transport, protocol):
+        self.transport = transport
+        self.protocol = protocol
+        self._seq = itertools.count(int.from_bytes(os.urandom(2), "big"))
+
+    @classmethod
+    async def create(cls):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        sock.setblocking(False)
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(_IcmpProtocol, sock=sock)
+        return cls(transport, protocol)
+
+    async def _echo(self, ip, seq, delay, timeout):
+        await asyncio.sleep(delay)
+        fut = asyncio.get_running_loop().create_future()
+        self.protocol.waiters[seq] = (fut, ip)
+        try:
+            sent = time.perf_counter()
+            self.transport.sendto(build_echo_request(seq), (ip, 0))
+            received = await asyncio.wait_for(fut, timeout)
+            return round((received - sent) * 1000, 3)
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            self.protocol.waiters.pop(seq, None)
+
+    async def probe(self, host, count=PING_COUNT, timeout=PING_TIMEOUT):
+        try:
+            ip = await resolve_ipv4(host)
+        except OSError:
+            return [None] * count
+        seqs = [next(self._seq) & 0xFFFF for _ in range(count)]
+        return list(await asyncio.gather(*[
+            self._echo(ip, seq, i * PING_SPACING, timeout) for i, seq in enumerate(seqs)
+        ]))
+
+class SubprocessProber:
+    name = "subprocess"
+    RTT_RE = re.compile(r"icmp_seq=(\d+).*?time=([\d\.]+) ms")
+
+    async def probe(self, host, count=PING_COUNT, timeout=PING_TIMEOUT):
+        proc = await asyncio.create_subprocess_exec(
+            "ping", "-n", "-c", str(count), "-i", str(PING_SPACING), "-W", str(int(timeout)), host,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await proc.communicate()
+        rtts = [None] * count
+        for seq, rtt in self.RTT_RE.findall(stdout.decode(errors="replace")):
+            idx = int(seq) - 1
+            if 0 <= idx < count: rtts[idx] = float(rtt)
+        return rtts
+
+async def create_prober():
+    try:
+        prober = await IcmpProber.create()
+    except OSError as e:
+        logging.warning(f"ICMP socket unavailable ({e}), falling back to ping subprocess")
+        prober = SubprocessProber()
+    logging.info(f"Watchdog prober: {prober.name}")
+    return prober
+
+async def probe_tcp(host, port, timeout=PROBE_TIMEOUT):
+    """Czas nawiązania połączenia TCP (bez rozwiązywania nazwy)."""
+    try:
+        ip = await resolve_ipv4(host)
+        start = time.perf_counter()
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+        rtt = round((time.perf_counter() - start) * 1000, 3)
+        writer.close()
+        await writer.wait_closed()
+        return [rtt]
+    except (OSError, asyncio.TimeoutError):
+        return [None]
+
+async def probe_http(url, timeout=PROBE_TIMEOUT):
+    """Time-to-first-byte: od wysłania żądania do odebrania nagłówków odpowiedzi.
+
+    Każda próba otwiera nowe połączenie, więc TTFB obejmuje DNS, TCP i TLS - tak jak u użytkownika.
+    Odpowiedź 5xx liczy się jako nieudana próba.
+    """
+    limits = httpx.Limits(max_keepalive_connections=0)
+    try:
+        async with httpx.AsyncClient(timeout=timeout, limits=limits, follow_redirects=False) as client:
+            start = time.perf_counter()
+            async with client.stream("GET", url) as resp:
+                rtt = round((time.perf_counter() - start) * 1000, 3)
+                return [rtt if resp.status_code < 500 else None]
+    except httpx.HTTPError:
+        return [None]
+
+def build_dns_query(query_id: int, name: str):
+    header = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0) # RD=1, jedno pytanie
+    qname = b"".join(bytes([len(label)]) + label.encode("idna") for label in name.rstrip(".").split(".")) + b"\0"
+    return header + qname + struct.pack("!HH", 1, 1) # A, IN
+
+class _DnsProtocol(asyncio.DatagramProtocol):
+    def __init__(self, query_id, fut):
+        self.query_id = query_id
+        self.fut = fut
+
+    def datagram_received(self, data, addr):
+        if len(data) < 12 or self.fut.done(): return
+        query_id, flags = struct.unpack("!HH", data[:4])
+        if query_id == self.query_id:
+            self.fut.set_result((time.perf_counter(), flags & 0x000F))
+
+    def error_received(self, exc):
+        if not self.fut.done(): self.fut.set_exception(exc)
+
+async def probe_dns(name, resolver=None, port=53, timeout=PING_TIMEOUT):
+    """Czas odpowiedzi resolvera na zapytanie A. Bez resolvera mierzy getaddrinfo systemu.
+
+    NOERROR i NXDOMAIN to poprawne odpowiedzi; SERVFAIL/REFUSED i brak odpowiedzi to porażka.
+    """
+    loop = asyncio.get_running_loop()
+    if not resolver:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(loop.getaddrinfo(name, None, family=socket.AF_INET), timeout)
+            return [round((time.perf_counter() - start) * 1000, 3)]
+        except (OSError, asyncio.TimeoutError):
+            return [None]
+
+    query_id = int.from_bytes(os.urandom(2), "big")
+    fut = loop.create_future()
+    transport = None
+    try:
+        transport, _ = await loop.create_datagram_endpoint(lambda: _DnsProtocol(query_id, fut), remote_addr=(resolver, port))
+        start = time.perf_counter()
+        transport.sendto(build_dns_query(query_id, name))
+        received, rcode = await asyncio.wait_for(fut, timeout)
+        return [round((received - start) * 1000, 3) if rcode in (0, 3) else None]
+    except (OSError, asyncio.TimeoutError):
+        return [None]
+    finally:
+        if transport: transport.close()
+
+async def run_probe(icmp_prober, cfg):
+    """Wybiera sondę według cfg["probe_type"]."""
+    kind = cfg.get("probe_type") or "icmp"
+    if kind == "tcp":
+        return await probe_tcp(cfg["host"], cfg["port"])
+    if kind == "http":
+        return await probe_http(cfg["host"])
+    if kind == "dns":
+        return await probe_dns(cfg["host"], cfg.get("resolver"), cfg.get("port") or 53)
+    return await icmp_prober.probe(cfg["host"])
+
+def target_label(kind, host, port=None, resolver=None):
+    """Wartość kolumny ping_logs.target identyfikująca cel razem z typem sondy."""
+    if kind == "tcp": return f"tcp://{host}:{port}"
+    if kind == "http": return host
+    if kind == "dns": return f"dns://{resolver or 'system'}/{host}"
+    return host
@@ -1,36 +1,226 @@
-import csv
-import io
-from fastapi import APIRouter, Depends, HTTPException
+import importlib.util
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import and_, or_, func
 from sqlalchemy.orm import Session
 from .database import get_db
-from .models import SpeedtestResult
+from .models import SpeedtestResult, PingLog, ResultTombstone
 from .schemas import DeleteModel
 from .dependencies import verify_session
+from .downsample import resolve_range, downsample
+from .rollups import backfill_rollups, rollup_stats, truncate
+from . import dataversion
+from . import events
+from .export import iter_rows, csv_chunks, columnar_chunks, COLUMNAR_FORMATS, COLUMNAR_BATCH_SIZE
 
 router = APIRouter(dependencies=[Depends(verify_session)])
 
+RESULT_COLUMNS = SpeedtestResult.__table__.columns.keys()
+# Jak długo pamiętamy usunięte id; klient, który nie synchronizował się dłużej, przeładowuje całość
+TOMBSTONE_RETENTION = timedelta(days=7)
+# Zakładka przy odczycie nagrobków: usunięcie zapisuje deleted_at przed commitem,
+# więc wpis może pojawić się chwilę "w przeszłości" względem poprzedniej synchronizacji
+SYNC_OVERLAP = timedelta(seconds=30)
+EXPORT_TABLES = {"results": SpeedtestResult, "ping_logs": PingLog}
+SERIES_COLUMNS = [
+    "download", "upload", "ping", "jitter", "ping_low",
+    "download_latency_low", "download_latency_high",
+    "upload_latency_low", "upload_latency_high"
+]
+
+# --- Helpery: Kursor (timestamp,id) i projekcja kolumn ---
+
+def encode_cursor(timestamp, row_id):
+    return f"{timestamp.isoformat()},{row_id}"
+
+def parse_cursor(cursor: str):
+    try:
+        ts, row_id = cursor.split(",", 1)
+        return datetime.fromisoformat(ts), row_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def encode_sync_cursor(timestamp, row_id, synced_at):
+    return f"{encode_cursor(timestamp, row_id)},{synced_at.isoformat()}"
+
+def parse_sync_cursor(cursor: str):
+    """Kursor delty: "timestamp,id[,synced_at]"; synced_at = None dla starego kursora bez czasu."""
+    try:
+        ts, rest = cursor.split(",", 1)
+        row_id, _, synced = rest.partition(",")
+        return datetime.fromisoformat(ts), row_id, datetime.fromisoformat(synced) if synced else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def parse_fields(fields, allowed, always=("id", "timestamp")):
+    if not fields:
+        return list(allowed)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # Domyślnie id i timestamp są zawsze potrzebne do zbudowania kursora
+    return list(always) + [f for f in requested if f not in always]
+
+def latest_sync_cursor(db: Session):
+    """Kursor delty od najnowszego wyniku, z bieżącym czasem serwera jako czasem synchronizacji."""
+    newest = db.query(SpeedtestResult.timestamp, SpeedtestResult.id).order_by(SpeedtestResult.timestamp.desc(), SpeedtestResult.id.desc()).first()
+    timestamp, row_id = newest if newest else (datetime.min, "")
+    return encode_sync_cursor(timestamp, row_id, datetime.now())
+
 @router.get("/api/results")
-async def get_results(db: Session = Depends(get_db)):
-    return db.query(SpeedtestResult).order_by(SpeedtestResult.timestamp.desc()).limit(1000).all()
+def get_results(
+    request: Request,
+    response: Response,
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    cursor: str | None = None,
+    since: str | None = None,
+    fields: str | None = None,
+    limit: int = Query(1000, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    # Pierwsza strona najnowszych wyników niesie kursor delty z czasem serwera - także przy 304,
+    # bo przeglądarka podmienia nim nagłówki z pamięci podręcznej (inaczej czas by się starzał)
+    sync_cursor = latest_sync_cursor(db) if not (since or cursor or to) else None
+    not_modified = dataversion.check_not_modified(request, response, "results", variant=request.url.query)
+    if not_modified:
+        if sync_cursor: not_modified.headers["X-Sync-Cursor"] = sync_cursor
+        return not_modified
+
+    columns = parse_fields(fields, RESULT_COLUMNS)
+    if since:
+        return get_results_since(db, since, columns, limit)
+    q = db.query(*[getattr(SpeedtestResult, c) for c in columns])
+
+    if from_: q = q.filter(SpeedtestResult.timestamp >= from_)
+    if to: q = q.filter(SpeedtestResult.timestamp < to)
+    if cursor:
+        ts, row_id = parse_cursor(cursor)
+        q = q.filter(or_(
+            SpeedtestResult.timestamp < ts,
+            and_(SpeedtestResult.timestamp == ts, SpeedtestResult.id < row_id)
+        ))
+
+    rows = q.order_by(SpeedtestResult.timestamp.desc(), SpeedtestResult.id.desc()).limit(limit).all()
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    if sync_cursor: response.headers["X-Sync-Cursor"] = sync_cursor
+    return [dict(r._mapping) for r in rows]
+
+def get_results_since(db: Session, since: str, columns, limit: int):
+    """Delta: wiersze nowsze niż kursor (rosnąco) + id usunięte od ostatniej synchronizacji."""
+    ts, row_id, synced_at = parse_sync_cursor(since)
+    now = datetime.now()
+    if synced_at is None:
+        # Stary kursor bez czasu synchronizacji: wszystkie pamiętane nagrobki od czasu wiersza
+        synced_at = max(ts, now - TOMBSTONE_RETENTION + SYNC_OVERLAP)
+    # O resecie decyduje czas ostatniej synchronizacji, nie wiek najnowszego wyniku -
+    # brak testów przez tydzień nie może wymuszać pełnego przeładowania przy każdym odpytaniu
+    elif synced_at < now - TOMBSTONE_RETENTION or synced_at > now + SYNC_OVERLAP:
+        return {"reset": True, "rows": [], "deleted": [], "cursor": since, "more": False}
+
+    rows = (
+        db.query(*[getattr(SpeedtestResult, c) for c in columns])
+        .filter(or_(
+            SpeedtestResult.timestamp > ts,
+            and_(SpeedtestResult.timestamp == ts, SpeedtestResult.id > row_id)
+        ))
+        .order_by(SpeedtestResult.timestamp.asc(), SpeedtestResult.id.asc())
+        .limit(limit)
+        .all()
+    )
+    deleted = [r[0] for r in db.query(ResultTombstone.result_id).filter(ResultTombstone.deleted_at > synced_at - SYNC_OVERLAP).all()]
+    last_ts, last_id = (rows[-1].timestamp, rows[-1].id) if rows else (ts, row_id)
+    return {
+        "reset": False,
+        "rows": [dict(r._mapping) for r in rows],
+        "deleted": deleted,
+        "cursor": encode_sync_cursor(last_ts, last_id, now),
+        "more": len(rows) == limit
+    }
+
+@router.get("/api/results/series")
+def get_results_series(
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    points: int = Query(500, ge=10, le=5000),
+    mode: str = "buckets",
+    fields: str | None = None,
+    server_id: int | None = None,
+    db: Session = Depends(get_db)
+):
+    start, end = resolve_range(from_, to)
+    columns = parse_fields(fields, SERIES_COLUMNS, always=())
+    q = db.query(SpeedtestResult)
+    if server_id is not None: q = q.filter(SpeedtestResult.server_id == server_id)
+    return downsample(q, SpeedtestResult, columns, start, end, points, mode)
+
+@router.get("/api/results/stats")
+def get_results_stats(
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    server_id: int | None = None,
+    db: Session = Depends(get_db)
+):
+    start, end = resolve_range(from_, to)
+    return rollup_stats(db, "speedtest", start, end, server_id)
 
 @router.get("/api/results/latest")
-async def get_latest(db: Session = Depends(get_db)):
+def get_latest(db: Session = Depends(get_db)):
     res = db.query(SpeedtestResult).order_by(SpeedtestResult.timestamp.desc()).first()
     return res if res else JSONResponse(content={}, status_code=404)
 
 @router.delete("/api/results")
-async def del_res(d: DeleteModel, db: Session = Depends(get_db)):
+def del_res(d: DeleteModel, db: Session = Depends(get_db)):
+    first, last = db.query(func.min(SpeedtestResult.timestamp), func.max(SpeedtestResult.timestamp)).filter(SpeedtestResult.id.in_(d.ids)).one()
     c = db.query(SpeedtestResult).filter(SpeedtestResult.id.in_(d.ids)).delete(synchronize_session=False)
+    if c:
+        now = datetime.now()
+        db.add_all([ResultTombstone(result_id=i, deleted_at=now) for i in d.ids])
+        db.query(ResultTombstone).filter(ResultTombstone.deleted_at < now - TOMBSTONE_RETENTION).delete(synchronize_session=False)
+    if c and first:
+        # Przeliczenie agregatów tylko dla dni, których dotyczyło usunięcie
+        backfill_rollups(db, "speedtest", truncate(first, "day"), truncate(last, "day") + timedelta(days=1))
     db.commit()
+    dataversion.bump("results")
+    if c: events.publish("results_deleted", {"ids": d.ids})
     return {"deleted_count": c}
 
 @router.get("/api/export")
-async def export_csv(db: Session = Depends(get_db)):
-    results = db.query(SpeedtestResult).order_by(SpeedtestResult.timestamp.desc()).all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Timestamp', 'Ping', 'Download', 'Upload'])
-    for r in results: writer.writerow([r.timestamp, r.ping, r.download, r.upload])
-    output.seek(0)
-    return StreamingResponse(iter([output.getvalue()]), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=speedtest.csv"})
\ No newline at end of file
+async def export_csv(
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    fields: str | None = None,
+    gzip: bool = False
+):
+    columns = parse_fields(fields, RESULT_COLUMNS, always=("timestamp",))
+    chunks = csv_chunks(columns, iter_rows(SpeedtestResult, columns, from_, to), gzip)
+    if gzip:
+        return StreamingResponse(chunks, media_type="application/gzip", headers={"Content-Disposition": "attachment; filename=speedtest.csv.gz"})
+    return StreamingResponse(chunks, media_type="text/csv", headers={"Content-Disposition": "attachment; filename=speedtest.csv"})
+
+@router.get("/api/export/columnar")
+async def export_columnar(
+    table: str = "results",
+    format: str = "parquet",
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    fields: str | None = None
+):
+    model = EXPORT_TABLES.get(table)
+    if model is None or format not in COLUMNAR_FORMATS:
+        raise HTTPException(status_code=400, detail="Unknown table or format")
+    # pyarrow jest opcjonalny - sprawdzamy dostępność bez importu (import robi dopiero eksport)
+    if importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=501, detail="pyarrow not installed")
+
+    columns = parse_fields(fields, model.__table__.columns.keys(), always=("timestamp",))
+    rows = iter_rows(model, columns, from_, to, batch_size=COLUMNAR_BATCH_SIZE)
+    media_type, ext = COLUMNAR_FORMATS[format]
+    return StreamingResponse(
+        columnar_chunks(model, columns, rows, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={table}.{ext}"}
+    )
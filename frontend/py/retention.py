@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete
+from . import database
+from .config import PING_LOG_RETENTION_HOURS, PING_MINUTE_RETENTION_DAYS
+from .downsample import bucket_seconds_for
+from .models import PingLog, PingRollup, LatencySketch
+from .rollups import SOURCE_PERIODS, PERIOD_SECONDS
+from .scheduler import scheduler, IntervalTrigger
+
+# --- Warstwowa retencja danych watchdoga ---
+# surowe ping_logs: PING_LOG_RETENTION_HOURS, agregaty minutowe: PING_MINUTE_RETENTION_DAYS,
+# agregaty godzinowe i dzienne: bez limitu. Szkice kwantyli (latency_sketches) mają te same warstwy.
+# Agregaty są dokładane przy zapisie (ping_writer), więc "kompaktowanie" sprowadza się
+# do usuwania przeterminowanych warstw.
+# Usuwanie idzie w porcjach (DELETE ... WHERE <indeksowana kolumna> < ? LIMIT n) z commitem
+# po każdej porcji, więc blokady są krótkie niezależnie od tego, ile wierszy się zebrało.
+
+RETENTION_INTERVAL_MINUTES = 10
+RETENTION_CHUNK = 5000
+CHUNK_PAUSE = 0.05
+
+RETENTION_JITTER = 30
+_purge_lock = threading.Lock()
+
+def raw_cutoff(now: datetime | None = None):
+    return (now or datetime.now()) - timedelta(hours=PING_LOG_RETENTION_HOURS)
+
+def minute_cutoff(now: datetime | None = None):
+    return (now or datetime.now()) - timedelta(days=PING_MINUTE_RETENTION_DAYS)
+
+def _delete_chunked(db, model, condition, chunk):
+    deleted = 0
+    while True:
+        res = db.execute(delete(model).where(*condition).with_dialect_options(mysql_limit=chunk))
+        db.commit()
+        deleted += res.rowcount or 0
+        if (res.rowcount or 0) < chunk: return deleted
+        time.sleep(CHUNK_PAUSE)
+
+def purge_ping_logs(chunk: int = RETENTION_CHUNK):
+    if not _purge_lock.acquire(blocking=False): return 0
+    now = datetime.now()
+    deleted = 0
+    db = database.SessionLocal()
+    try:
+        # ix_ping_logs_timestamp / prefiks uq_ping_rollup (period, bucket_start)
+        raw = _delete_chunked(db, PingLog, [PingLog.timestamp < raw_cutoff(now)], chunk)
+        minute = _delete_chunked(db, PingRollup, [PingRollup.period == "minute", PingRollup.bucket_start < minute_cutoff(now)], chunk)
+        minute += _delete_chunked(db, LatencySketch, [LatencySketch.period == "minute", LatencySketch.bucket_start < minute_cutoff(now)], chunk)
+        deleted = raw + minute
+        if deleted: logging.info(f"Ping retention: {raw} raw rows, {minute} minute rollups/sketches removed")
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Ping log retention error: {e}")
+    finally:
+        db.close()
+        _purge_lock.release()
+    return deleted
+
+def ping_tier(start: datetime, end: datetime, points: int):
+    """Warstwa, z której czytać serię: "raw", gdy zakres mieści się w oknie surowych danych,
+    w przeciwnym razie najgrubszy okres agregatów nie większy niż kubełek wykresu,
+    spośród okresów, które jeszcze pokrywają początek zakresu.
+    """
+    now = datetime.now()
+    if start >= raw_cutoff(now):
+        return "raw"
+    periods = [p for p in SOURCE_PERIODS["ping"] if p != "minute" or start >= minute_cutoff(now)]
+    size = bucket_seconds_for(start, end, points)
+    fitting = [p for p in periods if PERIOD_SECONDS[p] <= size]
+    return fitting[-1] if fitting else periods[0]
+
+def setup_retention_schedule():
+    scheduler.add_job("ping-retention", purge_ping_logs, IntervalTrigger(RETENTION_INTERVAL_MINUTES * 60), jitter=RETENTION_JITTER)
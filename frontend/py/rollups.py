@@ -0,0 +1,227 @@
+import math
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, insert, literal, literal_column, delete
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from . import database
+from .downsample import bucket_seconds_for
+from .models import SpeedtestResult, PingLog, SpeedtestRollup, PingRollup
+
+# --- Agregaty minutowe / godzinowe / dzienne (rollups) ---
+# Każdy zapis wyniku lub pingu dokłada się do kubełka (period, bucket_start, klucz, metryka)
+# przez INSERT ... ON DUPLICATE KEY UPDATE, więc zapytania o statystyki z miesięcy
+# czytają setki wierszy agregatów zamiast milionów surowych rekordów.
+# Dla pingów agregaty są też warstwami retencji: surowe ping_logs -> minuty -> godziny/dni.
+
+ROLLUP_PERIODS = {
+    "minute": "%Y-%m-%d %H:%i:00",
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d 00:00:00",
+}
+
+PERIOD_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+
+# Kubełki minutowe mają sens tylko dla gęstych danych watchdoga
+SOURCE_PERIODS = {
+    "speedtest": ("hour", "day"),
+    "ping": ("minute", "hour", "day"),
+}
+
+SPEEDTEST_METRICS = ["download", "upload", "ping", "jitter"]
+PING_METRICS = ["latency", "packet_loss", "is_online"]
+
+# źródło -> (tabela surowa, tabela agregatów, kolumna klucza, wartość dla NULL, metryki)
+ROLLUP_SOURCES = {
+    "speedtest": (SpeedtestResult, SpeedtestRollup, "server_id", 0, SPEEDTEST_METRICS),
+    "ping": (PingLog, PingRollup, "target", "", PING_METRICS),
+}
+
+def truncate(ts: datetime, period: str):
+    if period == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if period == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def period_length(period: str):
+    return timedelta(seconds=PERIOD_SECONDS[period])
+
+def _num(v):
+    return round(float(v), 3) if v is not None else None
+
+def _upsert(db, rollup, rows):
+    if not rows: return
+    table = rollup.__table__
+    stmt = mysql_insert(table).values(rows)
+    stmt = stmt.on_duplicate_key_update(
+        samples=table.c.samples + stmt.inserted.samples,
+        total=table.c.total + stmt.inserted.total,
+        min_value=func.least(func.coalesce(table.c.min_value, stmt.inserted.min_value), stmt.inserted.min_value),
+        max_value=func.greatest(func.coalesce(table.c.max_value, stmt.inserted.max_value), stmt.inserted.max_value),
+        sum_sq=table.c.sum_sq + stmt.inserted.sum_sq,
+    )
+    db.execute(stmt)
+
+def rollup_rows(source, records):
+    """Buduje wiersze agregatów dla listy rekordów (wyniki lub pingi) zsumowane w pamięci."""
+    _, _, key_col, key_default, metrics = ROLLUP_SOURCES[source]
+    buckets = {}
+    for rec in records:
+        ts = rec.timestamp or datetime.now()
+        key = getattr(rec, key_col)
+        key = key_default if key is None else key
+        for metric in metrics:
+            value = getattr(rec, metric)
+            if value is None: continue
+            value = float(value)
+            for period in SOURCE_PERIODS[source]:
+                k = (period, truncate(ts, period), key, metric)
+                b = buckets.get(k)
+                if b is None:
+                    buckets[k] = {"samples": 1, "total": value, "min_value": value, "max_value": value, "sum_sq": value * value}
+                else:
+                    b["samples"] += 1
+                    b["total"] += value
+                    b["min_value"] = min(b["min_value"], value)
+                    b["max_value"] = max(b["max_value"], value)
+                    b["sum_sq"] += value * value
+
+    return [
+        {"period": p, "bucket_start": bs, key_col: key, "metric": m, **agg}
+        for (p, bs, key, m), agg in buckets.items()
+    ]
+
+def update_rollups(db, source, records):
+    """Dokłada rekordy do agregatów w bieżącej transakcji (commit robi wywołujący)."""
+    _upsert(db, ROLLUP_SOURCES[source][1], rollup_rows(source, records))
+
+def backfill_rollups(db, source, start: datetime | None = None, end: datetime | None = None):
+    """Przelicza agregaty z surowych danych w zakresie [start, end) po stronie bazy.
+
+    Bez podanego startu przebudowywane są tylko kubełki w pełni pokryte surowymi danymi,
+    żeby nie nadpisać agregatów ze zdarzeń, które retencja już usunęła z ping_logs.
+    """
+    raw, rollup, key_col, key_default, metrics = ROLLUP_SOURCES[source]
+    earliest = db.query(func.min(raw.timestamp)).scalar()
+    if earliest is None: return 0
+
+    inserted = 0
+    for period in SOURCE_PERIODS[source]:
+        fmt = ROLLUP_PERIODS[period]
+        p_start = start or earliest
+        if truncate(p_start, period) != p_start:
+            p_start = truncate(p_start, period) + (period_length(period) if source == "ping" and not start else timedelta(0))
+        p_end = truncate(end, period) if end else None
+
+        cond = [rollup.period == period, rollup.bucket_start >= p_start]
+        if p_end: cond.append(rollup.bucket_start < p_end)
+        db.execute(delete(rollup).where(*cond))
+
+        bucket = func.date_format(raw.timestamp, fmt).label("bucket")
+        key_expr = func.coalesce(getattr(raw, key_col), key_default).label("rollup_key")
+        for metric in metrics:
+            col = getattr(raw, metric)
+            where = [col.isnot(None), raw.timestamp >= p_start]
+            if p_end: where.append(raw.timestamp < p_end)
+            sel = (
+                select(
+                    literal(period), bucket, key_expr, literal(metric),
+                    func.count(col), func.sum(col), func.min(col), func.max(col), func.sum(col * col)
+                )
+                .where(*where)
+                .group_by(literal_column("bucket"), literal_column("rollup_key"))
+            )
+            res = db.execute(insert(rollup).from_select(
+                ["period", "bucket_start", key_col, "metric", "samples", "total", "min_value", "max_value", "sum_sq"], sel
+            ))
+            inserted += res.rowcount or 0
+
+    return inserted
+
+def rollup_stats(db, source, start: datetime, end: datetime, key=None):
+    """Statystyki (count/avg/min/max/stddev) każdej metryki z agregatów.
+
+    Zakres jest wyrównywany do granic kubełków; dla zakresów >= 7 dni używane są kubełki dzienne.
+    """
+    _, rollup, key_col, _, metrics = ROLLUP_SOURCES[source]
+    period = "day" if end - start >= timedelta(days=7) else "hour"
+
+    q = db.query(
+        rollup.metric,
+        func.sum(rollup.samples), func.sum(rollup.total),
+        func.min(rollup.min_value), func.max(rollup.max_value), func.sum(rollup.sum_sq)
+    ).filter(
+        rollup.period == period,
+        rollup.bucket_start >= truncate(start, period),
+        rollup.bucket_start < end
+    )
+    if key is not None: q = q.filter(getattr(rollup, key_col) == key)
+
+    stats = {m: {"count": 0, "avg": None, "min": None, "max": None, "stddev": None} for m in metrics}
+    for metric, n, total, mn, mx, sum_sq in q.group_by(rollup.metric).all():
+        if metric not in stats or not n: continue
+        n = int(n)
+        mean = float(total) / n
+        variance = max(float(sum_sq) / n - mean * mean, 0.0)
+        stats[metric] = {
+            "count": n,
+            "avg": round(mean, 3),
+            "min": round(mn, 3) if mn is not None else None,
+            "max": round(mx, 3) if mx is not None else None,
+            "stddev": round(math.sqrt(variance), 3)
+        }
+
+    return {"period": period, "stats": stats}
+
+def rollup_series(db, source, columns, start: datetime, end: datetime, points: int, period: str, key=None):
+    """Seria min/avg/max z agregatów danego okresu, w formacie trybu "buckets" z downsample.
+
+    Gdy kubełków okresu jest więcej niż points, baza łączy je w większe (wielokrotność okresu).
+    """
+    _, rollup, key_col, _, _ = ROLLUP_SOURCES[source]
+    step = PERIOD_SECONDS[period]
+    size = math.ceil(bucket_seconds_for(start, end, points) / step) * step
+    bucket = func.floor(func.unix_timestamp(rollup.bucket_start) / size).label("bucket")
+
+    q = db.query(
+        bucket, rollup.metric,
+        func.sum(rollup.samples), func.sum(rollup.total), func.min(rollup.min_value), func.max(rollup.max_value)
+    ).filter(
+        rollup.period == period,
+        rollup.bucket_start >= truncate(start, period),
+        rollup.bucket_start < end,
+        rollup.metric.in_(columns)
+    )
+    if key is not None: q = q.filter(getattr(rollup, key_col) == key)
+    rows = q.group_by(literal_column("bucket"), rollup.metric).order_by(literal_column("bucket")).all()
+
+    times = sorted({int(r[0]) for r in rows})
+    index = {b: i for i, b in enumerate(times)}
+    series = {c: {"min": [None] * len(times), "avg": [None] * len(times), "max": [None] * len(times)} for c in columns}
+    for b, metric, n, total, mn, mx in rows:
+        s, i = series[metric], index[int(b)]
+        s["min"][i] = _num(mn)
+        s["avg"][i] = _num(float(total) / int(n)) if n else None
+        s["max"][i] = _num(mx)
+
+    return {
+        "mode": "buckets", "tier": period, "bucket_seconds": size,
+        "time": [datetime.fromtimestamp(b * size) for b in times], "series": series
+    }
+
+def run_backfill():
+    db = database.SessionLocal()
+    try:
+        for source in ROLLUP_SOURCES:
+            count = backfill_rollups(db, source)
+            db.commit()
+            logging.info(f"Rollup backfill ({source}): {count} rows")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    # Jednorazowe przeliczenie agregatów: python -m py.rollups
+    from .config import setup_logging
+    setup_logging()
+    database.initialize_db({}, 10, 5)
+    run_backfill()
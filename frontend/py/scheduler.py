@@ -0,0 +1,305 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from . import database
+from .models import ScheduledJob
+
+# --- Harmonogram zadań (speedtest, backup, retencja) ---
+# Kopiec (termin, nr, nazwa) + Condition: wątek śpi dokładnie do najbliższego terminu
+# (albo do zmiany harmonogramu), zamiast budzić się co sekundę.
+# Terminy są zapisywane w scheduled_jobs, więc restart nie przesuwa rytmu - przy tym samym
+# wyzwalaczu zadanie wraca ze swoim zapisanym next_run (przegapiony termin: jedno uruchomienie).
+# Kolejny termin interwału liczy się od poprzedniego terminu, a nie od końca wykonania (bez dryfu).
+# Zadania wykonuje mała pula wątków; nakładające się uruchomienie tego samego zadania jest pomijane.
+
+MAX_SLEEP = 60 # ograniczenie snu - odporność na zmianę zegara systemowego
+WORKERS = 4
+
+# --- Wyzwalacze ---
+
+class IntervalTrigger:
+    """Co `seconds` sekund; opcjonalnie zakotwiczony o godzinie HH:MM (np. backup co N dni o 03:00)."""
+
+    def __init__(self, seconds: int, at: str | None = None):
+        self.period = timedelta(seconds=max(int(seconds), 1))
+        self.at = at
+        self.spec = f"every {int(self.period.total_seconds())}s" + (f" at {at}" if at else "")
+
+    def first(self, now: datetime):
+        if not self.at:
+            return now + self.period
+        hh, mm = (int(x) for x in self.at.split(":"))
+        t = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
+        return t if t > now else t + timedelta(days=1)
+
+    def next(self, prev_due: datetime, now: datetime):
+        t = prev_due + self.period
+        if t <= now:
+            # Przegapione terminy są łączone w jeden - wracamy do siatki interwału
+            missed = (now - t) // self.period + 1
+            t += missed * self.period
+        return t
+
+class OnceTrigger:
+    def __init__(self, delay: int):
+        self.delay = timedelta(seconds=delay)
+        self.spec = f"once +{delay}s"
+
+    def first(self, now: datetime):
+        return now + self.delay
+
+    def next(self, prev_due: datetime, now: datetime):
+        return None
+
+_CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+def _parse_cron_field(text: str, lo: int, hi: int):
+    values = set()
+    for part in text.split(","):
+        rng, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if step < 1: raise ValueError(f"Invalid step in '{part}'")
+        if rng == "*":
+            start, end = lo, hi
+        elif "-" in rng:
+            start, end = (int(x) for x in rng.split("-", 1))
+        else:
+            start = int(rng)
+            end = hi if step > 1 else start
+        if not (lo <= start <= hi and lo <= end <= hi and start <= end):
+            raise ValueError(f"Value out of range in '{part}'")
+        values.update(range(start, end + 1, step))
+    return values
+
+class CronTrigger:
+    """Wyrażenie cron z 5 polami: minuta godzina dzień-miesiąca miesiąc dzień-tygodnia (0/7 = niedziela)."""
+
+    def __init__(self, expr: str):
+        fields = expr.split()
+        if len(fields) != 5: raise ValueError("Cron expression needs 5 fields")
+        parsed = [_parse_cron_field(f, lo, hi) for f, (lo, hi) in zip(fields, _CRON_FIELDS)]
+        if 7 in parsed[4]: parsed[4] = (parsed[4] - {7}) | {0} # 7 = niedziela
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (sorted(v) for v in parsed)
+        # Jak w cronie: gdy oba pola dni są ograniczone, wystarczy zgodność jednego z nich.
+        # "Dowolny" = zbiór obejmuje cały zakres (także "*/1", "1-31", "0-7"), nie tekst "*"
+        self.dom_any = len(self.days) == 31
+        self.dow_any = len(self.weekdays) == 7
+        self.spec = "cron " + " ".join(fields)
+
+    def _day_matches(self, d: datetime):
+        if d.month not in self.months: return False
+        dom = d.day in self.days
+        dow = (d.weekday() + 1) % 7 in self.weekdays
+        if self.dom_any: return dow
+        if self.dow_any: return dom
+        return dom or dow
+
+    def after(self, t: datetime):
+        t = t.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = t.replace(hour=0, minute=0)
+        for _ in range(366 * 5):
+            if self._day_matches(day):
+                for h in self.hours:
+                    if day.date() == t.date() and h < t.hour: continue
+                    for m in self.minutes:
+                        candidate = day.replace(hour=h, minute=m)
+                        if candidate >= t: return candidate
+            day += timedelta(days=1)
+        raise ValueError("Cron expression never fires")
+
+    def first(self, now: datetime):
+        return self.after(now)
+
+    def next(self, prev_due: datetime, now: datetime):
+        return self.after(max(prev_due, now))
+
+def parse_cron(expr: str):
+    """Walidacja wyrażenia dla API - ValueError z opisem błędu."""
+    trigger = CronTrigger(expr)
+    trigger.first(datetime.now())
+    return trigger
+
+# --- Harmonogram ---
+
+class _Job:
+    def __init__(self, name, func, trigger, jitter, persist, on_reschedule):
+        self.name = name
+        self.func = func
+        self.trigger = trigger
+        self.jitter = jitter
+        self.persist = persist
+        self.on_reschedule = on_reschedule
+        self.slot = None # termin z wyzwalacza (bez rozrzutu) - od niego liczy się kolejny
+        self.due = None # faktyczny termin uruchomienia: slot + losowy rozrzut
+        self.last_run = None
+        self.last_lag = None
+        self.last_duration = None
+        self.last_error = None
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+
+    def set_slot(self, slot):
+        self.slot = slot
+        self.due = slot + timedelta(seconds=random.uniform(0, self.jitter)) if slot and self.jitter else slot
+
+    def to_dict(self, running):
+        return {
+            "name": self.name, "trigger": self.trigger.spec, "jitter": self.jitter,
+            "next_run": self.due, "running": running,
+            "last_run": self.last_run,
+            "last_lag_ms": round(self.last_lag * 1000, 1) if self.last_lag is not None else None,
+            "last_duration_s": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "last_error": self.last_error,
+            "runs": self.runs, "failures": self.failures, "skipped": self.skipped
+        }
+
+class Scheduler:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._jobs = {}
+        self._running = set() # nazwy zadań w trakcie wykonania - przetrwają podmianę zadania
+        self._thread = None
+        self._pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="scheduler")
+
+    # Stan w bazie (błędy zapisu nie zatrzymują harmonogramu)
+    def _load(self, name):
+        db = database.SessionLocal()
+        try:
+            return db.query(ScheduledJob).filter(ScheduledJob.name == name).first()
+        except Exception as e:
+            logging.error(f"Scheduler state load error ({name}): {e}")
+            return None
+        finally:
+            db.close()
+
+    def _save(self, job):
+        if not job.persist: return
+        db = database.SessionLocal()
+        try:
+            db.merge(ScheduledJob(
+                name=job.name, spec=job.trigger.spec, next_run=job.slot, last_run=job.last_run,
+                last_lag=job.last_lag, last_duration=job.last_duration, runs=job.runs, failures=job.failures
+            ))
+            db.commit()
+        except Exception as e:
+            logging.error(f"Scheduler state save error ({job.name}): {e}")
+        finally:
+            db.close()
+
+    def add_job(self, name, func, trigger, jitter: float = 0, persist: bool = True, on_reschedule=None):
+        """Dodaje albo podmienia zadanie. Zapisany termin jest używany, jeśli wyzwalacz się nie zmienił."""
+        job = _Job(name, func, trigger, jitter, persist, on_reschedule)
+        now = datetime.now()
+        row = self._load(name) if persist else None
+        if row and row.spec == trigger.spec and row.next_run:
+            # Termin z przeszłości (przestój) odpala się od razu, a kolejne zostają na tej samej siatce
+            job.set_slot(row.next_run)
+            job.last_run, job.last_lag, job.last_duration = row.last_run, row.last_lag, row.last_duration
+            job.runs, job.failures = row.runs or 0, row.failures or 0
+        else:
+            job.set_slot(trigger.first(now))
+
+        with self._cond:
+            self._jobs[name] = job
+            heapq.heappush(self._heap, (job.due, next(self._seq), name))
+            self._cond.notify()
+        self._save(job)
+        if on_reschedule: on_reschedule(job.due)
+        return job.due
+
+    def remove_job(self, name):
+        with self._cond:
+            job = self._jobs.pop(name, None)
+            self._cond.notify()
+        if job and job.on_reschedule: job.on_reschedule(None)
+
+    def next_run(self, name):
+        with self._cond:
+            job = self._jobs.get(name)
+            return job.due if job else None
+
+    def jobs(self):
+        with self._cond:
+            jobs = sorted(self._jobs.values(), key=lambda j: j.due or datetime.max)
+            return [j.to_dict(j.name in self._running) for j in jobs]
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    # Wpisy po usuniętych/podmienionych zadaniach są pomijane przy zdejmowaniu
+                    while self._heap:
+                        due, _, name = self._heap[0]
+                        job = self._jobs.get(name)
+                        if job and job.due == due: break
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait(MAX_SLEEP)
+                        continue
+                    wait = (self._heap[0][0] - datetime.now()).total_seconds()
+                    if wait <= 0: break
+                    self._cond.wait(min(wait, MAX_SLEEP))
+
+                due, _, name = heapq.heappop(self._heap)
+                job = self._jobs[name]
+                now = datetime.now()
+                job.set_slot(job.trigger.next(job.slot, now))
+                if job.due is None:
+                    self._jobs.pop(name)
+                else:
+                    heapq.heappush(self._heap, (job.due, next(self._seq), name))
+                skip = name in self._running
+                if skip:
+                    job.skipped += 1
+                else:
+                    self._running.add(name)
+
+            if skip:
+                logging.warning(f"Scheduler: '{name}' still running, skipped run due {due:%Y-%m-%d %H:%M:%S}")
+                self._pool.submit(self._save, job)
+            else:
+                self._pool.submit(self._execute, job, due, now)
+            if job.on_reschedule:
+                try:
+                    job.on_reschedule(job.due)
+                except Exception as e:
+                    logging.error(f"Scheduler callback error ({name}): {e}")
+
+    def _execute(self, job, due, started_at):
+        lag = (started_at - due).total_seconds()
+        t0 = time.perf_counter()
+        error = None
+        try:
+            job.func()
+        except Exception as e:
+            error = str(e)
+            logging.error(f"Scheduler job '{job.name}' failed: {e}")
+        finally:
+            with self._cond:
+                self._running.discard(job.name)
+        duration = time.perf_counter() - t0
+        with self._cond:
+            # Zadanie mogło zostać podmienione w trakcie - statystyki trafiają do aktualnej wersji
+            job = self._jobs.get(job.name, job)
+            job.last_run = started_at
+            job.last_lag = lag
+            job.last_duration = duration
+            job.last_error = error
+            job.runs += 1
+            if error: job.failures += 1
+        self._save(job)
+
+scheduler = Scheduler()
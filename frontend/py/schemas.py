@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 
 # --- Modele Pydantic (Walidacja danych API) ---
@@ -6,8 +6,12 @@ from typing import Optional, List
 class SettingsModel(BaseModel):
     server_id: int | None = None
     schedule_hours: int | None = None
+    schedule_cron: str | None = None # "" usuwa wyrażenie (powrót do schedule_hours)
     ping_target: str | None = None
     ping_interval: int | None = None
+    watchdog_down_after: int | None = None
+    watchdog_up_after: int | None = None
+    watchdog_digest_minutes: int | None = None
     declared_download: int | None = None
     declared_upload: int | None = None
     startup_test_enabled: bool | None = None
@@ -30,6 +34,7 @@ class NotificationSettingsModel(BaseModel):
     ntfy_server: str | None = "https://ntfy.sh"
     pushover_user_key: str | None = None
     pushover_api_token: str | None = None
+    providers: list[str] | None = None # rozsyłanie do kilku dostawców naraz
 
 class NotificationTestModel(BaseModel):
     provider: str
@@ -56,6 +61,32 @@ class OIDCSettingsModel(BaseModel):
     client_secret: str | None = None
     discovery_url: str | None = None
 
+class WatchdogTargetModel(BaseModel):
+    name: str | None = None
+    probe_type: str | None = "icmp"
+    host: str
+    port: int | None = 0
+    resolver: str | None = None
+    interval: int | None = 30
+    enabled: bool | None = True
+
+CAMPAIGN_SERVER_IDS_CHARS = 255 # długość kolumny campaigns.server_ids
+
+class CampaignModel(BaseModel):
+    name: str = Field(max_length=100)
+    server_ids: list[int] = Field(min_length=1)
+    schedule_hours: int | None = 0
+    schedule_cron: str | None = Field(None, max_length=100)
+    enabled: bool | None = True
+
+    @field_validator("server_ids")
+    @classmethod
+    def server_ids_fit_column(cls, v):
+        # Lista jest zapisywana jako tekst "id,id,..." - za długa dałaby błąd bazy zamiast 422
+        if any(i <= 0 for i in v): raise ValueError("Server ids must be positive")
+        if len(",".join(str(i) for i in dict.fromkeys(v))) > CAMPAIGN_SERVER_IDS_CHARS: raise ValueError("Too many server ids")
+        return v
+
 class DeleteModel(BaseModel):
     ids: list[str]
 
@@ -0,0 +1,113 @@
+import os
+import json
+import socket
+import subprocess
+import threading
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from .config import get_log, SERVERS_FILE, SERVERS_REFRESH_HOURS
+from . import dataversion
+from .scheduler import scheduler, IntervalTrigger
+
+# --- Katalog serwerów Ookla ---
+# Lista z `speedtest --servers` trzymana w pamięci (servers.json służy tylko do szybkiego startu)
+# i odświeżana w tle co SERVERS_REFRESH_HOURS. Przy każdym odświeżeniu serwery są sondowane
+# równolegle (czas nawiązania połączenia TCP) i sortowane od najszybszego.
+# AUTO_BEST jako server_id oznacza "najszybszy serwer z ostatniego rankingu".
+
+AUTO_BEST = 0
+PROBE_TIMEOUT = 2.0
+PROBE_ATTEMPTS = 3
+PROBE_WORKERS = 16
+
+def _tcp_rtt(host, port):
+    """Najkrótszy z PROBE_ATTEMPTS czasów nawiązania połączenia TCP [ms] albo None."""
+    best = None
+    for _ in range(PROBE_ATTEMPTS):
+        t0 = time.perf_counter()
+        try:
+            with socket.create_connection((host, port), timeout=PROBE_TIMEOUT):
+                rtt = (time.perf_counter() - t0) * 1000
+        except OSError:
+            continue
+        best = rtt if best is None else min(best, rtt)
+    return round(best, 1) if best is not None else None
+
+def _host_port(server):
+    host = server.get("host", "")
+    if ":" in host:
+        host, port = host.rsplit(":", 1)
+        return host, int(port)
+    return host, int(server.get("port") or 8080)
+
+class ServerCatalogue:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._servers = []
+        self._updated = None
+
+    def _set(self, servers, updated):
+        with self._lock:
+            self._servers = servers
+            self._updated = updated
+        dataversion.bump("servers")
+
+    def load_cached(self):
+        """Lista z servers.json z poprzedniego uruchomienia - dostępna zanim skończy się pierwsze odświeżenie."""
+        if not os.path.exists(SERVERS_FILE) or os.stat(SERVERS_FILE).st_size == 0: return False
+        try:
+            with open(SERVERS_FILE, 'r', encoding='utf-8') as f: data = json.load(f)
+        except Exception as e:
+            logging.error(get_log("servers_err", e))
+            return False
+        self._set(data.get("servers", []), datetime.fromtimestamp(os.path.getmtime(SERVERS_FILE)))
+        return True
+
+    def refresh(self):
+        if not self._refresh_lock.acquire(blocking=False): return
+        try:
+            res = subprocess.run(
+                ['speedtest', '--accept-license', '--accept-gdpr', '--servers', '--format=json'],
+                capture_output=True, text=True, check=True, timeout=60
+            )
+            servers = json.loads(res.stdout).get("servers", [])
+            self._set(self.rank(servers), datetime.now())
+            with open(SERVERS_FILE, 'w', encoding='utf-8') as f:
+                json.dump({"servers": self._servers}, f)
+            logging.info(get_log("servers_refreshed", len(servers)))
+        except Exception as e:
+            logging.error(get_log("servers_err", e))
+        finally:
+            self._refresh_lock.release()
+
+    def rank(self, servers):
+        """Kopia listy z polem rtt, posortowana od najszybszego (nieosiągalne na końcu)."""
+        servers = [dict(s) for s in servers]
+        with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as pool:
+            rtts = list(pool.map(lambda s: _tcp_rtt(*_host_port(s)), servers))
+        for s, rtt in zip(servers, rtts): s["rtt"] = rtt
+        servers.sort(key=lambda s: (s["rtt"] is None, s["rtt"] or 0))
+        return servers
+
+    def snapshot(self):
+        with self._lock:
+            servers = list(self._servers)
+            updated = self._updated
+        best = next((s["id"] for s in servers if s.get("rtt") is not None), None)
+        return {"servers": servers, "updated": updated, "best_id": best}
+
+    def resolve(self, server_id):
+        """AUTO_BEST -> id najszybszego serwera (albo None - wybór CLI); inne wartości bez zmian."""
+        if server_id != AUTO_BEST: return server_id
+        best = self.snapshot()["best_id"]
+        return int(best) if best is not None else None
+
+    def start(self):
+        fresh = self.load_cached() and datetime.now() - self._updated < timedelta(hours=SERVERS_REFRESH_HOURS)
+        if not fresh: threading.Thread(target=self.refresh, daemon=True).start()
+        scheduler.add_job("server-catalogue", self.refresh, IntervalTrigger(SERVERS_REFRESH_HOURS * 3600), jitter=300)
+
+server_catalogue = ServerCatalogue()
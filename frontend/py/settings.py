@@ -1,48 +1,54 @@
-import os
-import json
 import logging
-import schedule
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from .database import get_db
 from .models import AppSettings, NotificationSettings, SpeedtestResult
 from .schemas import SettingsModel, NotificationSettingsModel, NotificationTestModel
 from .dependencies import verify_session
-from .config import get_log, NOTIF_TRANS, SERVERS_FILE
-from .speedtest import update_scheduler, scheduler_lock
-import requests
-from datetime import datetime
+from .config import get_log, NOTIF_TRANS
+from .servers import server_catalogue
+from .speedtest import update_scheduler, SPEEDTEST_JOB
+from .scheduler import scheduler, parse_cron
+from . import dataversion
+from . import events
+from . import settings_cache
+from .notifications import dispatcher, PROVIDERS
 
 router = APIRouter(dependencies=[Depends(verify_session)])
 
 def get_next_run_time():
-    with scheduler_lock:
-        job = next((j for j in schedule.jobs if 'hourly-test' in j.tags), None)
-        if job and job.next_run:
-            return job.next_run.isoformat()
-    return None
+    next_run = scheduler.next_run(SPEEDTEST_JOB)
+    return next_run.isoformat() if next_run else None
 
 @router.get("/api/servers")
-async def get_srv():
-    if os.path.exists(SERVERS_FILE):
-        with open(SERVERS_FILE, 'r') as f: return json.load(f)
-    raise HTTPException(status_code=404)
+def get_srv(request: Request, response: Response):
+    not_modified = dataversion.check_not_modified(request, response, "servers")
+    if not_modified: return not_modified
+    return server_catalogue.snapshot()
 
 @router.get("/api/settings")
-async def get_set(db: Session = Depends(get_db)):
-    s = db.query(AppSettings).filter(AppSettings.id == 1).first()
+def get_set(request: Request, response: Response, db: Session = Depends(get_db)):
+    not_modified = dataversion.check_not_modified(request, response, "settings", "results")
+    if not_modified: return not_modified
+
+    s = settings_cache.app_settings.get()
     if not s:
-        s = AppSettings(id=1)
-        db.add(s)
+        db.add(AppSettings(id=1))
         db.commit()
+        settings_cache.app_settings.invalidate()
+        s = settings_cache.app_settings.get()
     l = db.query(SpeedtestResult).order_by(SpeedtestResult.timestamp.desc()).first()
     next_run = get_next_run_time()
 
     return {
         "selected_server_id": s.selected_server_id,
         "schedule_hours": s.schedule_hours,
+        "schedule_cron": s.schedule_cron,
         "ping_target": s.ping_target,
         "ping_interval": s.ping_interval,
+        "watchdog_down_after": s.watchdog_down_after,
+        "watchdog_up_after": s.watchdog_up_after,
+        "watchdog_digest_minutes": s.watchdog_digest_minutes,
         "declared_download": s.declared_download,
         "declared_upload": s.declared_upload,
         "startup_test_enabled": s.startup_test_enabled,
@@ -61,16 +67,28 @@ async def get_set(db: Session = Depends(get_db)):
     }
 
 @router.post("/api/settings")
-async def set_set(s: SettingsModel, db: Session = Depends(get_db)):
+def set_set(s: SettingsModel, db: Session = Depends(get_db)):
     rec = db.query(AppSettings).filter(AppSettings.id == 1).first()
     if not rec: rec = AppSettings(id=1); db.add(rec)
     
-    update_sched = (s.schedule_hours is not None and s.schedule_hours != rec.schedule_hours)
+    cron = None
+    if s.schedule_cron is not None:
+        cron = " ".join(s.schedule_cron.split()) or None
+        if cron:
+            try: parse_cron(cron)
+            except ValueError as e: raise HTTPException(status_code=400, detail=f"Invalid cron expression: {e}")
+
+    update_sched = (s.schedule_hours is not None and s.schedule_hours != rec.schedule_hours) or \
+        (s.schedule_cron is not None and cron != rec.schedule_cron)
     
     rec.selected_server_id = s.server_id
     if s.schedule_hours is not None: rec.schedule_hours = s.schedule_hours
+    if s.schedule_cron is not None: rec.schedule_cron = cron
     if s.ping_target: rec.ping_target = s.ping_target
     if s.ping_interval: rec.ping_interval = s.ping_interval
+    if s.watchdog_down_after: rec.watchdog_down_after = max(s.watchdog_down_after, 1)
+    if s.watchdog_up_after: rec.watchdog_up_after = max(s.watchdog_up_after, 1)
+    if s.watchdog_digest_minutes is not None: rec.watchdog_digest_minutes = max(s.watchdog_digest_minutes, 0)
     if s.declared_download is not None: rec.declared_download = s.declared_download
     if s.declared_upload is not None: rec.declared_upload = s.declared_upload
     if s.startup_test_enabled is not None: rec.startup_test_enabled = s.startup_test_enabled
@@ -87,15 +105,21 @@ async def set_set(s: SettingsModel, db: Session = Depends(get_db)):
     if s.app_language: rec.app_language = s.app_language
 
     db.commit()
-    if update_sched: update_scheduler(rec.schedule_hours)
+    settings_cache.app_settings.invalidate()
+    dataversion.bump("settings")
+    if update_sched: update_scheduler(rec.schedule_hours, rec.schedule_cron)
     next_run = get_next_run_time()
+    events.publish("settings", {"next_run_time": next_run})
     logging.info(get_log("settings_updated"))
     return {"message": "Settings saved", "next_run_time": next_run}
 
 @router.get("/api/notifications/settings")
-async def get_notif_settings(db: Session = Depends(get_db)):
-    ns = db.query(NotificationSettings).filter(NotificationSettings.id == 1).first()
-    if not ns: ns = NotificationSettings(id=1); db.add(ns); db.commit()
+def get_notif_settings(db: Session = Depends(get_db)):
+    ns = settings_cache.notification_settings.get()
+    if not ns:
+        db.add(NotificationSettings(id=1)); db.commit()
+        settings_cache.notification_settings.invalidate()
+        ns = settings_cache.notification_settings.get()
     return {
         "enabled": ns.enabled,
         "provider": ns.provider,
@@ -103,11 +127,12 @@ async def get_notif_settings(db: Session = Depends(get_db)):
         "ntfy_topic": ns.ntfy_topic,
         "ntfy_server": ns.ntfy_server,
         "pushover_user_key": ns.pushover_user_key,
-        "pushover_api_token": ns.pushover_api_token
+        "pushover_api_token": ns.pushover_api_token,
+        "providers": [p for p in (ns.providers or "").split(",") if p]
     }
 
 @router.post("/api/notifications/settings")
-async def save_notif_settings(s: NotificationSettingsModel, db: Session = Depends(get_db)):
+def save_notif_settings(s: NotificationSettingsModel, db: Session = Depends(get_db)):
     ns = db.query(NotificationSettings).filter(NotificationSettings.id == 1).first()
     if not ns: ns = NotificationSettings(id=1); db.add(ns)
     ns.enabled = s.enabled
@@ -117,36 +142,24 @@ async def save_notif_settings(s: NotificationSettingsModel, db: Session = Depend
     ns.ntfy_server = s.ntfy_server
     ns.pushover_user_key = s.pushover_user_key
     ns.pushover_api_token = s.pushover_api_token
+    # Lista dostawców (API): brak pola = bez zmian (formularz wysyła tylko provider), pusta lista czyści
+    if s.providers is not None:
+        if not set(s.providers) <= set(PROVIDERS): raise HTTPException(status_code=400, detail="Unknown provider")
+        ns.providers = ",".join(dict.fromkeys(s.providers)) or None
     db.commit()
+    settings_cache.notification_settings.invalidate()
     return {"message": "Notification settings saved"}
 
 @router.post("/api/notifications/test")
-async def test_notif(s: NotificationTestModel):
+def test_notif(s: NotificationTestModel):
     lang = s.language or "pl"
     trans = NOTIF_TRANS.get(lang, NOTIF_TRANS["pl"])
     msg = trans["test_body"]
     title = trans["test_title"]
 
     try:
-        if s.provider == "webhook":
-            if not s.webhook_url: raise ValueError("Missing Webhook URL")
-            payload = {"title": title, "message": msg, "type": "test", "timestamp": datetime.now().isoformat()}
-            requests.post(s.webhook_url, json=payload, timeout=5)
-        elif s.provider == "ntfy":
-            if not s.ntfy_topic: raise ValueError("Missing Ntfy Topic")
-            server = s.ntfy_server.rstrip('/') if s.ntfy_server else "https://ntfy.sh"
-            url = f"{server}/{s.ntfy_topic}"
-            headers = {"Title": title.encode('utf-8'), "Tags": "tada"}
-            requests.post(url, data=msg.encode('utf-8'), headers=headers, timeout=5)
-        elif s.provider == "pushover":
-            if not s.pushover_user_key or not s.pushover_api_token: raise ValueError("Missing Pushover Credentials")
-            requests.post("https://api.pushover.net/1/messages.json", data={
-                "token": s.pushover_api_token,
-                "user": s.pushover_user_key,
-                "message": msg,
-                "title": title
-            }, timeout=5)
-            
+        if s.provider in PROVIDERS:
+            dispatcher.send_test(s.provider, s, title, msg)
         return {"message": "Sent"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
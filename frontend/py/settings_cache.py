@@ -0,0 +1,54 @@
+import threading
+from collections import namedtuple
+from . import database
+from .models import AppSettings, NotificationSettings, OIDCSettings, DriveBackupSettings
+
+# --- Cache ustawień w pamięci procesu ---
+# Wiersz id=1 każdej tabeli ustawień jest czytany raz i trzymany jako niemutowalny snapshot
+# (namedtuple z kolumnami modelu), więc można go bezpiecznie współdzielić między wątkami.
+# Handlery POST wywołują invalidate() po commicie; następny odczyt przeładowuje wiersz.
+# Stan to jedno pole (_value albo _UNLOADED), więc odczyt bez blokady nie zobaczy
+# "załadowane, ale wartość już wyczyszczona" w trakcie równoległego invalidate().
+
+_UNLOADED = object()
+
+class SettingsCache:
+    def __init__(self, model):
+        self.model = model
+        self.snapshot_type = namedtuple(f"{model.__name__}Snapshot", model.__table__.columns.keys())
+        self._lock = threading.Lock()
+        self._value = _UNLOADED
+
+    def snapshot(self, row):
+        if row is None: return None
+        return self.snapshot_type(**{c: getattr(row, c) for c in self.snapshot_type._fields})
+
+    def get(self):
+        """Zwraca snapshot ustawień albo None, jeśli wiersz jeszcze nie istnieje."""
+        value = self._value
+        if value is not _UNLOADED:
+            return value
+        with self._lock:
+            value = self._value
+            if value is _UNLOADED:
+                db = database.SessionLocal()
+                try:
+                    row = db.query(self.model).filter(self.model.id == 1).first()
+                    value = self.snapshot(row)
+                finally:
+                    db.close()
+                self._value = value
+            return value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = _UNLOADED
+
+app_settings = SettingsCache(AppSettings)
+notification_settings = SettingsCache(NotificationSettings)
+oidc_settings = SettingsCache(OIDCSettings)
+drive_settings = SettingsCache(DriveBackupSettings)
+
+def invalidate_all():
+    for cache in (app_settings, notification_settings, oidc_settings, drive_settings):
+        cache.invalidate()
@@ -0,0 +1,195 @@
+import math
+import struct
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from .models import LatencySketch
+from .rollups import SOURCE_PERIODS, truncate
+
+# --- Szkice kwantyli opóźnień (DDSketch) ---
+# Każdy RTT trafia do kubełka logarytmicznego o względnej dokładności ALPHA, więc p50/p95/p99
+# z dowolnego okna to scalenie (suma liczników) szkiców z kubełków czasu - bez surowych wierszy.
+# Szkice per (okres, początek kubełka, cel) są zbierane w pamięci i zapisywane przez
+# ping_writer w tej samej transakcji co ping_logs. Jitter: średnia |RTT(n) - RTT(n-1)|
+# kolejnych odpowiedzi celu (jak w RFC 3550), sumowany obok szkicu.
+
+ALPHA = 0.01
+_GAMMA = (1 + ALPHA) / (1 - ALPHA)
+_LOG_GAMMA = math.log(_GAMMA)
+_MIN_VALUE = 1e-6
+_FORMAT_VERSION = 1
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+class DDSketch:
+    def __init__(self):
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        if value <= _MIN_VALUE:
+            self.zero_count += 1
+        else:
+            idx = math.ceil(math.log(value) / _LOG_GAMMA)
+            self.bins[idx] = self.bins.get(idx, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "DDSketch"):
+        for idx, c in other.bins.items():
+            self.bins[idx] = self.bins.get(idx, 0) + c
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float):
+        if not self.count: return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank: return 0.0
+        for idx in sorted(self.bins):
+            seen += self.bins[idx]
+            if seen > rank:
+                value = 2 * _GAMMA ** idx / (_GAMMA + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_bytes(self):
+        head = struct.pack("<BIIddd", _FORMAT_VERSION, self.zero_count, len(self.bins), self.sum, self.min, self.max)
+        return head + b"".join(struct.pack("<iI", idx, c) for idx, c in sorted(self.bins.items()))
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        sketch = cls()
+        version, sketch.zero_count, nbins, sketch.sum, sketch.min, sketch.max = struct.unpack_from("<BIIddd", data)
+        if version != _FORMAT_VERSION: raise ValueError(f"Unknown sketch format {version}")
+        offset = struct.calcsize("<BIIddd")
+        for idx, c in struct.iter_unpack("<iI", data[offset:offset + nbins * 8]):
+            sketch.bins[idx] = c
+        sketch.count = sketch.zero_count + sum(sketch.bins.values())
+        return sketch
+
+class _Bucket:
+    __slots__ = ("sketch", "jitter_sum", "jitter_samples")
+
+    def __init__(self):
+        self.sketch = DDSketch()
+        self.jitter_sum = 0.0
+        self.jitter_samples = 0
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        self.jitter_sum += other.jitter_sum
+        self.jitter_samples += other.jitter_samples
+
+class LatencySketches:
+    """Bufor szkiców w pamięci: (okres, początek kubełka, cel) -> szkic + jitter."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_rtt = {}
+
+    def add(self, target, timestamp: datetime, rtts):
+        received = [r for r in rtts if r is not None]
+        if not received: return
+        with self._lock:
+            prev = self._last_rtt.get(target)
+            diffs = []
+            for r in received:
+                if prev is not None: diffs.append(abs(r - prev))
+                prev = r
+            self._last_rtt[target] = prev
+
+            for period in SOURCE_PERIODS["ping"]:
+                key = (period, truncate(timestamp, period), target)
+                b = self._pending.get(key)
+                if b is None: b = self._pending[key] = _Bucket()
+                for r in received: b.sketch.add(r)
+                b.jitter_sum += sum(diffs)
+                b.jitter_samples += len(diffs)
+
+    def take(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def restore(self, pending):
+        """Oddaje niezapisane szkice do bufora (np. po błędzie zapisu)."""
+        with self._lock:
+            for key, b in pending.items():
+                cur = self._pending.get(key)
+                if cur is None: self._pending[key] = b
+                else: cur.merge(b)
+
+    def store(self, db, pending):
+        """Scala szkice z bufora z zapisanymi w bazie (commit robi wywołujący)."""
+        if not pending: return
+        keys = list(pending)
+        existing = {
+            (r.period, r.bucket_start, r.target): r
+            for r in db.query(LatencySketch).filter(or_(*[
+                and_(LatencySketch.period == p, LatencySketch.bucket_start == bs, LatencySketch.target == t)
+                for p, bs, t in keys
+            ])).all()
+        }
+        for key, b in pending.items():
+            rec = existing.get(key)
+            if rec is None:
+                period, bucket_start, target = key
+                db.add(LatencySketch(
+                    period=period, bucket_start=bucket_start, target=target, samples=b.sketch.count,
+                    jitter_sum=b.jitter_sum, jitter_samples=b.jitter_samples, sketch=b.sketch.to_bytes()
+                ))
+            else:
+                merged = DDSketch.from_bytes(rec.sketch)
+                merged.merge(b.sketch)
+                rec.sketch = merged.to_bytes()
+                rec.samples = merged.count
+                rec.jitter_sum = (rec.jitter_sum or 0) + b.jitter_sum
+                rec.jitter_samples = (rec.jitter_samples or 0) + b.jitter_samples
+
+latency_sketches = LatencySketches()
+
+def sketch_period(start: datetime, end: datetime, minute_available: bool):
+    """Okres szkiców dla okna: minuty do 6 h, godziny do 14 dni, dłużej dni."""
+    span = end - start
+    if span <= timedelta(hours=6) and minute_available: return "minute"
+    if span <= timedelta(days=14): return "hour"
+    return "day"
+
+def latency_percentiles(db, target, start: datetime, end: datetime, period: str, quantiles=DEFAULT_QUANTILES):
+    """Kwantyle i jitter RTT celu w oknie [start, end) ze scalonych szkiców."""
+    rows = db.query(LatencySketch).filter(
+        LatencySketch.period == period,
+        LatencySketch.target == target,
+        LatencySketch.bucket_start >= truncate(start, period),
+        LatencySketch.bucket_start < end
+    ).all()
+
+    merged = DDSketch()
+    jitter_sum, jitter_samples = 0.0, 0
+    for r in rows:
+        merged.merge(DDSketch.from_bytes(r.sketch))
+        jitter_sum += r.jitter_sum or 0
+        jitter_samples += r.jitter_samples or 0
+
+    def rnd(v): return round(v, 3) if v is not None else None
+    return {
+        "target": target, "period": period, "from": start, "to": end,
+        "count": merged.count,
+        "min": rnd(merged.min) if merged.count else None,
+        "max": rnd(merged.max) if merged.count else None,
+        "avg": rnd(merged.sum / merged.count) if merged.count else None,
+        "quantiles": {f"p{round(q * 100, 1):g}": rnd(merged.quantile(q)) for q in quantiles},
+        "jitter": rnd(jitter_sum / jitter_samples) if jitter_samples else None,
+        "relative_accuracy": ALPHA
+    }
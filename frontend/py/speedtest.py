@@ -1,111 +1,150 @@
-import os
 import json
 import subprocess
-import threading
 import logging
+import queue
+import threading
 import time
-import schedule
 import uuid
 from datetime import datetime
-from .config import get_log, NOTIF_TRANS, SERVERS_FILE
+from .config import get_log, NOTIF_TRANS, SPEEDTEST_PHASE_TIMEOUTS, SPEEDTEST_STALL_TIMEOUT, SPEEDTEST_JITTER
 from . import database 
-from .models import AppSettings, SpeedtestResult, NotificationSettings
-import requests
-
-# Blokady wątków
-test_lock = threading.Lock()
-scheduler_lock = threading.Lock()
-
-schedule_job = None
-
-def load_notification_settings(db):
-    settings = db.query(NotificationSettings).filter(NotificationSettings.id == 1).first()
-    if not settings:
-        settings = NotificationSettings(id=1, enabled=False, provider="browser")
-        db.add(settings)
-        db.commit()
-    return settings
-
-def send_system_notification(title: str, message: str, type: str = "info"):
-    db = database.SessionLocal()
+from . import dataversion
+from . import events
+from . import settings_cache
+from .models import SpeedtestResult
+from .rollups import update_rollups
+from .notifications import notify
+from .scheduler import scheduler, IntervalTrigger, CronTrigger, OnceTrigger
+from .servers import server_catalogue
+
+SPEEDTEST_JOB = "speedtest"
+STARTUP_JOB = "startup-test"
+STARTUP_DELAY = 60
+
+class SpeedtestError(Exception):
+    pass
+
+class SpeedtestCancelled(SpeedtestError):
+    pass
+
+# --- Uruchomienie CLI z postępem na żywo ---
+# CLI w trybie --format=jsonl --progress=yes wypisuje zdarzenie JSON w każdej linii
+# (testStart, ping, download, upload, result, log). Linie są czytane na bieżąco osobnym wątkiem,
+# a pętla nadzorcza przekazuje postęp do on_progress, reaguje na anulowanie i zabija proces,
+# gdy faza trwa dłużej niż SPEEDTEST_PHASE_TIMEOUTS albo CLI milknie na SPEEDTEST_STALL_TIMEOUT.
+
+PROGRESS_INTERVAL = 0.5 # minimalny odstęp kolejnych zdarzeń postępu w tej samej fazie [s]
+POLL_INTERVAL = 0.5
+
+def _read_lines(stream, lines):
+    for line in stream:
+        lines.put(line)
+    lines.put(None)
+
+def _progress_event(event):
+    phase = event["type"]
+    body = event.get(phase, {})
+    out = {"phase": phase, "progress": round(body.get("progress", 0), 3)}
+    if phase == "ping":
+        out["latency"] = body.get("latency")
+        out["jitter"] = body.get("jitter")
+    else:
+        out["bandwidth_mbps"] = round(body.get("bandwidth", 0) * 8 / 1_000_000, 2)
+        out["elapsed"] = body.get("elapsed")
+    return out
+
+def _run_cli(server_id=None, on_progress=None, cancel=None):
+    """Zwraca zdarzenie "result" z CLI; SpeedtestError przy błędzie/zawieszeniu, SpeedtestCancelled po anulowaniu."""
+    cmd = ['speedtest', '--accept-license', '--accept-gdpr', '--format=jsonl', '--progress=yes']
+    if server_id: cmd.extend(['--server-id', str(server_id)])
+
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+    lines = queue.Queue()
+    threading.Thread(target=_read_lines, args=(proc.stdout, lines), daemon=True).start()
+
+    phase = "start"
+    phase_started = last_output = time.monotonic()
+    last_progress = 0.0
+    result = None
+    errors = []
     try:
-        ns = load_notification_settings(db)
-        if not ns.enabled or ns.provider == "browser":
-            return
+        while True:
+            now = time.monotonic()
+            if cancel is not None and cancel.is_set():
+                raise SpeedtestCancelled(get_log("test_cancelled"))
+            if now - phase_started > SPEEDTEST_PHASE_TIMEOUTS[phase] or now - last_output > SPEEDTEST_STALL_TIMEOUT:
+                raise SpeedtestError(get_log("test_phase_timeout", phase))
+            try:
+                line = lines.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if line is None: break
+            last_output = time.monotonic()
 
-        try:
-            if ns.provider == "webhook" and ns.webhook_url:
-                payload = {"title": title, "message": message, "type": type, "timestamp": datetime.now().isoformat()}
-                requests.post(ns.webhook_url, json=payload, timeout=5)
-                logging.info(get_log("notify_sent", "Webhook"))
-
-            elif ns.provider == "ntfy" and ns.ntfy_topic:
-                server = ns.ntfy_server.rstrip('/') if ns.ntfy_server else "https://ntfy.sh"
-                url = f"{server}/{ns.ntfy_topic}"
-                headers = {"Title": title.encode('utf-8'), "Tags": "white_check_mark"}
-                requests.post(url, data=message.encode('utf-8'), headers=headers, timeout=5)
-                logging.info(get_log("notify_sent", "Ntfy"))
-                
-            elif ns.provider == "pushover" and ns.pushover_user_key and ns.pushover_api_token:
-                requests.post("https://api.pushover.net/1/messages.json", data={
-                    "token": ns.pushover_api_token,
-                    "user": ns.pushover_user_key,
-                    "message": message,
-                    "title": title
-                }, timeout=5)
-                logging.info(get_log("notify_sent", "Pushover"))
-
-        except Exception as e:
-            logging.error(f"Notification send error: {e}")
+            try:
+                event = json.loads(line)
+            except ValueError:
+                if line.strip(): errors.append(line.strip())
+                continue
+            etype = event.get("type")
+            if etype == "result":
+                result = event
+            elif etype == "log" and event.get("level") == "error":
+                errors.append(event.get("message", ""))
+            elif etype == "testStart":
+                if on_progress:
+                    srv = event.get("server", {})
+                    on_progress({"phase": "start", "progress": 0, "server": srv.get("name"), "location": srv.get("location")})
+            elif etype in ("ping", "download", "upload"):
+                changed = etype != phase
+                if changed:
+                    phase = etype
+                    phase_started = last_output
+                if on_progress and (changed or last_output - last_progress >= PROGRESS_INTERVAL):
+                    last_progress = last_output
+                    on_progress(_progress_event(event))
+        code = proc.wait(timeout=10)
     finally:
-        db.close()
-
-def get_closest_servers():
-    if not os.path.exists(SERVERS_FILE) or os.stat(SERVERS_FILE).st_size == 0:
-        try:
-            subprocess.run(['speedtest', '--accept-license', '--accept-gdpr', '--servers', '--format=json'], check=True, stdout=subprocess.DEVNULL)
-            res = subprocess.run(['speedtest', '--accept-license', '--accept-gdpr', '--servers', '--format=json'], capture_output=True, text=True)
-            with open(SERVERS_FILE, 'w', encoding='utf-8') as f: f.write(res.stdout)
-        except Exception as e: logging.error(get_log("servers_err", e))
-
-def run_speed_test_and_save(server_id=None, forced_lang=None):
-    if not test_lock.acquire(blocking=False): return None
-    
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+    if code != 0 or result is None:
+        raise SpeedtestError("; ".join(errors) or f"exit code {code}")
+    return result
+
+def run_speed_test_and_save(server_id=None, forced_lang=None, on_progress=None, cancel=None, campaign_id=None, campaign_run_id=None):
+    """Jeden pomiar CLI + zapis wyniku. Wywołuje go tylko worker kolejki (jobs.py), więc testy
+    nigdy nie biegną równolegle. Błąd pomiaru -> SpeedtestError (komunikat trafia do zadania),
+    ustawienie zdarzenia cancel przerywa pomiar (SpeedtestCancelled).
+    Pomiar kampanii dotyczy konkretnego serwera, więc nie przechodzi na automatyczny wybór."""
     db_session = database.SessionLocal()
-    schedule_hours_to_reset = None
 
     try:
-        s = db_session.query(AppSettings).filter(AppSettings.id == 1).first()
+        s = settings_cache.app_settings.get()
         app_lang = forced_lang if forced_lang else (s.app_language or "pl")
-        
-        if s.schedule_hours and s.schedule_hours > 0:
-            schedule_hours_to_reset = s.schedule_hours
 
-        cmd = ['speedtest', '--accept-license', '--accept-gdpr', '--format=json']
-        if server_id: cmd.extend(['--server-id', str(server_id)])
-        
-        proc = None
+        # "Najszybszy serwer" rozwiązywany dopiero przy starcie pomiaru - wg aktualnego rankingu
+        server_id = server_catalogue.resolve(server_id)
         try:
-            proc = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=600)
-        except subprocess.CalledProcessError as e:
-            if server_id:
+            data = _run_cli(server_id, on_progress, cancel)
+        except SpeedtestCancelled:
+            logging.info(get_log("test_cancelled"))
+            raise
+        except SpeedtestError as e:
+            if server_id and campaign_id is None:
                 logging.warning(get_log("test_err_fallback", server_id))
-                fallback_cmd = ['speedtest', '--accept-license', '--accept-gdpr', '--format=json']
                 try:
-                    proc = subprocess.run(fallback_cmd, capture_output=True, text=True, check=True, timeout=600)
-                except subprocess.CalledProcessError as e2:
-                    logging.error(get_log("test_err_auto", e2.stderr))
-                    return None
+                    data = _run_cli(None, on_progress, cancel)
+                except SpeedtestCancelled:
+                    logging.info(get_log("test_cancelled"))
+                    raise
+                except SpeedtestError as e2:
+                    logging.error(get_log("test_err_auto", e2))
+                    raise SpeedtestError(get_log("test_err_auto", e2))
             else:
-                logging.error(get_log("test_err", e.stderr))
-                return None
-
-        if not proc: return None
-
-        data = json.loads(proc.stdout)
-        if data.get('type') != 'result': 
-            logging.error(get_log("result_format_err", proc.stdout))
-            return None
+                logging.error(get_log("test_err", e))
+                raise SpeedtestError(get_log("test_err", e))
         
         down_mbps = round(data.get("download", {}).get("bandwidth", 0) * 8 / 1_000_000, 2)
         up_mbps = round(data.get("upload", {}).get("bandwidth", 0) * 8 / 1_000_000, 2)
@@ -126,10 +165,15 @@ def run_speed_test_and_save(server_id=None, forced_lang=None):
             download_latency_low=data.get("download", {}).get("latency", {}).get("low"),
             download_latency_high=data.get("download", {}).get("latency", {}).get("high"),
             upload_latency_low=data.get("upload", {}).get("latency", {}).get("low"),
-            upload_latency_high=data.get("upload", {}).get("latency", {}).get("high")
+            upload_latency_high=data.get("upload", {}).get("latency", {}).get("high"),
+            campaign_id=campaign_id, campaign_run_id=campaign_run_id
         )
         db_session.add(res)
+        update_rollups(db_session, "speedtest", [res])
+        payload = {c.name: getattr(res, c.name) for c in SpeedtestResult.__table__.columns}
         db_session.commit()
+        dataversion.bump("results")
+        events.publish("result", payload)
         logging.info(get_log("test_result", res.download))
         
         trans = NOTIF_TRANS.get(app_lang, NOTIF_TRANS["pl"])
@@ -142,64 +186,48 @@ def run_speed_test_and_save(server_id=None, forced_lang=None):
             location=server_location
         )
         title = trans["speedtest_title"]
-        send_system_notification(title, msg, "speedtest")
+        notify(title, msg, "speedtest")
         
         return res
+    except SpeedtestError:
+        raise
     except Exception as e:
         logging.error(get_log("test_crit_err", e))
-        return None
+        raise SpeedtestError(get_log("test_crit_err", e))
     finally:
         db_session.close()
-        test_lock.release()
-        
-        if schedule_hours_to_reset:
-            update_scheduler(schedule_hours_to_reset)
-
-def run_scheduled_test(job_tag=None):
-    if job_tag == 'startup-test':
-        with scheduler_lock:
-            schedule.clear('startup-test')
-            
-    db = database.SessionLocal()
-    s = db.query(AppSettings).filter(AppSettings.id == 1).first()
+
+def run_scheduled_test(source="scheduled"):
+    s = settings_cache.app_settings.get()
     srv_id = s.selected_server_id if s else None
-    db.close()
-    run_speed_test_and_save(srv_id)
+    # Kolejka zamiast wątku: test kolidujący z ręcznym czeka, zamiast przepaść
+    from .jobs import enqueue_test
+    enqueue_test(srv_id, None, source)
 
-def run_speed_test_and_save_threaded(job_tag=None):
-    threading.Thread(target=run_scheduled_test, args=(job_tag,), daemon=True).start()
+def _publish_next_run(next_run):
+    # next_run_time w /api/settings się zmienił
+    dataversion.bump("settings")
+    events.publish("scheduler", {"next_run_time": next_run})
 
 def init_scheduler():
-    db = database.SessionLocal()
-    s = db.query(AppSettings).filter(AppSettings.id == 1).first()
+    s = settings_cache.app_settings.get()
     if not s: 
-        db.close()
         return
 
-    global schedule_job
-    hours = s.schedule_hours
-    
-    with scheduler_lock:
-        if hours and hours > 0:
-            schedule_job = schedule.every(hours).hours.do(run_speed_test_and_save_threaded, job_tag='hourly-test').tag('hourly-test')
-        
-        if s.startup_test_enabled:
-            logging.info(get_log("startup_test_scheduled"))
-            schedule.every(1).minutes.do(run_speed_test_and_save_threaded, job_tag='startup-test').tag('startup-test')
-    
-    db.close()
-
-def update_scheduler(hours):
-    global schedule_job
-    with scheduler_lock:
-        if schedule_job:
-            try:
-                schedule.cancel_job(schedule_job)
-            except: pass
-            schedule_job = None
-        
-        schedule.clear('hourly-test')
-        
-        if hours > 0:
-            schedule_job = schedule.every(hours).hours.do(run_speed_test_and_save_threaded, job_tag='hourly-test').tag('hourly-test')
-            logging.info(f"Scheduler reset: Next run in {hours} hours.")
\ No newline at end of file
+    update_scheduler(s.schedule_hours, s.schedule_cron)
+    if s.startup_test_enabled:
+        logging.info(get_log("startup_test_scheduled"))
+        scheduler.add_job(STARTUP_JOB, lambda: run_scheduled_test("startup"), OnceTrigger(STARTUP_DELAY), persist=False)
+
+def update_scheduler(hours, cron=None):
+    """Ustawia cykliczny test: wyrażenie cron ma pierwszeństwo przed interwałem w godzinach.
+    Termin nie zależy od testów ręcznych ani od czasu trwania pomiaru."""
+    if cron:
+        trigger = CronTrigger(cron)
+    elif hours and hours > 0:
+        trigger = IntervalTrigger(hours * 3600)
+    else:
+        scheduler.remove_job(SPEEDTEST_JOB)
+        return
+    next_run = scheduler.add_job(SPEEDTEST_JOB, run_scheduled_test, trigger, jitter=SPEEDTEST_JITTER, on_reschedule=_publish_next_run)
+    logging.info(f"Speedtest scheduled ({trigger.spec}), next run: {next_run:%Y-%m-%d %H:%M:%S}")
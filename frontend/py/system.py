@@ -1,44 +1,216 @@
 import os
 import shutil
 import uuid
-import threading
 import logging
 import subprocess 
-from datetime import datetime 
+from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, Request
-from fastapi.responses import Response, HTMLResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, Request, Response, Query
+from fastapi.responses import HTMLResponse, StreamingResponse
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 from google_auth_oauthlib.flow import Flow
 
+from . import database
 from .database import get_db
-from .models import DriveBackupSettings, PingLog
-from .schemas import BackupSettingsModel, SettingsModel
+from .models import DriveBackupSettings, PingLog, WatchdogTarget, SpeedtestJob
+from .schemas import BackupSettingsModel, SettingsModel, WatchdogTargetModel
 from .dependencies import verify_session, get_redirect_uri
 from .config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME, get_log
+from .migrations import forget_schema_version, run_migrations
 from .backup import perform_backup_task, setup_backup_schedule, SCOPES
-from .speedtest import run_speed_test_and_save, test_lock
-from .watchdog import latest_ping_status
+from .jobs import enqueue_test, get_job, cancel_job, job_to_dict, JOB_STATES
+from .scheduler import scheduler
+from .ping_history import ping_history, load_recent
+from .probes import PROBE_TYPES
+from .downsample import resolve_range, downsample
+from .results import parse_fields, parse_cursor, encode_cursor
+from .rollups import rollup_stats, rollup_series
+from .retention import ping_tier, minute_cutoff
+from . import outages
+from .sketches import latency_percentiles, sketch_period, DEFAULT_QUANTILES
+from . import dataversion
+from . import events
+from . import settings_cache
 
 router = APIRouter(dependencies=[Depends(verify_session)])
 
+PING_SERIES_COLUMNS = ["latency", "packet_loss", "is_online"]
+
 # --- Watchdog Status ---
 @router.get("/api/watchdog/status")
-async def watchdog_status(db: Session = Depends(get_db)):
-    history = db.query(PingLog).order_by(PingLog.timestamp.desc()).limit(60).all()
+def watchdog_status(request: Request, response: Response, since: str | None = None, target: str | None = None, db: Session = Depends(get_db)):
+    not_modified = dataversion.check_not_modified(request, response, "ping", variant=request.url.query)
+    if not_modified: return not_modified
+
+    cur = None
+    if since:
+        # Delta: tylko wpisy nowsze niż kursor (timestamp,seq)
+        ts, seq = parse_cursor(since)
+        if not seq.isdigit(): raise HTTPException(status_code=400, detail="Invalid cursor")
+        cur = (ts, int(seq))
+
+    # Historia dotyczy jednego celu - domyślnie głównego (ping_target); monitorowane cele są w pamięci
+    if not target or ping_history.has(target):
+        current, statuses, history_data, last = ping_history.snapshot(target, cur)
+        cursor = encode_cursor(*last) if last else since
+        return {"current": current, "targets": statuses, "history": history_data, "cursor": cursor}
+
+    # Cel spoza monitoringu (np. usunięty) - historia z bazy
+    q = db.query(PingLog).filter(PingLog.target == target)
+    if cur:
+        q = q.filter(or_(PingLog.timestamp > cur[0], and_(PingLog.timestamp == cur[0], PingLog.id > cur[1])))
+    history = q.order_by(PingLog.timestamp.desc(), PingLog.id.desc()).limit(60).all()
     history_data = [{"time": log.timestamp.strftime("%H:%M:%S"), "latency": log.latency} for log in reversed(history)]
-    return {"current": latest_ping_status, "history": history_data}
+    cursor = encode_cursor(history[0].timestamp, history[0].id) if history else since
+    current, statuses, _, _ = ping_history.snapshot()
+    return {"current": current, "targets": statuses, "history": history_data, "cursor": cursor}
+
+@router.get("/api/watchdog/series")
+def watchdog_series(
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    points: int = Query(500, ge=10, le=5000),
+    mode: str = "buckets",
+    fields: str | None = None,
+    target: str | None = None,
+    db: Session = Depends(get_db)
+):
+    start, end = resolve_range(from_, to)
+    columns = parse_fields(fields, PING_SERIES_COLUMNS, always=())
+    # Zakres starszy niż okno surowych danych czytamy z agregatów (tryb lttb wymaga surowych punktów)
+    tier = ping_tier(start, end, points)
+    if tier != "raw":
+        if mode not in ("buckets", "lttb"): raise HTTPException(status_code=400, detail="Unknown mode")
+        return rollup_series(db, "ping", columns, start, end, points, tier, target)
+    q = db.query(PingLog)
+    if target: q = q.filter(PingLog.target == target)
+    return {**downsample(q, PingLog, columns, start, end, points, mode), "tier": "raw"}
+
+@router.get("/api/watchdog/stats")
+def watchdog_stats(
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    target: str | None = None,
+    db: Session = Depends(get_db)
+):
+    start, end = resolve_range(from_, to)
+    return rollup_stats(db, "ping", start, end, target)
+
+@router.get("/api/watchdog/uptime")
+def watchdog_uptime(
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    target: str | None = None,
+    db: Session = Depends(get_db)
+):
+    # Domyślnie ostatnie 30 dni głównego celu
+    end = to or datetime.now()
+    start, end = resolve_range(from_ or end - timedelta(days=30), end)
+    return outages.uptime_report(db, target or ping_history.primary_target() or "", start, end)
+
+@router.get("/api/watchdog/percentiles")
+def watchdog_percentiles(
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    target: str | None = None,
+    q: str | None = None,
+    db: Session = Depends(get_db)
+):
+    start, end = resolve_range(from_, to)
+    try:
+        quantiles = tuple(float(x) for x in q.split(",")) if q else DEFAULT_QUANTILES
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid quantiles")
+    if not quantiles or not all(0 <= x <= 1 for x in quantiles):
+        raise HTTPException(status_code=400, detail="Invalid quantiles")
+    period = sketch_period(start, end, start >= minute_cutoff())
+    return latency_percentiles(db, target or ping_history.primary_target() or "", start, end, period, quantiles)
+
+# --- Cele watchdoga ---
+def target_to_dict(t):
+    return {
+        "id": t.id, "name": t.name, "probe_type": t.probe_type, "host": t.host, "port": t.port,
+        "resolver": t.resolver, "interval": t.interval, "enabled": t.enabled
+    }
+
+@router.get("/api/watchdog/targets")
+def get_watchdog_targets(db: Session = Depends(get_db)):
+    return [target_to_dict(t) for t in db.query(WatchdogTarget).order_by(WatchdogTarget.id).all()]
 
-# --- Trigger Speedtest ---
+@router.post("/api/watchdog/targets")
+def save_watchdog_target(t: WatchdogTargetModel, db: Session = Depends(get_db)):
+    host = t.host.strip()
+    kind = t.probe_type or "icmp"
+    port = t.port or 0
+    if not host: raise HTTPException(status_code=400, detail="Missing host")
+    if kind not in PROBE_TYPES: raise HTTPException(status_code=400, detail="Unknown probe type")
+    if kind == "tcp" and not 0 < port < 65536: raise HTTPException(status_code=400, detail="Missing port")
+    if kind == "http" and not host.startswith(("http://", "https://")): raise HTTPException(status_code=400, detail="Invalid URL")
+
+    rec = db.query(WatchdogTarget).filter(WatchdogTarget.probe_type == kind, WatchdogTarget.host == host, WatchdogTarget.port == port).first()
+    if not rec: rec = WatchdogTarget(probe_type=kind, host=host, port=port); db.add(rec)
+    rec.name = t.name
+    rec.resolver = t.resolver if kind == "dns" else None
+    rec.interval = t.interval if t.interval and t.interval >= 1 else 30
+    rec.enabled = t.enabled if t.enabled is not None else True
+    db.commit()
+    dataversion.bump("targets")
+    return target_to_dict(rec)
+
+@router.delete("/api/watchdog/targets/{target_id}")
+def delete_watchdog_target(target_id: int, db: Session = Depends(get_db)):
+    c = db.query(WatchdogTarget).filter(WatchdogTarget.id == target_id).delete(synchronize_session=False)
+    db.commit()
+    if not c: raise HTTPException(status_code=404)
+    dataversion.bump("targets")
+    return {"deleted_count": c}
+
+# --- Zdarzenia na żywo (SSE) ---
+@router.get("/api/events")
+async def event_stream(request: Request):
+    return StreamingResponse(
+        events.stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# --- Trigger Speedtest (kolejka zadań) ---
 @router.post("/api/trigger-test")
-async def trig_test(s: SettingsModel):
-    if test_lock.locked(): raise HTTPException(status_code=429)
-    threading.Thread(target=run_speed_test_and_save, args=(s.server_id, s.app_language), daemon=True).start()
-    return {"message": "Started"}
+def trig_test(s: SettingsModel):
+    job, duplicate = enqueue_test(s.server_id, s.app_language, "manual")
+    return {"message": "Queued", "job_id": job["id"], "status": job["status"], "duplicate": duplicate}
+
+@router.get("/api/jobs")
+def list_jobs(status: str | None = None, limit: int = Query(20, ge=1, le=200), db: Session = Depends(get_db)):
+    q = db.query(SpeedtestJob)
+    if status:
+        if status not in JOB_STATES: raise HTTPException(status_code=400, detail="Unknown status")
+        q = q.filter(SpeedtestJob.status == status)
+    return [job_to_dict(j) for j in q.order_by(SpeedtestJob.created_at.desc()).limit(limit).all()]
+
+@router.get("/api/jobs/{job_id}")
+def job_status(job_id: str, db: Session = Depends(get_db)):
+    job = get_job(db, job_id)
+    if not job: raise HTTPException(status_code=404)
+    return job_to_dict(job)
+
+@router.post("/api/jobs/{job_id}/cancel")
+def job_cancel(job_id: str, db: Session = Depends(get_db)):
+    job = cancel_job(db, job_id)
+    if not job: raise HTTPException(status_code=404)
+    if job.status in ("done", "failed"): raise HTTPException(status_code=409, detail="Job already finished")
+    # Trwające zadanie zmieni stan na "cancelled" po zatrzymaniu procesu CLI (zdarzenie "job")
+    return job_to_dict(job)
+
+@router.get("/api/scheduler")
+def scheduler_jobs():
+    # Zadania harmonogramu: następny termin, opóźnienie startu i czas trwania ostatniego uruchomienia
+    return scheduler.jobs()
 
 # --- Backup Local ---
 @router.get("/api/backup")
-async def backup_db():
+def backup_db():
     env = os.environ.copy(); env["MYSQL_PWD"] = DB_PASSWORD
     cmd = ["mysqldump", "-h", DB_HOST, "-P", str(DB_PORT), "-u", DB_USER, "--no-tablespaces", DB_NAME]
     
@@ -51,21 +223,36 @@ async def backup_db():
     return Response(content=stdout, media_type="application/sql", headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 @router.post("/api/restore")
-async def restore_db(file: UploadFile = File(...)):
+def restore_db(file: UploadFile = File(...), db: Session = Depends(get_db)):
     temp = f"/tmp/{uuid.uuid4()}.sql"
     with open(temp, "wb") as b: shutil.copyfileobj(file.file, b)
     env = os.environ.copy(); env["MYSQL_PWD"] = DB_PASSWORD
     cmd = ["mysql", "-h", DB_HOST, "-P", str(DB_PORT), "-u", DB_USER, DB_NAME]
+    forget_schema_version(database.engine)
     with open(temp, "r") as f:
         proc = subprocess.Popen(cmd, stdin=f, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
         stdout, stderr = proc.communicate()
     os.remove(temp)
-    if proc.returncode != 0: raise HTTPException(500)
+    # Zrzut ze starszej wersji odtwarza tabele bez nowych kolumn - migracje dociągają schemat
+    # (schema_version z kopii albo od zera, gdy kopia jej nie miała)
+    migrated = True
+    try:
+        run_migrations(database.engine)
+    except Exception as e:
+        logging.error(f"Migration after restore failed: {e}")
+        migrated = False
+    # Przywrócona baza może mieć zupełnie inne ustawienia, wyniki i pingi - także częściowo
+    # przy błędzie mysql, więc pamięć procesu i ETagi są unieważniane zawsze
+    settings_cache.invalidate_all()
+    outages.reset()
+    ping_history.reload(lambda target: load_recent(db, target))
+    dataversion.bump("results", "settings", "ping", "targets")
+    if proc.returncode != 0 or not migrated: raise HTTPException(500)
     return {"message": "Restored"}
 
 # --- Google Drive Backup ---
 @router.get("/api/backup/settings")
-async def get_backup_settings(db: Session = Depends(get_db)):
+def get_backup_settings(db: Session = Depends(get_db)):
     s = db.query(DriveBackupSettings).filter(DriveBackupSettings.id == 1).first()
     if not s: s = DriveBackupSettings(id=1); db.add(s); db.commit()
     return {
@@ -82,7 +269,7 @@ async def get_backup_settings(db: Session = Depends(get_db)):
     }
 
 @router.post("/api/backup/settings")
-async def save_backup_settings(s: BackupSettingsModel, db: Session = Depends(get_db)):
+def save_backup_settings(s: BackupSettingsModel, db: Session = Depends(get_db)):
     rec = db.query(DriveBackupSettings).filter(DriveBackupSettings.id == 1).first()
     if not rec: rec = DriveBackupSettings(id=1); db.add(rec)
     rec.client_id = s.client_id; rec.client_secret = s.client_secret
@@ -90,11 +277,12 @@ async def save_backup_settings(s: BackupSettingsModel, db: Session = Depends(get
     rec.schedule_time = s.schedule_time; rec.retention_days = s.retention_days
     rec.is_enabled = s.is_enabled
     db.commit()
+    settings_cache.drive_settings.invalidate()
     setup_backup_schedule(rec) 
     return {"message": "Settings saved"}
 
 @router.get("/api/backup/google/authorize")
-async def google_authorize(request: Request, db: Session = Depends(get_db)):
+def google_authorize(request: Request, db: Session = Depends(get_db)):
     s = db.query(DriveBackupSettings).filter(DriveBackupSettings.id == 1).first()
     if not s or not s.client_id or not s.client_secret: raise HTTPException(400, "Missing Credentials")
     
@@ -104,7 +292,7 @@ async def google_authorize(request: Request, db: Session = Depends(get_db)):
     return {"auth_url": url}
 
 @router.get("/api/backup/google/callback")
-async def google_callback(request: Request, db: Session = Depends(get_db), code: Optional[str] = None, error: Optional[str] = None):
+def google_callback(request: Request, db: Session = Depends(get_db), code: Optional[str] = None, error: Optional[str] = None):
     target_url = "/backup.html?auth=error"
     if error: target_url += f"&msg={error}"
     elif not code: target_url += "&msg=no_code"
@@ -118,6 +306,7 @@ async def google_callback(request: Request, db: Session = Depends(get_db), code:
             s.token_json = flow.credentials.to_json()
             s.is_enabled = True 
             db.commit()
+            settings_cache.drive_settings.invalidate()
             setup_backup_schedule(s)
             target_url = "/backup.html?auth=success"
         except Exception as e:
@@ -126,10 +315,11 @@ async def google_callback(request: Request, db: Session = Depends(get_db), code:
     return HTMLResponse(content=f'<script>window.location.href = "{target_url}";</script>')
 
 @router.post("/api/backup/google/revoke")
-async def google_revoke(db: Session = Depends(get_db)):
+def google_revoke(db: Session = Depends(get_db)):
     s = db.query(DriveBackupSettings).filter(DriveBackupSettings.id == 1).first()
     s.token_json = None; s.is_enabled = False
     db.commit()
+    settings_cache.drive_settings.invalidate()
     setup_backup_schedule(s)
     return {"message": "Revoked"}
 
@@ -1,100 +1,165 @@
-import subprocess
+import asyncio
 import logging
-import time
-import re
-import requests
-from datetime import datetime, timedelta
-from .config import get_log, NOTIF_TRANS
+from datetime import datetime
+from .config import get_log
 from . import database 
-from .models import PingLog, AppSettings, NotificationSettings
+from . import dataversion
+from . import events
+from . import settings_cache
+from .models import AppSettings, WatchdogTarget
+from .ping_writer import ping_log_writer
+from .sketches import latency_sketches
+from .ping_history import ping_history, load_recent
+from .outages import track_outage, close_outage
+from .notifications import notify
+from .alerts import watchdog_alerts
+from .probes import create_prober, run_probe, summarize, target_label
 
-latest_ping_status = {"online": None, "latency": 0, "loss": 0, "target": "init", "updated": None}
+def ensure_app_settings():
+    s = settings_cache.app_settings.get()
+    if not s:
+        db = database.SessionLocal()
+        try:
+            db.add(AppSettings(id=1)); db.commit()
+        finally:
+            db.close()
+        settings_cache.app_settings.invalidate()
+        s = settings_cache.app_settings.get()
+    return s
+
+def load_targets():
+    """Cel główny z AppSettings (ping_target) + aktywne cele z tabeli watchdog_targets."""
+    s = ensure_app_settings()
+    targets = {}
+    if s.ping_target:
+        interval = s.ping_interval if s.ping_interval and s.ping_interval >= 5 else 30
+        targets[s.ping_target] = {
+            "label": s.ping_target, "probe_type": "icmp", "host": s.ping_target, "port": 0, "resolver": None,
+            "name": s.ping_target, "interval": interval, "primary": True
+        }
 
-def send_watchdog_notification(title, message, type_str):
     db = database.SessionLocal()
     try:
-        ns = db.query(NotificationSettings).filter(NotificationSettings.id == 1).first()
-        if not ns or not ns.enabled or ns.provider == "browser": return
+        for t in db.query(WatchdogTarget).filter(WatchdogTarget.enabled == True).all():
+            kind = t.probe_type or "icmp"
+            label = target_label(kind, t.host, t.port, t.resolver)
+            if label in targets: continue
+            interval = t.interval if t.interval and t.interval >= 1 else 30
+            targets[label] = {
+                "label": label, "probe_type": kind, "host": t.host, "port": t.port, "resolver": t.resolver,
+                "name": t.name or label, "interval": interval, "primary": False
+            }
+    finally:
+        db.close()
+    return targets
 
-        if ns.provider == "webhook" and ns.webhook_url:
-            payload = {"title": title, "message": message, "type": type_str, "timestamp": datetime.now().isoformat()}
-            requests.post(ns.webhook_url, json=payload, timeout=5)
-        elif ns.provider == "ntfy" and ns.ntfy_topic:
-            server = ns.ntfy_server.rstrip('/') if ns.ntfy_server else "https://ntfy.sh"
-            url = f"{server}/{ns.ntfy_topic}"
-            headers = {"Title": title.encode('utf-8'), "Tags": "warning" if "down" in type_str else "white_check_mark"}
-            requests.post(url, data=message.encode('utf-8'), headers=headers, timeout=5)
-        elif ns.provider == "pushover" and ns.pushover_user_key and ns.pushover_api_token:
-            priority = 1 if "down" in type_str else 0
-            requests.post("https://api.pushover.net/1/messages.json", data={
-                "token": ns.pushover_api_token,
-                "user": ns.pushover_user_key,
-                "message": message,
-                "title": title,
-                "priority": priority
-            }, timeout=5)
+def record_probe(cfg, rtts):
+    """Obsługa wyniku sondy (wątek z puli - track_outage pisze do bazy). Wpis do ping_logs idzie przez bufor."""
+    target = cfg["label"]
+    latency, packet_loss, is_online = summarize(rtts)
+    s = settings_cache.app_settings.get()
+    app_lang = (s.app_language if s else None) or "pl"
 
-    except Exception: pass
-    finally: db.close()
+    timestamp = datetime.now()
+    latency_sketches.add(target, timestamp, rtts)
+    ping_log_writer.submit({
+        "timestamp": timestamp, "target": target, "probe_type": cfg["probe_type"],
+        "latency": latency, "packet_loss": packet_loss, "is_online": is_online
+    })
+    track_outage(target, timestamp, is_online, packet_loss)
 
-def run_ping_watchdog():
-    logging.info(get_log("watchdog_start"))
-    global latest_ping_status
-    
-    while True:
-        db = database.SessionLocal()
-        try:
-            s = db.query(AppSettings).filter(AppSettings.id == 1).first()
-            if not s: s = AppSettings(id=1); db.add(s); db.commit()
-            
-            target = s.ping_target
-            interval = s.ping_interval if s.ping_interval and s.ping_interval >= 5 else 30
-            app_lang = s.app_language or "pl"
+    status = {
+        "online": is_online,
+        "latency": round(latency, 1) if latency else None,
+        "loss": packet_loss,
+        "target": target,
+        "name": cfg["name"],
+        "probe_type": cfg["probe_type"],
+        "rtts": rtts,
+        "updated": datetime.now().isoformat()
+    }
+    ping_history.record(status, timestamp, latency, cfg["primary"])
+    dataversion.bump("ping")
 
-            cmd = ["ping", "-c", "3", "-W", "2", target]
-            proc = subprocess.run(cmd, capture_output=True, text=True)
-            
-            latency = None
-            packet_loss = 100.0
-            is_online = False
-            
-            loss_match = re.search(r"(\d+)% packet loss", proc.stdout)
-            if loss_match: packet_loss = float(loss_match.group(1))
-            
-            rtt_match = re.search(r"rtt min/avg/max/mdev = ([\d\.]+)/([\d\.]+)", proc.stdout)
-            if rtt_match: latency = float(rtt_match.group(2)); is_online = True
-            
-            log_entry = PingLog(target=target, latency=latency, packet_loss=packet_loss, is_online=is_online)
-            db.add(log_entry)
-            
-            cutoff = datetime.now() - timedelta(hours=24)
-            db.query(PingLog).filter(PingLog.timestamp < cutoff).delete()
-            db.commit()
-            
-            prev_status = latest_ping_status["online"]
-            if prev_status is not None and is_online != prev_status:
-                trans = NOTIF_TRANS.get(app_lang, NOTIF_TRANS["pl"])
-                if is_online:
-                    title = trans["watchdog_up_title"]
-                    msg = trans["watchdog_up_body"].format(target=target)
-                    type_str = "watchdog_up"
-                else:
-                    title = trans["watchdog_down_title"]
-                    msg = trans["watchdog_down_body"].format(target=target)
-                    type_str = "watchdog_down"
-                send_watchdog_notification(title, msg, type_str)
+    for title, msg, type_str in watchdog_alerts.observe(
+        target, is_online, timestamp, app_lang,
+        s.watchdog_down_after if s else None, s.watchdog_up_after if s else None, s.watchdog_digest_minutes if s else 0
+    ):
+        notify(title, msg, type_str)
 
-            latest_ping_status.update({
-                "online": is_online,
-                "latency": round(latency, 1) if latency else None,
-                "loss": packet_loss,
-                "target": target,
-                "updated": datetime.now().isoformat()
-            })
+    events.publish("watchdog", {
+        "current": status,
+        "primary": cfg["primary"],
+        "point": {"time": timestamp.strftime("%H:%M:%S"), "latency": latency}
+    })
+
+def warm_history(cfg):
+    """Rozgrzewa bufor historii celu ostatnimi wpisami z ping_logs."""
+    db = database.SessionLocal()
+    try:
+        ping_history.warm(cfg["label"], load_recent(db, cfg["label"]), cfg["primary"])
+    finally:
+        db.close()
 
+async def probe_loop(prober, cfg):
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        try:
+            rtts = await run_probe(prober, cfg)
+            await loop.run_in_executor(None, record_probe, cfg, rtts)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logging.error(get_log("watchdog_err", e))
-        finally:
-            db.close()
-        
-        time.sleep(interval)
\ No newline at end of file
+        await asyncio.sleep(max(0.0, cfg["interval"] - (loop.time() - started)))
+
+async def watchdog_main():
+    """Jedna pętla asyncio sonduje wszystkie cele równolegle, każdy we własnym interwale."""
+    loop = asyncio.get_running_loop()
+    prober = await create_prober()
+    tasks = {}
+    version = None
+
+    while True:
+        # Zmiana ustawień lub listy celów -> przeładowanie konfiguracji
+        current = (dataversion.current("settings"), dataversion.current("targets"))
+        if current != version:
+            try:
+                targets = await loop.run_in_executor(None, load_targets)
+                version = current
+            except Exception as e:
+                logging.error(get_log("watchdog_err", e))
+                targets = None
+
+            if targets is not None:
+                for label in list(tasks):
+                    if targets.get(label) != tasks[label][0]:
+                        tasks.pop(label)[1].cancel()
+                        if label not in targets:
+                            ping_history.drop(label)
+                            watchdog_alerts.drop(label)
+                            try:
+                                await loop.run_in_executor(None, close_outage, label)
+                            except Exception as e:
+                                logging.error(get_log("watchdog_err", e))
+                for label, cfg in targets.items():
+                    if label not in tasks:
+                        try:
+                            await loop.run_in_executor(None, warm_history, cfg)
+                        except Exception as e:
+                            logging.error(get_log("watchdog_err", e))
+                        tasks[label] = (cfg, asyncio.create_task(probe_loop(prober, cfg)))
+
+        # Zamknięte okna zbiorcze -> podsumowania (notify tylko kolejkuje);
+        # także przy digest_minutes = 0, żeby wyłączenie okien wysłało to, co w nich czekało
+        s = settings_cache.app_settings.get()
+        if s:
+            for title, msg, type_str in watchdog_alerts.flush_due(datetime.now(), s.app_language or "pl", s.watchdog_digest_minutes or 0):
+                notify(title, msg, type_str)
+        await asyncio.sleep(1)
+
+def run_ping_watchdog():
+    logging.info(get_log("watchdog_start"))
+    ping_log_writer.start()
+    asyncio.run(watchdog_main())
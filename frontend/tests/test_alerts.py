@@ -0,0 +1,79 @@
+import unittest
+from datetime import datetime, timedelta
+
+from py.alerts import WatchdogAlerts
+
+T0 = datetime(2026, 10, 18, 12, 0)
+
+class WatchdogAlertsTest(unittest.TestCase):
+    def setUp(self):
+        self.alerts = WatchdogAlerts()
+
+    def observe(self, online, seconds, digest_minutes=0, down_after=3, up_after=2):
+        return self.alerts.observe("gw", online, T0 + timedelta(seconds=seconds), "en", down_after, up_after, digest_minutes)
+
+    def types(self, messages):
+        return [m[2] for m in messages]
+
+    def test_first_result_sets_state_silently(self):
+        self.assertEqual(self.observe(False, 0), [])
+
+    def test_hysteresis(self):
+        self.observe(True, 0)
+        self.assertEqual(self.observe(False, 1), [])
+        self.assertEqual(self.observe(False, 2), [])
+        self.assertEqual(self.types(self.observe(False, 3)), ["watchdog_down"])
+        self.assertEqual(self.observe(True, 4), [])
+        # Przerwana seria udanych sond zaczyna liczenie od nowa
+        self.assertEqual(self.observe(False, 5), [])
+        self.assertEqual(self.observe(True, 6), [])
+        self.assertEqual(self.types(self.observe(True, 7)), ["watchdog_up"])
+
+    def test_digest_counts_opening_outage_with_its_downtime(self):
+        self.observe(True, 0, 10, 1, 1)
+        self.assertEqual(self.types(self.observe(False, 60, 10, 1, 1)), ["watchdog_down"])
+        self.assertEqual(self.observe(True, 120, 10, 1, 1), [])
+        self.assertEqual(self.observe(False, 180, 10, 1, 1), [])
+        self.assertEqual(self.observe(True, 240, 10, 1, 1), [])
+
+        self.assertEqual(self.alerts.flush_due(T0 + timedelta(minutes=5), "en", 10), [])
+        digest = self.alerts.flush_due(T0 + timedelta(minutes=12), "en", 10)
+        self.assertEqual(len(digest), 1)
+        # Dwie awarie po minucie: otwierająca okno i wstrzymana
+        self.assertIn("2 outage(s)", digest[0][1])
+        self.assertIn("2m 00s", digest[0][1])
+        self.assertEqual(digest[0][2], "watchdog_up")
+
+    def test_outage_before_window_does_not_count_towards_downtime(self):
+        self.observe(True, 0, 10, 1, 1)
+        self.observe(False, 60, 10, 1, 1)
+        self.alerts.flush_due(T0 + timedelta(minutes=20), "en", 10)
+        # Powrót otwiera nowe okno - wcześniejsza awaria nie należy do niego
+        self.assertEqual(self.types(self.observe(True, 1500, 10, 1, 1)), ["watchdog_up"])
+        self.observe(False, 1560, 10, 1, 1)
+        self.observe(True, 1590, 10, 1, 1)
+        digest = self.alerts.flush_due(T0 + timedelta(seconds=1500, minutes=10), "en", 10)
+        self.assertIn("1 outage(s)", digest[0][1])
+        self.assertIn("0m 30s", digest[0][1])
+
+    def test_disabling_digest_flushes_held_changes(self):
+        self.observe(True, 0, 10, 1, 1)
+        self.observe(False, 60, 10, 1, 1)
+        self.observe(True, 120, 10, 1, 1)
+        digest = self.alerts.flush_due(T0 + timedelta(minutes=3), "en", 0)
+        self.assertEqual(len(digest), 1)
+        self.assertIn("in 10 min", digest[0][1])
+        # Bez okna kolejne zmiany idą od razu
+        self.assertEqual(self.types(self.observe(False, 240, 0, 1, 1)), ["watchdog_down"])
+
+    def test_config_change_flushes_before_next_transition(self):
+        self.observe(True, 0, 10, 1, 1)
+        self.observe(False, 60, 10, 1, 1)
+        self.observe(True, 120, 10, 1, 1)
+        out = self.observe(False, 180, 5, 1, 1)
+        self.assertEqual(len(out), 2)
+        self.assertIn("1 outage(s)", out[0][1])
+        self.assertEqual(out[1][2], "watchdog_down")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from py import jobs
+from py.campaigns import compare, compare_servers, parse_server_ids
+from py.models import Base, SpeedtestResult, SpeedtestJob
+from py.schemas import CampaignModel
+
+T0 = datetime(2026, 10, 1)
+
+class CampaignModelTest(unittest.TestCase):
+    def test_valid(self):
+        self.assertEqual(CampaignModel(name="isp", server_ids=[1, 2, 2]).server_ids, [1, 2, 2])
+
+    def test_rejected_lists(self):
+        for ids in ([], [0], [-3], list(range(100000, 100040))):
+            with self.assertRaises(ValidationError, msg=str(ids)):
+                CampaignModel(name="isp", server_ids=ids)
+
+    def test_name_length(self):
+        with self.assertRaises(ValidationError):
+            CampaignModel(name="x" * 101, server_ids=[1])
+
+class CompareTest(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine, tables=[SpeedtestResult.__table__, SpeedtestJob.__table__])
+        self.Session = sessionmaker(bind=engine)
+        self.db = self.Session()
+        self.addCleanup(self.db.close)
+        rows = [(1, 100.0, None), (1, 300.0, 7), (1, 200.0, 7), (2, 500.0, 7), (3, 50.0, None)]
+        for i, (sid, down, campaign) in enumerate(rows):
+            self.db.add(SpeedtestResult(
+                id=str(i), timestamp=T0 + timedelta(hours=i), server_id=sid, server_name=f"srv {sid}",
+                download=down, upload=10.0, ping=5.0, jitter=1.0, campaign_id=campaign
+            ))
+        self.db.commit()
+
+    def test_groups_per_server_sorted_by_median(self):
+        out = compare_servers(self.db, [1, 2], T0, T0 + timedelta(days=1))
+        self.assertEqual([g["server_id"] for g in out], [2, 1])
+        one = out[1]
+        self.assertEqual(one["count"], 3)
+        self.assertEqual(one["download"], {"median": 200.0, "p25": 150.0, "p75": 250.0, "min": 100.0, "max": 300.0})
+
+    def test_campaign_filter(self):
+        out = compare_servers(self.db, [1], T0, T0 + timedelta(days=1), campaign_id=7)
+        self.assertEqual(out[0]["count"], 2)
+
+    def test_no_servers_no_query(self):
+        self.assertEqual(compare_servers(mock.Mock(), [], T0, T0 + timedelta(days=1)), [])
+
+    def test_requires_campaign_or_servers(self):
+        with self.assertRaises(HTTPException) as ctx:
+            compare(from_=T0, to=T0 + timedelta(days=1), campaign_id=None, server_ids=None, db=self.db)
+        self.assertEqual(ctx.exception.status_code, 400)
+        with self.assertRaises(HTTPException) as ctx:
+            compare(from_=T0, to=T0 + timedelta(days=1), campaign_id=None, server_ids="1,x", db=self.db)
+        self.assertEqual(ctx.exception.status_code, 400)
+
+    def test_explicit_server_ids(self):
+        out = compare(from_=T0, to=T0 + timedelta(days=1), campaign_id=None, server_ids="3", db=self.db)
+        self.assertEqual([g["server_id"] for g in out["servers"]], [3])
+
+    def test_parse_server_ids(self):
+        self.assertEqual(parse_server_ids("1, 2,,3"), [1, 2, 3])
+        self.assertEqual(parse_server_ids(None), [])
+
+class CancelCampaignJobsTest(unittest.TestCase):
+    def test_only_queued_jobs_of_campaign(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine, tables=[SpeedtestJob.__table__])
+        db = sessionmaker(bind=engine)()
+        self.addCleanup(db.close)
+        db.add_all([
+            SpeedtestJob(id="a", status="queued", campaign_id=1, created_at=T0),
+            SpeedtestJob(id="b", status="running", campaign_id=1, created_at=T0),
+            SpeedtestJob(id="c", status="queued", campaign_id=2, created_at=T0),
+        ])
+        db.commit()
+        with mock.patch.object(jobs.events, "publish") as publish:
+            self.assertEqual(jobs.cancel_campaign_jobs(db, 1), 1)
+        self.assertEqual(publish.call_count, 1)
+        status = {j.id: j.status for j in db.query(SpeedtestJob).all()}
+        self.assertEqual(status, {"a": "cancelled", "b": "running", "c": "queued"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from py import downsample
+from py.downsample import lttb, lttb_series, bucket_seconds_for
+from py.models import Base, SpeedtestResult
+
+class LttbTest(unittest.TestCase):
+    def test_short_series_is_returned_unchanged(self):
+        points = [(0, 1.0), (1, 2.0), (2, 3.0)]
+        self.assertEqual(lttb(points, 10), points)
+        self.assertEqual(lttb(points, 2), points)
+
+    def test_keeps_endpoints_and_threshold(self):
+        points = [(x, float(x % 7)) for x in range(1000)]
+        sampled = lttb(points, 50)
+        self.assertEqual(len(sampled), 50)
+        self.assertEqual(sampled[0], points[0])
+        self.assertEqual(sampled[-1], points[-1])
+        self.assertEqual(sampled, sorted(sampled))
+
+    def test_keeps_spike(self):
+        points = [(x, 1.0) for x in range(500)]
+        points[250] = (250, 100.0)
+        self.assertIn((250, 100.0), lttb(points, 20))
+
+    def test_bucket_seconds(self):
+        start = datetime(2026, 1, 1)
+        self.assertEqual(bucket_seconds_for(start, start + timedelta(hours=1), 60), 60)
+        self.assertEqual(bucket_seconds_for(start, start + timedelta(seconds=10), 60), 1)
+
+class LttbSeriesTest(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine, tables=[SpeedtestResult.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.addCleanup(self.db.close)
+        self.start = datetime(2026, 1, 1)
+        for i in range(100):
+            self.db.add(SpeedtestResult(id=str(i), timestamp=self.start + timedelta(minutes=i), download=float(i % 10), upload=None))
+        self.db.commit()
+
+    def test_raw_rows_within_budget(self):
+        out = lttb_series(self.db.query(SpeedtestResult), SpeedtestResult, ["download", "upload"], self.start, self.start + timedelta(days=1), 20)
+        self.assertEqual(len(out["series"]["download"]), 20)
+        self.assertEqual(out["series"]["upload"], [])
+
+    def test_long_range_uses_bucketed_candidates(self):
+        with mock.patch.object(downsample, "_bucket_candidates", return_value={"download": [(0.0, 1.0)]}) as buckets, \
+             mock.patch.object(downsample, "_raw_candidates") as raw:
+            lttb_series(self.db.query(SpeedtestResult), SpeedtestResult, ["download"], self.start, self.start + timedelta(days=1), 10)
+        raw.assert_not_called()
+        self.assertEqual(buckets.call_args[0][-1], 10 * downsample.LTTB_OVERSAMPLE // 2)
+
+if __name__ == "__main__":
+    unittest.main()
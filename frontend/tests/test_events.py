@@ -0,0 +1,63 @@
+import asyncio
+import json
+import threading
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from py import events
+
+class PutTest(unittest.TestCase):
+    def test_full_queue_drops_oldest(self):
+        queue = asyncio.Queue(maxsize=2)
+        for message in ("a", "b", "c"):
+            events._put(queue, message)
+        self.assertEqual([queue.get_nowait(), queue.get_nowait()], ["b", "c"])
+
+class PublishTest(unittest.TestCase):
+    def test_message_format_and_datetime(self):
+        loop = mock.Mock()
+        queue = object()
+        with mock.patch.object(events, "_subscribers", {(loop, queue)}):
+            events.publish("job", {"at": datetime(2026, 10, 18, 12, 0)})
+        _, target, message = loop.call_soon_threadsafe.call_args.args
+        self.assertIs(target, queue)
+        head, data = message.rstrip("\n").split("\n")
+        self.assertEqual(head, "event: job")
+        self.assertEqual(json.loads(data.removeprefix("data: ")), {"at": "2026-10-18T12:00:00"})
+
+    def test_closed_loop_is_ignored(self):
+        loop = mock.Mock()
+        loop.call_soon_threadsafe.side_effect = RuntimeError("Event loop is closed")
+        with mock.patch.object(events, "_subscribers", {(loop, None)}):
+            events.publish("status")
+
+class StreamTest(unittest.TestCase):
+    def test_receives_events_from_other_threads_and_unsubscribes(self):
+        async def run():
+            request = mock.Mock(is_disconnected=mock.AsyncMock(return_value=True))
+            gen = events.stream(request)
+            self.assertEqual(await gen.__anext__(), "retry: 5000\n\n")
+            pending = asyncio.ensure_future(gen.__anext__())
+            await asyncio.sleep(0)
+            # Publikacja z wątku w tle trafia do kolejki przez call_soon_threadsafe
+            thread = threading.Thread(target=events.publish, args=("ping", {"ok": True}))
+            thread.start()
+            thread.join()
+            message = await asyncio.wait_for(pending, 1)
+            await gen.aclose()
+            return message
+        with mock.patch.object(events, "_subscribers", set()) as subscribers:
+            message = asyncio.run(run())
+            self.assertEqual(subscribers, set())
+        self.assertEqual(message, 'event: ping\ndata: {"ok": true}\n\n')
+
+    def test_heartbeat_then_disconnect(self):
+        async def run():
+            request = mock.Mock(is_disconnected=mock.AsyncMock(side_effect=[False, True]))
+            return [m async for m in events.stream(request)]
+        with mock.patch.object(events, "HEARTBEAT_SECONDS", 0.01):
+            self.assertEqual(asyncio.run(run()), ["retry: 5000\n\n", ": keepalive\n\n"])
+
+if __name__ == "__main__":
+    unittest.main()
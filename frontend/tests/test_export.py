@@ -0,0 +1,95 @@
+import csv
+import io
+import unittest
+import zlib
+from datetime import datetime, timedelta
+from unittest import mock
+
+from py import export
+from py.export import csv_chunks, columnar_chunks
+from py.models import SpeedtestResult
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+COLUMNS = ["timestamp", "download", "server_name"]
+ROWS = [(f"2026-10-18T12:{i % 60:02d}:00", i * 1.5, f"srv {i % 3}") for i in range(500)]
+
+class CsvChunksTest(unittest.TestCase):
+    def read(self, data):
+        return list(csv.reader(io.StringIO(data.decode("utf-8"))))
+
+    def test_header_is_first_chunk(self):
+        chunks = list(csv_chunks(COLUMNS, iter(ROWS[:3])))
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(self.read(chunks[0]), [COLUMNS])
+
+    def test_header_sent_before_rows_are_read(self):
+        def rows():
+            raise AssertionError("rows read before header was sent")
+            yield
+        for gzip in (False, True):
+            first = next(csv_chunks(COLUMNS, rows(), gzip))
+            if gzip: first = zlib.decompressobj(wbits=31).decompress(first)
+            self.assertEqual(self.read(first), [COLUMNS])
+
+    def test_large_export_is_split_and_complete(self):
+        with mock.patch.object(export, "CSV_CHUNK_BYTES", 1024):
+            chunks = list(csv_chunks(COLUMNS, iter(ROWS)))
+        self.assertGreater(len(chunks), 5)
+        self.assertTrue(all(chunks))
+        rows = self.read(b"".join(chunks))
+        self.assertEqual(rows[0], COLUMNS)
+        self.assertEqual(len(rows), len(ROWS) + 1)
+        self.assertEqual(rows[-1], [str(v) for v in ROWS[-1]])
+
+    def test_gzip_stream_decompresses_to_plain_csv(self):
+        with mock.patch.object(export, "CSV_CHUNK_BYTES", 1024):
+            plain = b"".join(csv_chunks(COLUMNS, iter(ROWS)))
+            packed = b"".join(csv_chunks(COLUMNS, iter(ROWS), gzip=True))
+        self.assertEqual(zlib.decompress(packed, wbits=31), plain)
+
+    def test_empty_export_has_header(self):
+        self.assertEqual(self.read(b"".join(csv_chunks(COLUMNS, iter([])))), [COLUMNS])
+
+ARROW_COLUMNS = ["timestamp", "download", "server_id", "server_name"]
+ARROW_ROWS = [
+    (datetime(2026, 10, 18) + timedelta(minutes=i), None if i == 7 else i * 1.5, i % 4, f"srv {i % 3}")
+    for i in range(250)
+]
+
+@unittest.skipIf(pyarrow is None, "pyarrow not installed")
+class ColumnarChunksTest(unittest.TestCase):
+    def export(self, fmt):
+        return list(columnar_chunks(SpeedtestResult, ARROW_COLUMNS, iter(ARROW_ROWS), fmt, batch_size=100))
+
+    def test_arrow_stream_batches(self):
+        import pyarrow as pa
+        chunks = self.export("arrow")
+        # Po jednej porcji na pełną partię + końcówka z ostatnią partią i stopką strumienia
+        self.assertEqual(len(chunks), 3)
+        table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+        self.assertEqual(table.num_rows, len(ARROW_ROWS))
+        self.assertEqual([b.num_rows for b in table.to_batches()], [100, 100, 50])
+        self.assertTrue(pa.types.is_dictionary(table.schema.field("server_name").type))
+        self.assertIsNone(table.column("download")[7].as_py())
+        self.assertEqual(table.column("timestamp")[0].as_py(), ARROW_ROWS[0][0])
+
+    def test_parquet_row_groups(self):
+        import pyarrow.parquet as pq
+        f = pq.ParquetFile(io.BytesIO(b"".join(self.export("parquet"))))
+        self.assertEqual(f.metadata.num_rows, len(ARROW_ROWS))
+        self.assertEqual(f.metadata.num_row_groups, 3)
+        table = f.read()
+        self.assertEqual(table.column("server_name").to_pylist(), [r[3] for r in ARROW_ROWS])
+
+    def test_empty_export_has_schema(self):
+        import pyarrow as pa
+        table = pa.ipc.open_stream(b"".join(columnar_chunks(SpeedtestResult, ARROW_COLUMNS, iter([]), "arrow"))).read_all()
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.schema.names, ARROW_COLUMNS)
+
+if __name__ == "__main__":
+    unittest.main()
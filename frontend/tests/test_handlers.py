@@ -0,0 +1,33 @@
+import inspect
+import unittest
+
+from fastapi.routing import APIRoute
+
+from py import auth, campaigns, results, settings, system
+from py.database import get_db
+
+ROUTERS = (auth.router, results.router, settings.router, system.router, campaigns.router)
+
+# Handlery async, które nie dotykają bazy ani plików (httpx, SSE, BackgroundTasks, StreamingResponse)
+ASYNC_HANDLERS = {"login", "logout", "oidc_login", "oidc_callback", "event_stream", "trigger_google_backup", "export_csv", "export_columnar"}
+
+def uses_db(dependant):
+    return any(d.call is get_db or uses_db(d) for d in dependant.dependencies)
+
+def api_routes():
+    return [r for router in ROUTERS for r in router.routes if isinstance(r, APIRoute)]
+
+class BlockingHandlersTest(unittest.TestCase):
+    def test_db_handlers_run_in_threadpool(self):
+        # Zwykłe "def" FastAPI uruchamia w puli wątków, więc zapytanie nie blokuje pętli uvicorna
+        db_routes = [r for r in api_routes() if uses_db(r.dependant)]
+        self.assertTrue(db_routes)
+        for route in db_routes:
+            self.assertFalse(inspect.iscoroutinefunction(route.endpoint), msg=f"{route.path} {route.endpoint.__name__}")
+
+    def test_no_unexpected_async_handlers(self):
+        found = {r.endpoint.__name__ for r in api_routes() if inspect.iscoroutinefunction(r.endpoint)}
+        self.assertLessEqual(found, ASYNC_HANDLERS)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from py import jobs
+from py.models import Base, SpeedtestJob
+
+class CancelJobTest(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine, tables=[SpeedtestJob.__table__])
+        self.Session = sessionmaker(bind=engine)
+        db = self.Session()
+        db.add(SpeedtestJob(id="job", status="queued", created_at=datetime.now()))
+        db.commit()
+        db.close()
+        publish = mock.patch.object(jobs.events, "publish")
+        publish.start()
+        self.addCleanup(publish.stop)
+        self.addCleanup(jobs._cancel.clear)
+
+    def test_cancel_running_job_sets_event(self):
+        worker = self.Session()
+        self.assertIsNotNone(jobs._claim_next(worker))
+        db = self.Session()
+        job = jobs.cancel_job(db, "job")
+        self.assertEqual(job.status, "running")
+        self.assertTrue(jobs._cancel["job"].is_set())
+
+    def test_cancel_losing_race_with_claim_still_signals(self):
+        # cancel_job odczytał "queued", a worker podjął zadanie przed warunkową aktualizacją
+        db = self.Session()
+        stale = jobs.get_job(db, "job")
+        self.assertEqual(stale.status, "queued")
+        jobs._claim_next(self.Session())
+        with mock.patch.object(jobs, "get_job", return_value=stale):
+            job = jobs.cancel_job(db, "job")
+        self.assertEqual(job.status, "running")
+        self.assertTrue(jobs._cancel["job"].is_set())
+
+    def test_cancel_queued_job(self):
+        db = self.Session()
+        self.assertEqual(jobs.cancel_job(db, "job").status, "cancelled")
+        self.assertIsNone(jobs._claim_next(self.Session()))
+        self.assertNotIn("job", jobs._cancel)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+
+from sqlalchemy import create_engine, inspect
+
+from py import migrations
+from py.models import Campaign, SpeedtestJob
+from py.migrations import MIGRATIONS, LATEST_VERSION, create_tables, run_migrations
+
+class FakeEngine:
+    """Zapisuje wykonany SQL; SELECT MAX(version) zwraca zadaną wersję."""
+    def __init__(self, version):
+        self.version = version
+        self.executed = []
+
+    def _connection(self):
+        conn = mock.Mock()
+        def execute(stmt, params=None):
+            sql = str(stmt)
+            if sql.startswith("SELECT MAX(version)"):
+                return mock.Mock(scalar=mock.Mock(return_value=self.version))
+            self.executed.append((sql, params))
+        conn.execute.side_effect = execute
+        return conn
+
+    @contextmanager
+    def connect(self):
+        yield self._connection()
+
+    @contextmanager
+    def begin(self):
+        yield self._connection()
+
+class MigrationListTest(unittest.TestCase):
+    def test_versions_are_consecutive(self):
+        self.assertEqual([m[0] for m in MIGRATIONS], list(range(1, LATEST_VERSION + 1)))
+
+    def test_sql_steps_are_repeatable(self):
+        # Przerwaną migrację (albo wszystkie po restore) można wykonać ponownie
+        for number, _, steps in MIGRATIONS:
+            for step in steps:
+                if callable(step): continue
+                self.assertRegex(step, r"IF (NOT )?EXISTS|INSERT IGNORE", msg=f"migration {number}: {step}")
+
+    def test_create_tables_twice(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            create_tables("campaigns", "speedtest_jobs")(conn)
+            create_tables("campaigns", "speedtest_jobs")(conn)
+        self.assertTrue({Campaign.__tablename__, SpeedtestJob.__tablename__} <= set(inspect(engine).get_table_names()))
+
+class RunMigrationsTest(unittest.TestCase):
+    def setUp(self):
+        # Kroki create_tables potrzebują prawdziwego połączenia - tu liczy się tylko kolejność
+        sql_only = [(n, d, [s for s in steps if not callable(s)]) for n, d, steps in MIGRATIONS]
+        for patch in (mock.patch.object(migrations, "get_log", return_value=""), mock.patch.object(migrations, "MIGRATIONS", sql_only)):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def recorded_versions(self, engine):
+        return [p["v"] for sql, p in engine.executed if sql.startswith("INSERT INTO schema_version")]
+
+    def test_current_schema_runs_nothing(self):
+        engine = FakeEngine(LATEST_VERSION)
+        self.assertEqual(run_migrations(engine), LATEST_VERSION)
+        self.assertEqual(engine.executed, [])
+
+    def test_applies_only_newer_in_order(self):
+        engine = FakeEngine(LATEST_VERSION - 2)
+        self.assertEqual(run_migrations(engine), LATEST_VERSION)
+        self.assertEqual(self.recorded_versions(engine), [LATEST_VERSION - 1, LATEST_VERSION])
+
+    def test_missing_version_table_reapplies_everything(self):
+        # Tak wygląda baza po przywróceniu zrzutu bez schema_version
+        engine = FakeEngine(0)
+        run_migrations(engine)
+        self.assertEqual(self.recorded_versions(engine), list(range(1, LATEST_VERSION + 1)))
+
+if __name__ == "__main__":
+    unittest.main()
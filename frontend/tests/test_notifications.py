@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+
+from py import notifications
+from py.notifications import NotificationDispatcher, active_providers, build_request
+
+CFG = SimpleNamespace(webhook_url="http://hook.local/x", ntfy_topic="alerts", ntfy_server=None, pushover_user_key=None, pushover_api_token=None)
+
+class ActiveProvidersTest(unittest.TestCase):
+    def test_provider_list_and_fallback(self):
+        self.assertEqual(active_providers(SimpleNamespace(enabled=True, providers="ntfy, bogus,webhook", provider="pushover")), ["ntfy", "webhook"])
+        self.assertEqual(active_providers(SimpleNamespace(enabled=True, providers="", provider="ntfy")), ["ntfy"])
+        self.assertEqual(active_providers(SimpleNamespace(enabled=False, providers="ntfy", provider="ntfy")), [])
+        self.assertEqual(active_providers(None), [])
+
+    def test_missing_configuration(self):
+        with self.assertRaises(ValueError):
+            build_request("pushover", CFG, "t", "m", "down")
+        url, kwargs = build_request("ntfy", CFG, "t", "m", "down")
+        self.assertEqual((url, kwargs["headers"]["Tags"]), ("https://ntfy.sh/alerts", "warning"))
+
+class SendTest(unittest.TestCase):
+    """Ponawianie z wykładniczym opóźnieniem na lokalnym transporcie httpx."""
+
+    def run_send(self, responses, attempts=notifications.MAX_ATTEMPTS, provider="webhook"):
+        calls = []
+        def handler(request):
+            calls.append(request)
+            res = responses[min(len(calls), len(responses)) - 1]
+            if isinstance(res, Exception): raise res
+            return httpx.Response(res)
+        delays = []
+        async def fake_sleep(delay):
+            delays.append(delay)
+        async def run():
+            dispatcher = NotificationDispatcher()
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                dispatcher._client = client
+                await dispatcher._send(provider, CFG, "title", "msg", "down", attempts)
+        with mock.patch.object(notifications.asyncio, "sleep", fake_sleep), \
+             mock.patch.object(notifications.random, "uniform", return_value=1.0):
+            try:
+                asyncio.run(run())
+                error = None
+            except httpx.HTTPError as e:
+                error = e
+        return len(calls), delays, error
+
+    def test_retries_5xx_until_success(self):
+        self.assertEqual(self.run_send([503, 502, 200]), (3, [1.0, 2.0], None))
+
+    def test_gives_up_after_max_attempts(self):
+        calls, delays, error = self.run_send([429])
+        self.assertEqual((calls, delays), (4, [1.0, 2.0, 4.0]))
+        self.assertIsInstance(error, httpx.HTTPStatusError)
+
+    def test_client_error_is_not_retried(self):
+        calls, delays, error = self.run_send([400])
+        self.assertEqual((calls, delays), (1, []))
+        self.assertEqual(error.response.status_code, 400)
+
+    def test_transport_error_is_retried(self):
+        self.assertEqual(self.run_send([httpx.ConnectError("refused"), 204])[:2], (2, [1.0]))
+
+    def test_backoff_is_capped(self):
+        with mock.patch.object(notifications, "BACKOFF_MAX", 3.0):
+            self.assertEqual(self.run_send([500], attempts=5)[1], [1.0, 2.0, 3.0, 3.0])
+
+class FanOutTest(unittest.TestCase):
+    def test_one_failing_provider_does_not_stop_others(self):
+        dispatcher = NotificationDispatcher()
+        sent = []
+        async def send(provider, *args):
+            if provider == "ntfy": raise httpx.ConnectError("down")
+            sent.append(provider)
+        dispatcher._send = send
+        with self.assertLogs(level="ERROR") as logs:
+            asyncio.run(dispatcher._fan_out(["ntfy", "webhook"], CFG, "t", "m", "down"))
+        self.assertEqual(sent, ["webhook"])
+        self.assertIn("(ntfy)", logs.output[0])
+
+    def test_notify_without_providers_does_not_start(self):
+        dispatcher = NotificationDispatcher()
+        with mock.patch.object(notifications.settings_cache.notification_settings, "get", return_value=None):
+            dispatcher.notify("t", "m")
+        self.assertIsNone(dispatcher._loop)
+
+if __name__ == "__main__":
+    unittest.main()
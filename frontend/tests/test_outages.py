@@ -0,0 +1,89 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from py import outages
+from py.models import Base, Outage
+from py.outages import track_outage, close_outage, uptime_report
+
+T0 = datetime(2026, 10, 1)
+
+class OutageTestCase(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine, tables=[Outage.__table__])
+        self.Session = sessionmaker(bind=engine)
+        patch = mock.patch.object(outages.database, "SessionLocal", self.Session)
+        patch.start()
+        self.addCleanup(patch.stop)
+        outages.reset()
+        self.addCleanup(outages.reset)
+        self.db = self.Session()
+        self.addCleanup(self.db.close)
+
+    def rows(self):
+        self.db.expire_all()
+        return self.db.query(Outage).order_by(Outage.started_at).all()
+
+class TrackOutageTest(OutageTestCase):
+    def test_interval_opens_and_closes_on_state_change(self):
+        self.assertFalse(track_outage("gw", T0, True, 0.0))
+        self.assertTrue(track_outage("gw", T0 + timedelta(seconds=10), False, 50.0))
+        self.assertFalse(track_outage("gw", T0 + timedelta(seconds=20), False, 100.0))
+        self.assertTrue(track_outage("gw", T0 + timedelta(seconds=70), True, 0.0))
+        o, = self.rows()
+        self.assertEqual((o.started_at, o.ended_at, o.duration, o.peak_loss), (T0 + timedelta(seconds=10), T0 + timedelta(seconds=70), 60.0, 100.0))
+
+    def test_open_outage_is_picked_up_after_restart(self):
+        self.db.add(Outage(target="gw", started_at=T0, peak_loss=20.0))
+        self.db.commit()
+        # Stan w pamięci pusty (np. po restarcie) - otwarta awaria z bazy nie jest dublowana
+        self.assertFalse(track_outage("gw", T0 + timedelta(seconds=5), False, 10.0))
+        self.assertTrue(track_outage("gw", T0 + timedelta(seconds=30), True, 0.0))
+        o, = self.rows()
+        self.assertEqual((o.duration, o.peak_loss), (30.0, 20.0))
+
+    def test_close_outage_of_removed_target(self):
+        track_outage("gw", T0, False, 100.0)
+        close_outage("gw", T0 + timedelta(minutes=2))
+        self.assertEqual(self.rows()[0].duration, 120.0)
+        close_outage("other")
+
+class UptimeReportTest(OutageTestCase):
+    def add(self, start, minutes):
+        end = start + timedelta(minutes=minutes) if minutes is not None else None
+        self.db.add(Outage(target="gw", started_at=start, ended_at=end, duration=minutes * 60 if end else None, peak_loss=100.0))
+        self.db.commit()
+
+    def test_clipped_downtime_mtbf_mttr(self):
+        start, end = T0, T0 + timedelta(hours=10)
+        self.add(start - timedelta(minutes=30), 60)    # 30 min w zakresie, zaczęła się wcześniej
+        self.add(start + timedelta(hours=2), 30)
+        self.add(start + timedelta(hours=6), 90)
+        self.add(end + timedelta(hours=1), 10)         # poza zakresem
+        report = uptime_report(self.db, "gw", start, end)
+        self.assertEqual(report["outages"], 3)
+        self.assertEqual(report["downtime_seconds"], 150 * 60.0)
+        self.assertEqual(report["availability"], 75.0)
+        # Awarie rozpoczęte w zakresie: 2; czas naprawy ze wszystkich zamkniętych
+        self.assertEqual(report["mtbf_seconds"], 450 * 60 / 2)
+        self.assertEqual(report["mttr_seconds"], 60 * 60.0)
+
+    def test_ongoing_outage_counts_until_now(self):
+        now = datetime.now()
+        self.add(now - timedelta(hours=1), None)
+        report = uptime_report(self.db, "gw", now - timedelta(hours=4), now + timedelta(hours=4))
+        self.assertTrue(report["intervals"][0]["ongoing"])
+        self.assertAlmostEqual(report["availability"], 75.0, places=1)
+        self.assertIsNone(report["mttr_seconds"])
+
+    def test_no_outages(self):
+        report = uptime_report(self.db, "gw", T0, T0 + timedelta(days=1))
+        self.assertEqual((report["availability"], report["mtbf_seconds"], report["intervals"]), (100.0, None, []))
+
+if __name__ == "__main__":
+    unittest.main()
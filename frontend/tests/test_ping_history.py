@@ -0,0 +1,65 @@
+import unittest
+from datetime import datetime, timedelta
+
+from py.ping_history import PingHistory
+
+T0 = datetime(2026, 10, 18, 12, 0, 0)
+
+def status(target, online=True):
+    return {"online": online, "latency": 5.0, "loss": 0, "target": target, "updated": T0}
+
+class PingHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.history = PingHistory(size=3)
+
+    def test_ring_buffer_keeps_newest_points(self):
+        for i in range(5):
+            self.history.record(status("gw"), T0 + timedelta(seconds=i), float(i), primary=True)
+        primary, statuses, points, _ = self.history.snapshot()
+        self.assertEqual([p["latency"] for p in points], [2.0, 3.0, 4.0])
+        self.assertEqual(points[0]["time"], "12:00:02")
+        self.assertEqual(primary["target"], "gw")
+        self.assertEqual(len(statuses), 1)
+
+    def test_since_cursor_returns_only_new_points(self):
+        # Ten sam timestamp rozróżnia numer sekwencyjny
+        self.history.record(status("gw"), T0, 1.0, primary=True)
+        *_, last = self.history.snapshot()
+        self.history.record(status("gw"), T0, 2.0, primary=True)
+        *_, points, last2 = self.history.snapshot(since=last)
+        self.assertEqual([p["latency"] for p in points], [2.0])
+        self.assertEqual(self.history.snapshot(since=last2)[2], [])
+
+    def test_status_is_a_copy(self):
+        s = status("gw")
+        self.history.record(s, T0, 1.0, primary=True)
+        s["online"] = False
+        primary, *_ = self.history.snapshot()
+        primary["latency"] = 99
+        self.assertTrue(self.history.snapshot()[0]["online"])
+        self.assertEqual(self.history.snapshot()[0]["latency"], 5.0)
+
+    def test_initial_status_without_primary(self):
+        primary, statuses, points, last = self.history.snapshot()
+        self.assertEqual((primary["target"], statuses, points, last), ("init", [], [], None))
+
+    def test_warm_keeps_tail_and_does_not_overwrite(self):
+        rows = [(T0 + timedelta(seconds=i), float(i)) for i in range(5)]
+        self.history.warm("gw", rows, primary=True)
+        self.history.warm("gw", [(T0, 99.0)])
+        self.assertEqual([p["latency"] for p in self.history.snapshot()[2]], [2.0, 3.0, 4.0])
+
+    def test_reload_replaces_known_targets_only(self):
+        self.history.record(status("gw"), T0, 1.0, primary=True)
+        self.history.reload(lambda target: [(T0 + timedelta(seconds=1), 7.0)])
+        self.assertEqual([p["latency"] for p in self.history.snapshot()[2]], [7.0])
+        self.assertFalse(self.history.has("other"))
+
+    def test_drop_clears_primary(self):
+        self.history.record(status("gw"), T0, 1.0, primary=True)
+        self.history.drop("gw")
+        self.assertIsNone(self.history.primary_target())
+        self.assertFalse(self.history.has("gw"))
+
+if __name__ == "__main__":
+    unittest.main()
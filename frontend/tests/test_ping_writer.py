@@ -0,0 +1,54 @@
+import unittest
+from unittest import mock
+
+from py import ping_writer
+from py.ping_writer import PingLogWriter
+
+class PingLogWriterTest(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.object(ping_writer.dataversion, "bump")
+        self.bump = patch.start()
+        self.addCleanup(patch.stop)
+        self.writer = PingLogWriter(batch_size=3, flush_interval=60)
+        self.written = []
+        self.writer._write = self.written.append
+
+    def test_flush_writes_batch_in_order(self):
+        for i in range(4):
+            self.writer.submit({"n": i})
+        self.assertEqual(self.writer.flush(), 4)
+        self.assertEqual(self.written, [[{"n": 0}, {"n": 1}, {"n": 2}, {"n": 3}]])
+        self.assertEqual(self.writer.flush(), 0)
+        self.bump.assert_called_once_with("ping")
+
+    def test_failed_flush_keeps_rows_ahead_of_new_ones(self):
+        self.writer._write = mock.Mock(side_effect=OSError("db down"))
+        self.writer.submit({"n": 0})
+        self.assertIsNone(self.writer.flush())
+        self.writer.submit({"n": 1})
+        self.assertEqual(self.writer._buffer, [{"n": 0}, {"n": 1}])
+        self.bump.assert_not_called()
+
+    def test_buffer_is_capped_when_db_is_down(self):
+        self.writer._write = mock.Mock(side_effect=OSError("db down"))
+        with mock.patch.object(ping_writer, "MAX_PENDING", 2):
+            for i in range(3):
+                self.writer.submit({"n": i})
+            self.writer.flush()
+        # Odrzucane są najstarsze wiersze
+        self.assertEqual(self.writer._buffer, [{"n": 1}, {"n": 2}])
+
+    def test_sketches_restored_when_insert_fails(self):
+        writer = PingLogWriter()
+        db = mock.Mock()
+        db.execute.side_effect = OSError("db down")
+        with mock.patch.object(ping_writer.database, "SessionLocal", return_value=db), \
+             mock.patch.object(ping_writer, "latency_sketches") as sketches:
+            with self.assertRaises(OSError):
+                writer._write([{"target": "gw"}])
+        sketches.restore.assert_called_once_with(sketches.take.return_value)
+        db.close.assert_called_once()
+        db.commit.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
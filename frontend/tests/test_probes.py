@@ -0,0 +1,131 @@
+import asyncio
+import struct
+import unittest
+from unittest import mock
+
+from py import probes
+from py.probes import summarize, build_echo_request, _checksum, _IcmpProtocol, SubprocessProber
+from py.probes import build_dns_query, probe_dns, probe_tcp, run_probe, target_label
+
+PING_OUTPUT = b"""PING 10.0.0.1 (10.0.0.1) 56(84) bytes of data.
+64 bytes from 10.0.0.1: icmp_seq=1 ttl=64 time=1.25 ms
+64 bytes from 10.0.0.1: icmp_seq=3 ttl=64 time=2.5 ms
+
+--- 10.0.0.1 ping statistics ---
+3 packets transmitted, 2 received, 33.3333% packet loss, time 401ms
+"""
+
+class SummarizeTest(unittest.TestCase):
+    def test_partial_loss(self):
+        self.assertEqual(summarize([10.0, None, 20.0]), (15.0, 33.3, True))
+
+    def test_all_lost(self):
+        self.assertEqual(summarize([None, None]), (None, 100.0, False))
+        self.assertEqual(summarize([]), (None, 100.0, False))
+
+class EchoRequestTest(unittest.TestCase):
+    def test_packet_checksum_verifies(self):
+        packet = build_echo_request(0xBEEF)
+        icmp_type, code, _, ident, seq = struct.unpack("!BBHHH", packet[:8])
+        self.assertEqual((icmp_type, code, ident, seq), (8, 0, 0, 0xBEEF))
+        # Suma kontrolna całego pakietu (z polem sumy) daje 0
+        self.assertEqual(_checksum(packet), 0)
+
+    def test_odd_payload_length(self):
+        self.assertEqual(_checksum(build_echo_request(1, b"abc")), 0)
+
+class IcmpProtocolTest(unittest.TestCase):
+    def test_reply_matches_sequence_and_address(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        proto = _IcmpProtocol()
+        fut = loop.create_future()
+        proto.waiters[7] = (fut, "10.0.0.1")
+
+        reply = struct.pack("!BBHHH", 0, 0, 0, 0, 7)
+        proto.datagram_received(struct.pack("!BBHHH", 8, 0, 0, 0, 7), ("10.0.0.1", 0)) # echo request
+        proto.datagram_received(reply, ("10.0.0.2", 0)) # inny host
+        proto.datagram_received(struct.pack("!BBHHH", 0, 0, 0, 0, 8), ("10.0.0.1", 0)) # inny numer
+        self.assertFalse(fut.done())
+        proto.datagram_received(reply, ("10.0.0.1", 0))
+        self.assertTrue(fut.done())
+        proto.datagram_received(reply, ("10.0.0.1", 0)) # duplikat nie rzuca InvalidStateError
+
+class SubprocessProberTest(unittest.TestCase):
+    def test_parses_rtt_per_sequence(self):
+        proc = mock.Mock()
+        proc.communicate = mock.AsyncMock(return_value=(PING_OUTPUT, b""))
+        with mock.patch.object(probes.asyncio, "create_subprocess_exec", mock.AsyncMock(return_value=proc)):
+            rtts = asyncio.run(SubprocessProber().probe("10.0.0.1", count=3))
+        self.assertEqual(rtts, [1.25, None, 2.5])
+
+class _Resolver(asyncio.DatagramProtocol):
+    """Lokalny resolver odpowiadający zadanym RCODE."""
+    def __init__(self, rcode):
+        self.rcode = rcode
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        query_id = struct.unpack("!H", data[:2])[0]
+        self.transport.sendto(struct.pack("!HHHHHH", query_id, 0x8180 | self.rcode, 1, 0, 0, 0) + data[12:], addr)
+
+class DnsProbeTest(unittest.TestCase):
+    def test_query_encoding(self):
+        query = build_dns_query(0x1234, "example.com.")
+        self.assertEqual(query[:12], struct.pack("!HHHHHH", 0x1234, 0x0100, 1, 0, 0, 0))
+        self.assertEqual(query[12:], b"\x07example\x03com\x00\x00\x01\x00\x01")
+
+    def resolve(self, rcode):
+        async def run():
+            loop = asyncio.get_running_loop()
+            transport, _ = await loop.create_datagram_endpoint(lambda: _Resolver(rcode), local_addr=("127.0.0.1", 0))
+            try:
+                return await probe_dns("example.com", "127.0.0.1", transport.get_extra_info("sockname")[1], timeout=1)
+            finally:
+                transport.close()
+        return asyncio.run(run())
+
+    def test_noerror_and_nxdomain_are_answers(self):
+        for rcode in (0, 3):
+            rtt, = self.resolve(rcode)
+            self.assertIsInstance(rtt, float)
+
+    def test_servfail_is_failure(self):
+        self.assertEqual(self.resolve(2), [None])
+
+class TcpProbeTest(unittest.TestCase):
+    def test_connect_and_refused(self):
+        async def run():
+            server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                ok = await probe_tcp("127.0.0.1", port, timeout=1)
+            server.close()
+            await server.wait_closed()
+            return ok, await probe_tcp("127.0.0.1", port, timeout=1)
+        ok, refused = asyncio.run(run())
+        self.assertIsInstance(ok[0], float)
+        self.assertEqual(refused, [None])
+
+class RunProbeTest(unittest.TestCase):
+    def test_dispatch_by_type(self):
+        icmp = mock.Mock(probe=mock.AsyncMock(return_value=[1.0]))
+        with mock.patch.object(probes, "probe_tcp", mock.AsyncMock(return_value=[2.0])) as tcp, \
+             mock.patch.object(probes, "probe_dns", mock.AsyncMock(return_value=[3.0])) as dns:
+            self.assertEqual(asyncio.run(run_probe(icmp, {"host": "gw"})), [1.0])
+            self.assertEqual(asyncio.run(run_probe(icmp, {"probe_type": "tcp", "host": "gw", "port": 443})), [2.0])
+            self.assertEqual(asyncio.run(run_probe(icmp, {"probe_type": "dns", "host": "example.com", "resolver": "1.1.1.1", "port": None})), [3.0])
+        tcp.assert_awaited_once_with("gw", 443)
+        dns.assert_awaited_once_with("example.com", "1.1.1.1", 53)
+
+    def test_target_labels(self):
+        self.assertEqual(target_label("icmp", "10.0.0.1"), "10.0.0.1")
+        self.assertEqual(target_label("tcp", "gw", 443), "tcp://gw:443")
+        self.assertEqual(target_label("http", "https://example.com/"), "https://example.com/")
+        self.assertEqual(target_label("dns", "example.com"), "dns://system/example.com")
+        self.assertEqual(target_label("dns", "example.com", resolver="1.1.1.1"), "dns://1.1.1.1/example.com")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from py.models import Base, SpeedtestResult, ResultTombstone
+from py.results import get_results_since, latest_sync_cursor, parse_sync_cursor, encode_cursor, encode_sync_cursor, RESULT_COLUMNS
+
+class ResultsDeltaTest(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine, tables=[SpeedtestResult.__table__, ResultTombstone.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.addCleanup(self.db.close)
+
+    def _result(self, rid, ts):
+        self.db.add(SpeedtestResult(id=rid, timestamp=ts, download=100.0))
+        self.db.commit()
+
+    def test_no_reset_when_newest_result_is_old(self):
+        # Brak testów przez ponad tydzień nie wymusza pełnego przeładowania
+        old = datetime.now() - timedelta(days=10)
+        self._result("a", old)
+        delta = get_results_since(self.db, encode_sync_cursor(old, "a", datetime.now()), list(RESULT_COLUMNS), 100)
+        self.assertFalse(delta["reset"])
+        self.assertEqual(delta["rows"], [])
+
+    def test_legacy_cursor_with_old_row_does_not_reset(self):
+        old = datetime.now() - timedelta(days=10)
+        self._result("a", old)
+        delta = get_results_since(self.db, encode_cursor(old, "a"), list(RESULT_COLUMNS), 100)
+        self.assertFalse(delta["reset"])
+
+    def test_full_list_cursor_converges_for_old_results(self):
+        # Pełne pobranie daje kursor z czasem serwera, więc kolejna delta nie wymusza resetu
+        old = datetime.now() - timedelta(days=30)
+        self._result("a", old)
+        cursor = latest_sync_cursor(self.db)
+        self.assertEqual(parse_sync_cursor(cursor)[:2], (old, "a"))
+        delta = get_results_since(self.db, cursor, list(RESULT_COLUMNS), 100)
+        self.assertFalse(delta["reset"])
+        self.assertEqual(delta["rows"], [])
+
+    def test_full_list_cursor_on_empty_table(self):
+        cursor = latest_sync_cursor(self.db)
+        self._result("b", datetime.now())
+        delta = get_results_since(self.db, cursor, list(RESULT_COLUMNS), 100)
+        self.assertEqual([r["id"] for r in delta["rows"]], ["b"])
+
+    def test_reset_when_last_sync_is_too_old(self):
+        ts = datetime.now() - timedelta(days=10)
+        delta = get_results_since(self.db, encode_sync_cursor(ts, "a", ts), list(RESULT_COLUMNS), 100)
+        self.assertTrue(delta["reset"])
+
+    def test_tombstones_are_not_resent_after_sync(self):
+        old = datetime.now() - timedelta(days=2)
+        self._result("a", old)
+        self.db.add(ResultTombstone(result_id="b", deleted_at=datetime.now() - timedelta(hours=1)))
+        self.db.commit()
+
+        first = get_results_since(self.db, encode_cursor(old, "a"), list(RESULT_COLUMNS), 100)
+        self.assertEqual(first["deleted"], ["b"])
+        second = get_results_since(self.db, first["cursor"], list(RESULT_COLUMNS), 100)
+        self.assertEqual(second["deleted"], [])
+
+    def test_cursor_keeps_row_position_and_advances(self):
+        base = datetime.now() - timedelta(hours=3)
+        self._result("a", base)
+        self._result("b", base + timedelta(hours=1))
+        delta = get_results_since(self.db, encode_cursor(base, "a"), list(RESULT_COLUMNS), 100)
+        self.assertEqual([r["id"] for r in delta["rows"]], ["b"])
+        again = get_results_since(self.db, delta["cursor"], list(RESULT_COLUMNS), 100)
+        self.assertEqual(again["rows"], [])
+
+if __name__ == "__main__":
+    unittest.main()
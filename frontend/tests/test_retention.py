@@ -0,0 +1,54 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from py import retention
+from py.retention import ping_tier, raw_cutoff, minute_cutoff
+
+NOW = datetime(2026, 10, 18, 12, 0)
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW
+
+class PingTierTest(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.object(retention, "datetime", FrozenDatetime),
+            mock.patch.object(retention, "PING_LOG_RETENTION_HOURS", 24),
+            mock.patch.object(retention, "PING_MINUTE_RETENTION_DAYS", 30),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_cutoffs(self):
+        self.assertEqual(raw_cutoff(NOW), NOW - timedelta(hours=24))
+        self.assertEqual(minute_cutoff(NOW), NOW - timedelta(days=30))
+
+    def test_raw_window(self):
+        self.assertEqual(ping_tier(NOW - timedelta(hours=6), NOW, 300), "raw")
+
+    def test_coarsest_period_not_larger_than_bucket(self):
+        # 2 dni / 300 punktów = 576 s -> minuty; 20 dni / 300 = 96 min -> godziny
+        self.assertEqual(ping_tier(NOW - timedelta(days=2), NOW, 300), "minute")
+        self.assertEqual(ping_tier(NOW - timedelta(days=20), NOW, 300), "hour")
+        self.assertEqual(ping_tier(NOW - timedelta(days=365), NOW, 300), "day")
+
+    def test_minute_tier_skipped_past_its_retention(self):
+        # Kubełek 5 min pasowałby do minut, ale agregaty minutowe już nie pokrywają początku
+        start = NOW - timedelta(days=40)
+        self.assertEqual(ping_tier(start, start + timedelta(days=1), 300), "hour")
+
+class DeleteChunkedTest(unittest.TestCase):
+    def test_repeats_until_short_chunk(self):
+        db = mock.Mock()
+        db.execute.side_effect = [mock.Mock(rowcount=n) for n in (5, 5, 2)]
+        with mock.patch.object(retention.time, "sleep") as sleep:
+            self.assertEqual(retention._delete_chunked(db, retention.PingLog, [retention.PingLog.timestamp < NOW], 5), 12)
+        self.assertEqual(db.commit.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from py.models import Base, SpeedtestRollup
+from py.rollups import truncate, rollup_rows, rollup_stats, period_length
+
+T0 = datetime(2026, 10, 18, 12, 34, 56, 789)
+
+def result(ts, server_id, download, upload=None):
+    return SimpleNamespace(timestamp=ts, server_id=server_id, download=download, upload=upload, ping=None, jitter=None)
+
+def ping(ts, target, latency):
+    return SimpleNamespace(timestamp=ts, target=target, latency=latency, packet_loss=0.0, is_online=True)
+
+class TruncateTest(unittest.TestCase):
+    def test_periods(self):
+        self.assertEqual(truncate(T0, "minute"), datetime(2026, 10, 18, 12, 34))
+        self.assertEqual(truncate(T0, "hour"), datetime(2026, 10, 18, 12))
+        self.assertEqual(truncate(T0, "day"), datetime(2026, 10, 18))
+        self.assertEqual(period_length("hour"), timedelta(hours=1))
+
+class RollupRowsTest(unittest.TestCase):
+    def test_speedtest_buckets_hour_and_day(self):
+        rows = rollup_rows("speedtest", [
+            result(T0, 1, 100.0), result(T0 + timedelta(minutes=10), 1, 300.0),
+            result(T0 + timedelta(hours=1), 1, 50.0), result(T0, None, 10.0)
+        ])
+        by_key = {(r["period"], r["bucket_start"], r["server_id"], r["metric"]): r for r in rows}
+        # Brak metryki (None) nie tworzy kubełka; serwer None trafia pod klucz 0
+        self.assertEqual({r["metric"] for r in rows}, {"download"})
+        self.assertNotIn("minute", {r["period"] for r in rows})
+
+        hour = by_key[("hour", datetime(2026, 10, 18, 12), 1, "download")]
+        self.assertEqual((hour["samples"], hour["total"], hour["min_value"], hour["max_value"], hour["sum_sq"]), (2, 400.0, 100.0, 300.0, 100000.0))
+        self.assertEqual(by_key[("day", datetime(2026, 10, 18), 1, "download")]["samples"], 3)
+        self.assertEqual(by_key[("day", datetime(2026, 10, 18), 0, "download")]["total"], 10.0)
+
+    def test_ping_has_minute_buckets(self):
+        rows = rollup_rows("ping", [ping(T0, "gw", 10.0), ping(T0 + timedelta(seconds=2), "gw", 20.0)])
+        minute = [r for r in rows if r["period"] == "minute" and r["metric"] == "latency"]
+        self.assertEqual(len(minute), 1)
+        self.assertEqual(minute[0]["samples"], 2)
+        online = [r for r in rows if r["period"] == "day" and r["metric"] == "is_online"]
+        self.assertEqual(online[0]["total"], 2.0)
+
+class RollupStatsTest(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine, tables=[SpeedtestRollup.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.addCleanup(self.db.close)
+        records = [result(T0 + timedelta(hours=i), 1 + i % 2, 100.0 + 10 * i) for i in range(4)]
+        self.db.add_all([SpeedtestRollup(**r) for r in rollup_rows("speedtest", records)])
+        self.db.commit()
+
+    def test_hourly_stats(self):
+        out = rollup_stats(self.db, "speedtest", T0, T0 + timedelta(hours=4))
+        self.assertEqual(out["period"], "hour")
+        d = out["stats"]["download"]
+        self.assertEqual((d["count"], d["avg"], d["min"], d["max"]), (4, 115.0, 100.0, 130.0))
+        self.assertAlmostEqual(d["stddev"], 11.18, places=2)
+        self.assertEqual(out["stats"]["upload"]["count"], 0)
+
+    def test_long_range_uses_days_and_key_filter(self):
+        out = rollup_stats(self.db, "speedtest", T0 - timedelta(days=7), T0 + timedelta(days=1), key=2)
+        self.assertEqual(out["period"], "day")
+        self.assertEqual(out["stats"]["download"]["count"], 2)
+        self.assertEqual(out["stats"]["download"]["avg"], 120.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from py.scheduler import Scheduler, IntervalTrigger, CronTrigger, OnceTrigger, parse_cron
+
+class IntervalTriggerTest(unittest.TestCase):
+    def test_next_slot_counts_from_previous_slot(self):
+        t = IntervalTrigger(3600)
+        prev = datetime(2026, 1, 1, 0, 0)
+        self.assertEqual(t.next(prev, prev + timedelta(minutes=5)), datetime(2026, 1, 1, 1, 0))
+
+    def test_missed_slots_are_coalesced_on_grid(self):
+        t = IntervalTrigger(3600)
+        self.assertEqual(t.next(datetime(2026, 1, 1, 0, 0), datetime(2026, 1, 1, 3, 30)), datetime(2026, 1, 1, 4, 0))
+        self.assertEqual(t.next(datetime(2026, 1, 1, 0, 0), datetime(2026, 1, 1, 1, 0)), datetime(2026, 1, 1, 2, 0))
+
+    def test_anchored_first_run(self):
+        t = IntervalTrigger(2 * 86400, at="03:00")
+        self.assertEqual(t.first(datetime(2026, 1, 1, 2, 0)), datetime(2026, 1, 1, 3, 0))
+        self.assertEqual(t.first(datetime(2026, 1, 1, 4, 0)), datetime(2026, 1, 2, 3, 0))
+        self.assertEqual(t.next(datetime(2026, 1, 2, 3, 0), datetime(2026, 1, 2, 3, 0)), datetime(2026, 1, 4, 3, 0))
+
+class CronTriggerTest(unittest.TestCase):
+    def test_step_minutes(self):
+        self.assertEqual(CronTrigger("*/15 * * * *").first(datetime(2026, 10, 18, 10, 7)), datetime(2026, 10, 18, 10, 15))
+        self.assertEqual(CronTrigger("*/15 * * * *").first(datetime(2026, 10, 18, 10, 45)), datetime(2026, 10, 18, 11, 0))
+
+    def test_weekday_range(self):
+        # 2026-10-17 to sobota -> następny dzień roboczy to poniedziałek
+        self.assertEqual(CronTrigger("30 2 * * 1-5").first(datetime(2026, 10, 17, 12, 0)), datetime(2026, 10, 19, 2, 30))
+
+    def test_sunday_as_seven(self):
+        self.assertEqual(CronTrigger("0 9 * * 7").first(datetime(2026, 10, 18, 10, 0)), datetime(2026, 10, 25, 9, 0))
+
+    def test_dom_or_dow_when_both_restricted(self):
+        # 13. dzień miesiąca LUB piątek - pierwszy jest piątek 2 października
+        self.assertEqual(CronTrigger("0 0 13 * 5").first(datetime(2026, 10, 1)), datetime(2026, 10, 2))
+
+    def test_day_of_month_step(self):
+        # "*/2" to dni nieparzyste; przy dowolnym dniu tygodnia liczy się tylko dzień miesiąca
+        t = CronTrigger("0 0 */2 * *")
+        self.assertEqual(t.first(datetime(2026, 10, 1, 12, 0)), datetime(2026, 10, 3))
+        self.assertEqual(t.first(datetime(2026, 10, 31, 12, 0)), datetime(2026, 11, 1))
+        self.assertFalse(t.dom_any)
+
+    def test_full_range_counts_as_any(self):
+        # "*/1" i "1-31" to to samo co "*" - bez reguły LUB, czyli tylko poniedziałki
+        for dom in ("*/1", "1-31"):
+            t = CronTrigger(f"0 0 {dom} * 1")
+            self.assertTrue(t.dom_any, dom)
+            self.assertEqual(t.first(datetime(2026, 10, 18, 12, 0)), datetime(2026, 10, 19))
+        self.assertTrue(CronTrigger("0 0 13 * 0-7").dow_any)
+
+    def test_next_is_strictly_after(self):
+        t = CronTrigger("0 * * * *")
+        self.assertEqual(t.next(datetime(2026, 1, 1, 5, 0), datetime(2026, 1, 1, 5, 0)), datetime(2026, 1, 1, 6, 0))
+
+    def test_invalid_expressions(self):
+        for expr in ("* * *", "61 * * * *", "*/0 * * * *", "0 0 31 2 *", "5-1 * * * *"):
+            with self.assertRaises(ValueError, msg=expr):
+                parse_cron(expr)
+
+class SchedulerTest(unittest.TestCase):
+    def test_job_replaced_while_running_keeps_running(self):
+        s = Scheduler()
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+
+        s.add_job("job", slow, OnceTrigger(0), persist=False)
+        s.start()
+        self.assertTrue(started.wait(3))
+
+        runs = []
+        s.add_job("job", lambda: runs.append(1), IntervalTrigger(1), persist=False)
+        release.set()
+        deadline = time.time() + 5
+        while not runs and time.time() < deadline: time.sleep(0.05)
+
+        self.assertTrue(runs)
+        job = s.jobs()[0]
+        self.assertGreaterEqual(job["runs"], 1)
+
+    def test_remove_job(self):
+        s = Scheduler()
+        s.add_job("job", lambda: None, IntervalTrigger(60), persist=False)
+        self.assertIsNotNone(s.next_run("job"))
+        s.remove_job("job")
+        self.assertIsNone(s.next_run("job"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import os
+import socket
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from py import servers
+from py.servers import AUTO_BEST, ServerCatalogue, _host_port, _tcp_rtt
+
+SERVERS = [
+    {"id": 1, "host": "a.example:8080"},
+    {"id": 2, "host": "b.example", "port": 5060},
+    {"id": 3, "host": "c.example:8080"},
+]
+RTT = {"a.example": 40.0, "b.example": 12.5, "c.example": None}
+
+class HostPortTest(unittest.TestCase):
+    def test_port_from_host_or_field(self):
+        self.assertEqual(_host_port(SERVERS[0]), ("a.example", 8080))
+        self.assertEqual(_host_port(SERVERS[1]), ("b.example", 5060))
+        self.assertEqual(_host_port({"host": "d.example"}), ("d.example", 8080))
+
+class TcpRttTest(unittest.TestCase):
+    def test_local_listener_and_closed_port(self):
+        with socket.socket() as listener:
+            listener.bind(("127.0.0.1", 0))
+            listener.listen(8)
+            port = listener.getsockname()[1]
+            self.assertIsInstance(_tcp_rtt("127.0.0.1", port), float)
+        self.assertIsNone(_tcp_rtt("127.0.0.1", port))
+
+class CatalogueTest(unittest.TestCase):
+    def setUp(self):
+        for patch in (mock.patch.object(servers.dataversion, "bump"), mock.patch.object(servers, "_tcp_rtt", side_effect=lambda host, port: RTT[host])):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.catalogue = ServerCatalogue()
+
+    def test_rank_sorts_by_rtt_unreachable_last(self):
+        ranked = self.catalogue.rank(SERVERS)
+        self.assertEqual([(s["id"], s["rtt"]) for s in ranked], [(2, 12.5), (1, 40.0), (3, None)])
+        self.assertNotIn("rtt", SERVERS[0])
+
+    def test_auto_best_resolves_to_fastest(self):
+        self.catalogue._set(self.catalogue.rank(SERVERS), None)
+        self.assertEqual(self.catalogue.snapshot()["best_id"], 2)
+        self.assertEqual(self.catalogue.resolve(AUTO_BEST), 2)
+        self.assertEqual(self.catalogue.resolve(3), 3)
+        self.assertIsNone(self.catalogue.resolve(None))
+
+    def test_auto_best_without_ranking_falls_back_to_cli(self):
+        # Brak listy albo wszystkie serwery nieosiągalne - wybór zostaje po stronie CLI
+        self.assertIsNone(self.catalogue.resolve(AUTO_BEST))
+        self.catalogue._set([{"id": 3, "rtt": None}], None)
+        self.assertIsNone(self.catalogue.resolve(AUTO_BEST))
+
+    def test_refresh_ranks_and_caches_list(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "servers.json")
+            run = mock.Mock(return_value=SimpleNamespace(stdout=json.dumps({"servers": SERVERS})))
+            with mock.patch.object(servers, "SERVERS_FILE", path), mock.patch.object(servers.subprocess, "run", run):
+                self.catalogue.refresh()
+                with open(path, encoding="utf-8") as f:
+                    cached = json.load(f)["servers"]
+                self.assertEqual([s["id"] for s in cached], [2, 1, 3])
+
+                fresh = ServerCatalogue()
+                self.assertTrue(fresh.load_cached())
+                self.assertEqual(fresh.resolve(AUTO_BEST), 2)
+
+    def test_failed_refresh_keeps_previous_list(self):
+        self.catalogue._set([{"id": 1, "rtt": 5.0}], None)
+        with mock.patch.object(servers.subprocess, "run", side_effect=OSError("no cli")), self.assertLogs(level="ERROR"):
+            self.catalogue.refresh()
+        self.assertEqual(self.catalogue.resolve(AUTO_BEST), 1)
+
+if __name__ == "__main__":
+    unittest.main()
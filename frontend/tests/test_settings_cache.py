@@ -0,0 +1,50 @@
+import threading
+import unittest
+from unittest import mock
+
+from py import settings_cache
+from py.models import AppSettings
+
+class SettingsCacheTest(unittest.TestCase):
+    def _cache(self, row):
+        cache = settings_cache.SettingsCache(AppSettings)
+        session = mock.MagicMock()
+        session.query.return_value.filter.return_value.first.return_value = row
+        return cache, mock.patch.object(settings_cache.database, "SessionLocal", return_value=session)
+
+    def test_loads_once_and_reloads_after_invalidate(self):
+        cache, patch = self._cache(AppSettings(id=1, schedule_hours=3))
+        with patch as factory:
+            self.assertEqual(cache.get().schedule_hours, 3)
+            self.assertEqual(cache.get().schedule_hours, 3)
+            self.assertEqual(factory.call_count, 1)
+            cache.invalidate()
+            cache.get()
+            self.assertEqual(factory.call_count, 2)
+
+    def test_missing_row_is_cached_as_none(self):
+        cache, patch = self._cache(None)
+        with patch as factory:
+            self.assertIsNone(cache.get())
+            self.assertIsNone(cache.get())
+            self.assertEqual(factory.call_count, 1)
+
+    def test_concurrent_invalidate_never_yields_none_for_existing_row(self):
+        cache, patch = self._cache(AppSettings(id=1, schedule_hours=1))
+        stop = threading.Event()
+
+        def invalidate():
+            while not stop.is_set(): cache.invalidate()
+
+        with patch:
+            t = threading.Thread(target=invalidate)
+            t.start()
+            try:
+                results = [cache.get() for _ in range(20000)]
+            finally:
+                stop.set()
+                t.join()
+        self.assertNotIn(None, results)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import random
+import unittest
+from datetime import datetime
+
+from py.sketches import DDSketch, LatencySketches, ALPHA
+
+def exact_quantile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+class DDSketchTest(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(42)
+        self.values = [rnd.lognormvariate(3, 0.8) for _ in range(5000)]
+
+    def assertRelative(self, actual, expected):
+        self.assertLessEqual(abs(actual - expected), ALPHA * expected * 1.0001)
+
+    def test_quantiles_within_relative_accuracy(self):
+        s = DDSketch()
+        for v in self.values: s.add(v)
+        for q in (0.0, 0.5, 0.95, 0.99, 1.0):
+            self.assertRelative(s.quantile(q), exact_quantile(self.values, q))
+
+    def test_merge_equals_single_sketch(self):
+        whole, a, b = DDSketch(), DDSketch(), DDSketch()
+        for i, v in enumerate(self.values):
+            whole.add(v)
+            (a if i % 2 else b).add(v)
+        a.merge(b)
+        self.assertEqual(a.bins, whole.bins)
+        self.assertEqual(a.count, whole.count)
+        self.assertEqual((a.min, a.max), (whole.min, whole.max))
+        self.assertEqual(a.quantile(0.99), whole.quantile(0.99))
+
+    def test_merge_with_empty(self):
+        s = DDSketch()
+        s.add(10.0)
+        s.merge(DDSketch())
+        self.assertEqual(s.count, 1)
+        self.assertEqual(s.quantile(0.5), 10.0)
+        self.assertIsNone(DDSketch().quantile(0.5))
+
+    def test_zero_values(self):
+        s = DDSketch()
+        for v in (0.0, 0.0, 0.0, 50.0): s.add(v)
+        self.assertEqual(s.quantile(0.5), 0.0)
+        self.assertRelative(s.quantile(1.0), 50.0)
+
+    def test_bytes_round_trip(self):
+        s = DDSketch()
+        for v in self.values[:100] + [0.0]: s.add(v)
+        r = DDSketch.from_bytes(s.to_bytes())
+        self.assertEqual((r.bins, r.zero_count, r.count, r.min, r.max), (s.bins, s.zero_count, s.count, s.min, s.max))
+
+    def test_unknown_format_version(self):
+        data = bytearray(DDSketch().to_bytes())
+        data[0] = 99
+        with self.assertRaises(ValueError):
+            DDSketch.from_bytes(bytes(data))
+
+class LatencySketchesTest(unittest.TestCase):
+    def test_jitter_spans_probes_and_skips_lost_replies(self):
+        buf = LatencySketches()
+        ts = datetime(2026, 10, 18, 12, 0, 5)
+        buf.add("gw", ts, [10.0, None, 14.0])
+        buf.add("gw", ts, [11.0])
+        pending = buf.take()
+        self.assertTrue(pending)
+        for b in pending.values():
+            self.assertEqual(b.sketch.count, 3)
+            self.assertEqual(b.jitter_samples, 2)
+            self.assertEqual(b.jitter_sum, 7.0)
+        self.assertEqual(buf.take(), {})
+
+    def test_restore_merges_back(self):
+        buf = LatencySketches()
+        ts = datetime(2026, 10, 18, 12, 0)
+        buf.add("gw", ts, [10.0])
+        pending = buf.take()
+        buf.add("gw", ts, [20.0])
+        buf.restore(pending)
+        self.assertTrue(all(b.sketch.count == 2 for b in buf.take().values()))
+
+if __name__ == "__main__":
+    unittest.main()
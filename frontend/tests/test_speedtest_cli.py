@@ -0,0 +1,75 @@
+import json
+import subprocess
+import sys
+import threading
+import unittest
+from unittest import mock
+
+from py import speedtest
+from py.speedtest import SpeedtestCancelled, SpeedtestError, _progress_event, _run_cli
+
+RESULT = {"type": "result", "download": {"bandwidth": 12_500_000}, "server": {"id": 7}}
+
+def fake_cli(test, lines, sleep=0.0, code=0):
+    """Podmienia CLI na proces Pythona wypisującego zadane linie jsonl."""
+    script = (
+        "import sys, time\n"
+        f"for line in {lines!r}:\n"
+        "    print(line, flush=True)\n"
+        f"time.sleep({sleep})\n"
+        f"sys.exit({code})\n"
+    )
+    real_popen = subprocess.Popen
+    def popen(cmd, **kwargs):
+        proc = real_popen([sys.executable, "-c", script], **kwargs)
+        test.addCleanup(proc.stdout.close)
+        return proc
+    return mock.patch.object(speedtest.subprocess, "Popen", side_effect=popen)
+
+class ProgressEventTest(unittest.TestCase):
+    def test_ping_phase(self):
+        event = {"type": "ping", "ping": {"progress": 0.51234, "latency": 9.1, "jitter": 0.4}}
+        self.assertEqual(_progress_event(event), {"phase": "ping", "progress": 0.512, "latency": 9.1, "jitter": 0.4})
+
+    def test_bandwidth_in_mbps(self):
+        event = {"type": "download", "download": {"progress": 1, "bandwidth": 12_500_000, "elapsed": 3000}}
+        self.assertEqual(_progress_event(event), {"phase": "download", "progress": 1, "bandwidth_mbps": 100.0, "elapsed": 3000})
+
+class RunCliTest(unittest.TestCase):
+    def test_progress_and_result(self):
+        lines = [
+            json.dumps({"type": "testStart", "server": {"name": "Srv", "location": "Here"}}),
+            json.dumps({"type": "ping", "ping": {"progress": 1, "latency": 5}}),
+            json.dumps({"type": "download", "download": {"progress": 0.5, "bandwidth": 1_000_000}}),
+            json.dumps(RESULT),
+        ]
+        progress = []
+        with fake_cli(self, lines):
+            self.assertEqual(_run_cli(on_progress=progress.append), RESULT)
+        self.assertEqual([p["phase"] for p in progress], ["start", "ping", "download"])
+        self.assertEqual(progress[0]["server"], "Srv")
+
+    def test_error_log_without_result(self):
+        lines = [json.dumps({"type": "log", "level": "error", "message": "No servers"})]
+        with fake_cli(self, lines, code=2):
+            with self.assertRaisesRegex(SpeedtestError, "No servers"):
+                _run_cli()
+
+    def test_cancel_kills_process(self):
+        cancel = threading.Event()
+        def on_progress(event):
+            cancel.set()
+        lines = [json.dumps({"type": "testStart", "server": {}})]
+        with fake_cli(self, lines, sleep=30), mock.patch.object(speedtest, "POLL_INTERVAL", 0.05):
+            with self.assertRaises(SpeedtestCancelled):
+                _run_cli(on_progress=on_progress, cancel=cancel)
+
+    def test_stalled_cli_times_out(self):
+        with fake_cli(self, [], sleep=30), mock.patch.object(speedtest, "POLL_INTERVAL", 0.05), \
+             mock.patch.object(speedtest, "SPEEDTEST_STALL_TIMEOUT", 0.2):
+            with self.assertRaises(SpeedtestError) as ctx:
+                _run_cli()
+        self.assertNotIsInstance(ctx.exception, SpeedtestCancelled)
+
+if __name__ == "__main__":
+    unittest.main()
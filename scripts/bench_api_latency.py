@@ -0,0 +1,65 @@
+"""Benchmark opóźnień API pod równoległym obciążeniem.
+
+Wysyła równolegle ciężkie zapytania (/api/results, /api/export) i jednocześnie mierzy
+p50/p99 lekkiego healthchecka (/api/auth-status). Gdy zapytania do bazy blokują pętlę
+zdarzeń uvicorna, p99 healthchecka rośnie razem z czasem ciężkich zapytań.
+
+Użycie (na działającej instancji, np. przed i po zmianie):
+    python scripts/bench_api_latency.py --url http://localhost:8000 --cookie <SESSION_SECRET>
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+COOKIE_NAME = "speedtest_session_v2"
+
+def percentile(values, p):
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+async def hammer(client, path, stop):
+    while not stop.is_set():
+        try:
+            await client.get(path)
+        except httpx.HTTPError:
+            pass
+
+async def probe(client, path, count, interval):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await client.get(path)
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--cookie", default=None, help="Wartość SESSION_SECRET, gdy AUTH_ENABLED=true")
+    parser.add_argument("--concurrency", type=int, default=32, help="Liczba równoległych ciężkich klientów")
+    parser.add_argument("--samples", type=int, default=200, help="Liczba pomiarów healthchecka")
+    parser.add_argument("--heavy", default="/api/results?limit=5000", help="Ciężki endpoint obciążający bazę")
+    args = parser.parse_args()
+
+    cookies = {COOKIE_NAME: args.cookie} if args.cookie else {}
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=args.url, cookies=cookies, timeout=60, limits=limits) as client:
+        baseline = await probe(client, "/api/auth-status", args.samples // 4, 0.01)
+
+        stop = asyncio.Event()
+        workers = [asyncio.create_task(hammer(client, args.heavy, stop)) for _ in range(args.concurrency)]
+        await asyncio.sleep(1)
+        loaded = await probe(client, "/api/auth-status", args.samples, 0.02)
+        stop.set()
+        await asyncio.gather(*workers)
+
+    for name, values in (("idle", baseline), (f"under load x{args.concurrency}", loaded)):
+        print(f"{name:>20}: p50={statistics.median(values):7.1f} ms  p99={percentile(values, 99):7.1f} ms  max={max(values):7.1f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())